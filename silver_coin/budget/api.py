@@ -0,0 +1,367 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ActualAmount
+from .models import Amount
+from .models import BudgetPeriod
+from .models import PeriodRollup
+from .models import Tombstone
+from .models.change_tracking import assign_versions
+
+API_VERSION = 1
+# The most creates, updates and deletes a batch can contain in total
+BATCH_LIMIT = 500
+# The most rows of each kind a sync returns, the client asks again for the rest
+SYNC_LIMIT = 1000
+# The key each kind of Tombstone is listed under in a sync, the same as the key of the changed rows
+DELETED_KEYS = {
+    "budget_period": "budget_periods",
+    "estimate": "estimates",
+    "actual_amount": "actual_amounts",
+}
+# The fields of an ActualAmount a batch can set
+ACTUAL_AMOUNT_FIELDS = ("name", "occurred_on", "amount", "estimate")
+
+class BatchError(Exception):
+    """
+    Raised when a batch request is malformed as a whole, as opposed to one of its items being invalid.
+    """
+
+def serialize_budget(budget):
+    return {
+        "id": budget.budget_id,
+        "name": budget.name,
+        "description": budget.description,
+        "period_type": budget.period_type,
+        "period_length": budget.period_length,
+    }
+
+def serialize_period(period):
+    return {
+        "id": period.budget_period_id,
+        "start_date": period.start_date,
+        "end_date": period.end_date,
+    }
+
+def serialize_estimate(estimate):
+    return {
+        "id": estimate.amount_id,
+        "name": estimate.name,
+        "amount_type": estimate.amount_type,
+        "amount": estimate.amount,
+    }
+
+def serialize_actual(actual):
+    return {
+        "id": actual.actual_id,
+        "name": actual.name,
+        "occurred_on": actual.occurred_on,
+        "amount": actual.amount,
+        "estimate": actual.estimate_id,
+    }
+
+def serialize_rollup(rollup):
+    return {
+        "income": rollup.income_total,
+        "expense": rollup.expense_total,
+        "net": rollup.net_amount,
+        "income_count": rollup.income_count,
+        "expense_count": rollup.expense_count,
+    }
+
+EMPTY_TOTALS = {"income": Decimal(0), "expense": Decimal(0), "net": Decimal(0), "income_count": 0, "expense_count": 0}
+
+def get_period_totals(period_ids):
+    """
+    Reads the precomputed totals of the periods from their PeriodRollup rows in one query.
+
+    :param: period_ids, the ids of the BudgetPeriods
+
+    :returns: a dictionary keyed by period id of the totals, all zero if no actual amounts have been recorded
+    """
+    rollups = PeriodRollup.objects.filter(period_id__in=period_ids, estimate_id__isnull=True)
+    totals = {period_id: dict(EMPTY_TOTALS) for period_id in period_ids}
+    totals.update({rollup.period_id: serialize_rollup(rollup) for rollup in rollups})
+    return totals
+
+def get_estimate_totals(period_id):
+    """
+    Reads the precomputed totals of the period and each of its estimates in one query.
+
+    :param: period_id, the id of the BudgetPeriod
+
+    :returns: a tuple of the period's totals and a dictionary of the totals keyed by estimate id
+    """
+    period_totals = dict(EMPTY_TOTALS)
+    estimate_totals = {}
+    for rollup in PeriodRollup.objects.filter(period_id=period_id):
+        if rollup.estimate_id is None:
+            period_totals = serialize_rollup(rollup)
+        else:
+            estimate_totals[rollup.estimate_id] = serialize_rollup(rollup)
+    return period_totals, estimate_totals
+
+def get_errors(error):
+    """
+    Turns a ValidationError into a dictionary of messages keyed by field, errors not on a field are under __all__.
+    """
+    if hasattr(error, "error_dict"):
+        return error.message_dict
+    return {"__all__": error.messages}
+
+def get_item_id(value):
+    """
+    Returns the value if it is a valid id, otherwise None.
+    """
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+def get_batch_list(payload, key):
+    items = payload.get(key, [])
+    if not isinstance(items, list):
+        raise BatchError(f"{key} must be a list")
+    return items
+
+def clean_actual(actual, values, period, estimates):
+    """
+    Sets the values on an ActualAmount and checks it with the model's field validators and rules.
+
+    The period and its estimates are loaded once by the caller, so checking an item does not query the database.
+
+    :param: actual, the new or existing ActualAmount
+    :param: values, a dictionary of the fields to set
+    :param: period, the BudgetPeriod the actual belongs to
+    :param: estimates, a dictionary of the period's estimates keyed by id
+    """
+    if not isinstance(values, dict):
+        raise ValidationError("Each item must be an object")
+    unknown = set(values) - set(ACTUAL_AMOUNT_FIELDS) - {"id"}
+    if unknown:
+        raise ValidationError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    for field in ("name", "occurred_on", "amount"):
+        if field in values:
+            setattr(actual, field, values[field])
+    errors = {}
+    try:
+        actual.clean_fields(exclude=["estimate", "period"])
+    except ValidationError as error:
+        errors = error.update_error_dict(errors)
+
+    if "estimate" in values:
+        estimate_id = get_item_id(values["estimate"])
+        if estimate_id in estimates:
+            actual.estimate_id = estimate_id
+        else:
+            errors["estimate"] = ["The period has no estimate with this id"]
+    elif actual.estimate_id is None:
+        errors["estimate"] = ["This field cannot be null."]
+    if errors:
+        raise ValidationError(errors)
+
+    ActualAmount.check_amount_and_date(actual.amount, actual.occurred_on, period)
+
+def apply_actual_batch(period, payload):
+    """
+    Creates, updates and deletes many ActualAmounts of a period in one transaction.
+
+    Each item is validated on its own, the valid items are written and the invalid ones are reported.
+    The writes use bulk_create, bulk_update and one DELETE, and the PeriodRollups are updated once at the end,
+    so the number of queries does not depend on the number of items.
+
+    The payload is a dictionary with up to three lists:
+        create, objects with the name, occurred_on, amount and estimate id of the new actuals
+        update, objects with the id of the actual and the fields to change
+        delete, the ids of the actuals to delete
+
+    :param: period, the BudgetPeriod the actuals belong to, already checked to be the user's
+    :param: payload, the decoded JSON body of the request
+
+    :returns: a dictionary of the results for each list, in the same order as the items
+    """
+    if not isinstance(payload, dict):
+        raise BatchError("The body must be a JSON object")
+    creates = get_batch_list(payload, "create")
+    updates = get_batch_list(payload, "update")
+    deletes = get_batch_list(payload, "delete")
+    if len(creates) + len(updates) + len(deletes) > BATCH_LIMIT:
+        raise BatchError(f"A batch can contain at most {BATCH_LIMIT} items")
+
+    results = {"create": [], "update": [], "delete": []}
+    estimates = {estimate.amount_id: estimate for estimate in period.estimates.all()}
+    # The sum and count of the change to each estimate's actuals
+    changes = defaultdict(lambda: [Decimal(0), 0])
+
+    with transaction.atomic():
+        update_ids = [get_item_id(item.get("id")) if isinstance(item, dict) else None for item in updates]
+        delete_ids = [get_item_id(id) for id in deletes]
+        ids = [id for id in update_ids + delete_ids if id is not None]
+        # Locked so a concurrent edit cannot change an actual between reading its rollup values and writing it
+        existing = ActualAmount.objects.select_for_update().filter(period=period).in_bulk(ids) if ids else {}
+        seen = set()
+
+        created = []
+        for values in creates:
+            actual = ActualAmount(period_id=period.pk)
+            try:
+                clean_actual(actual, values, period, estimates)
+            except ValidationError as error:
+                results["create"].append({"status": "invalid", "errors": get_errors(error)})
+            else:
+                created.append(actual)
+                results["create"].append({"status": "created", "actual": actual})
+
+        updated = []
+        for id, values in zip(update_ids, updates):
+            actual = existing.get(id)
+            if actual is None or id in seen:
+                results["update"].append({"id": id, "status": "not_found" if actual is None else "duplicate"})
+                continue
+            seen.add(id)
+            previous = (actual.estimate_id, actual.amount)
+            try:
+                clean_actual(actual, values, period, estimates)
+            except ValidationError as error:
+                results["update"].append({"id": id, "status": "invalid", "errors": get_errors(error)})
+                continue
+            changes[previous[0]][0] -= previous[1]
+            changes[previous[0]][1] -= 1
+            updated.append(actual)
+            results["update"].append({"id": id, "status": "updated", "actual": actual})
+
+        deleted = []
+        for id in delete_ids:
+            actual = existing.get(id)
+            if actual is None or id in seen:
+                results["delete"].append({"id": id, "status": "not_found" if actual is None else "duplicate"})
+                continue
+            seen.add(id)
+            changes[actual.estimate_id][0] -= actual.amount
+            changes[actual.estimate_id][1] -= 1
+            deleted.append(id)
+            results["delete"].append({"id": id, "status": "deleted"})
+
+        assign_versions(created + updated, budget_id=period.budget_id)
+        ActualAmount.objects.bulk_create(created)
+        # Databases that cannot return the ids from a bulk insert need to fetch them, each new row has its own version
+        if created and created[0].pk is None:
+            ids = dict(ActualAmount.objects.filter(
+                period=period, version__in=[actual.version for actual in created]
+            ).values_list("version", "actual_id"))
+            for actual in created:
+                actual.pk = ids[actual.version]
+        ActualAmount.objects.bulk_update(updated, ["name", "occurred_on", "amount", "estimate", "version"])
+        if deleted:
+            # Nothing refers to an ActualAmount and there are no delete receivers, so Django deletes the rows
+            # in one query without loading them, the rollups are updated below
+            ActualAmount.objects.filter(pk__in=deleted).delete()
+            Tombstone.objects.record(period.budget_id, ActualAmount.TOMBSTONE_KIND, deleted)
+        for actual in created + updated:
+            changes[actual.estimate_id][0] += actual.amount
+            changes[actual.estimate_id][1] += 1
+
+        PeriodRollup.objects.apply_many(period.pk, {
+            estimate_id: (estimates[estimate_id].amount_type, amount, count)
+            for estimate_id, (amount, count) in changes.items()
+            if amount or count
+        })
+
+    for result in results["create"] + results["update"]:
+        if "actual" in result:
+            result["actual"] = serialize_actual(result["actual"])
+    return results
+
+def encode_sync_cursor(budget, version):
+    """
+    Encodes the Budget and the change version a client has synced up to as an opaque cursor.
+    """
+    return urlsafe_b64encode(json.dumps([budget.pk, version]).encode()).decode()
+
+def decode_sync_cursor(cursor, budget):
+    """
+    Decodes a sync cursor.
+
+    :returns: the change version, or None if the cursor is missing, invalid or for a different Budget
+    """
+    if not cursor:
+        return None
+    try:
+        budget_id, version = json.loads(urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if budget_id != budget.pk or not isinstance(version, int) or version > budget.change_version:
+        return None
+    return version
+
+def get_changes(budget, cursor, limit=None):
+    """
+    Gets the rows of a Budget that have changed since a sync cursor, ordered by change version.
+
+    The Budget's change_version is the version of its latest change, so if the cursor is up to date nothing else is
+    queried. Otherwise each kind of row is read using its (parent, version) index. If a kind has more than limit
+    changes only the changes up to the last version returned for it are included, so the next cursor never skips a change.
+
+    :param: budget, the user's Budget
+    :param: cursor, the cursor returned by the last sync, a missing or invalid cursor syncs everything
+    :param: limit, the most rows of each kind to return, defaults to SYNC_LIMIT
+
+    :returns: a dictionary of the Budget and changed rows, the deleted row ids, the next cursor and if there are more changes
+    """
+    limit = limit or SYNC_LIMIT
+    since = decode_sync_cursor(cursor, budget)
+    changes = {
+        "reset": since is None,
+        "budget": None,
+        "budget_periods": [],
+        "estimates": [],
+        "actual_amounts": [],
+        "deleted": {key: [] for key in DELETED_KEYS.values()},
+        "cursor": encode_sync_cursor(budget, budget.change_version),
+        "more": False,
+    }
+    if since == budget.change_version:
+        return changes
+    changes["budget"] = serialize_budget(budget)
+
+    tables = {
+        "budget_periods": BudgetPeriod.objects.filter(budget=budget),
+        "estimates": Amount.objects.filter(
+            Q(budget=budget) | Q(budget_period__in=BudgetPeriod.objects.filter(budget=budget).values("pk"))
+        ),
+        "actual_amounts": ActualAmount.objects.filter(period__budget=budget),
+        "deleted": Tombstone.objects.filter(budget=budget),
+    }
+    rows = {}
+    # Changes committed after the budget was read are left for the next sync
+    until = budget.change_version
+    for name, queryset in tables.items():
+        if since is not None:
+            queryset = queryset.filter(version__gt=since)
+        rows[name] = list(queryset.filter(version__lte=until).order_by("version")[:limit + 1])
+        if len(rows[name]) > limit:
+            until = min(until, rows[name][limit - 1].version)
+
+    for row in rows.pop("deleted"):
+        if row.version <= until:
+            changes["deleted"][DELETED_KEYS[row.kind]].append(row.object_id)
+    changes["budget_periods"] = [
+        {**serialize_period(period), "version": period.version}
+        for period in rows["budget_periods"] if period.version <= until
+    ]
+    changes["estimates"] = [
+        {**serialize_estimate(estimate), "budget": estimate.budget_id, "budget_period": estimate.budget_period_id, "version": estimate.version}
+        for estimate in rows["estimates"] if estimate.version <= until
+    ]
+    changes["actual_amounts"] = [
+        {**serialize_actual(actual), "period": actual.period_id, "version": actual.version}
+        for actual in rows["actual_amounts"] if actual.version <= until
+    ]
+    changes["cursor"] = encode_sync_cursor(budget, until)
+    changes["more"] = until < budget.change_version
+    return changes
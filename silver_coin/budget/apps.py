@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BudgetConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'budget'
+
+    def ready(self):
+        # Connect the signals that keep the PeriodRollups up to date
+        from . import signals
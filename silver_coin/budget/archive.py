@@ -0,0 +1,170 @@
+import io
+import json
+import zipfile
+from datetime import datetime, timezone
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from .models import ActualAmount
+from .models import Amount
+from .models import Budget
+from .models import BudgetPeriod
+from .models import PeriodRollup
+
+ARCHIVE_VERSION = 1
+MANIFEST = "manifest.json"
+
+# The files of the archive and their models, in the order they are restored so foreign keys are always satisfied
+ARCHIVE_TABLES = [
+    ("budgets.jsonl", Budget),
+    ("budget_periods.jsonl", BudgetPeriod),
+    ("estimates.jsonl", Amount),
+    ("actual_amounts.jsonl", ActualAmount),
+]
+
+def get_archive_fields(model):
+    """
+    Returns the names of the columns of the model that are archived, the owner is set by the restore.
+    """
+    return [field.attname for field in model._meta.concrete_fields if field.attname != "owner_id"]
+
+def get_user_rows(model, user):
+    """
+    Returns the queryset of the user's rows of the model.
+    """
+    if model is Budget:
+        return Budget.objects.filter(owner=user)
+    return model.objects.for_user(user)
+
+class StreamBuffer():
+    """
+    A write only file that keeps what is written until it is taken, so ZipFile can write to a streaming response.
+
+    It has no tell or seek so ZipFile writes the sizes after each file's data instead of going back to fill them in.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        """
+        Returns everything written since the last call.
+        """
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_archive(user, chunk_size=2000):
+    """
+    Generates a zip of the user's Budget, BudgetPeriods, estimates and ActualAmounts, one JSON Lines file per table.
+
+    Each table is read with a server-side cursor chunk_size rows at a time and the compressed bytes are yielded
+    after every chunk, so memory is bounded by the chunk size rather than the size of the account.
+    The tables are read in one transaction, REPEATABLE READ on PostgreSQL, so they are all from the same snapshot
+    and a write made during the download cannot leave an actual amount without its estimate.
+    The PeriodRollups are not archived, they are rebuilt on restore.
+
+    :param: user, the user to export
+    :param: chunk_size, the number of rows fetched from the database at a time
+
+    :returns: a generator of the bytes of the zip file
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(MANIFEST, json.dumps({
+            "version": ARCHIVE_VERSION,
+            "username": user.username,
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+            "tables": {name: model._meta.label for name, model in ARCHIVE_TABLES},
+        }, indent=2))
+        yield buffer.take()
+
+        # The isolation level can only be set by the first query of a transaction
+        snapshot = connection.vendor == "postgresql" and not connection.in_atomic_block
+        with transaction.atomic():
+            if snapshot:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            for name, model in ARCHIVE_TABLES:
+                fields = get_archive_fields(model)
+                rows = get_user_rows(model, user).order_by("pk").values(*fields)
+                # force_zip64 as the size of the file is not known before it is written
+                with archive.open(name, mode="w", force_zip64=True) as table:
+                    for index, row in enumerate(rows.iterator(chunk_size=chunk_size), 1):
+                        table.write(json.dumps(row, cls=DjangoJSONEncoder).encode())
+                        table.write(b"\n")
+                        if index % chunk_size == 0:
+                            yield buffer.take()
+                yield buffer.take()
+    yield buffer.take()
+
+def read_manifest(archive):
+    """
+    Reads and checks the manifest of an archive.
+
+    :param: archive, an open ZipFile
+
+    :returns: the manifest dictionary
+    """
+    try:
+        manifest = json.loads(archive.read(MANIFEST))
+    except KeyError:
+        raise ValueError("The file is not an account archive, it has no manifest")
+    if manifest.get("version") != ARCHIVE_VERSION:
+        raise ValueError(f"Archive version {manifest.get('version')} is not supported")
+    return manifest
+
+def restore_archive(path, owner, batch_size=1000):
+    """
+    Loads an account archive made by stream_archive, keeping its primary keys.
+
+    It is meant for restoring into a fresh database, the rows are inserted with bulk_create in one transaction
+    and an IntegrityError is raised if any of them already exist. A ValueError is raised if the owner already has
+    a Budget, a user only has one. The tables are read a line at a time
+    so memory is bounded by the batch size. The sequences are moved past the restored keys and the
+    PeriodRollups of the restored periods rebuilt afterwards.
+
+    :param: path, the path of the archive
+    :param: owner, the user the Budget is restored to
+    :param: batch_size, the number of rows inserted at a time
+
+    :returns: a dictionary of the number of rows restored to each file
+    """
+    counts = {}
+    budget_ids = []
+    with zipfile.ZipFile(path) as archive, transaction.atomic():
+        read_manifest(archive)
+        if Budget.objects.filter(owner=owner).exists():
+            raise ValueError(f"{owner.username} already has a Budget, it must be deleted before the archive is restored")
+        for name, model in ARCHIVE_TABLES:
+            converters = {field.attname: field.to_python for field in model._meta.concrete_fields}
+            counts[name] = 0
+            batch = []
+            with archive.open(name) as table:
+                for line in io.TextIOWrapper(table, encoding="utf-8"):
+                    row = {field: converters[field](value) for field, value in json.loads(line).items()}
+                    if model is Budget:
+                        row["owner_id"] = owner.pk
+                        budget_ids.append(row["budget_id"])
+                    batch.append(model(**row))
+                    if len(batch) >= batch_size:
+                        model.objects.bulk_create(batch)
+                        counts[name] += len(batch)
+                        batch = []
+            model.objects.bulk_create(batch)
+            counts[name] += len(batch)
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [model for _, model in ARCHIVE_TABLES]):
+                cursor.execute(sql)
+        # bulk_create does not send the signals that keep the rollups up to date
+        PeriodRollup.objects.rebuild_periods(BudgetPeriod.objects.filter(budget_id__in=budget_ids).values("pk"))
+    return counts
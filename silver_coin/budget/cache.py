@@ -0,0 +1,128 @@
+import hashlib
+
+from django.core.cache import caches
+
+# The alias of the cache in settings.CACHES used for the budget pages
+BUDGET_CACHE = "budget"
+
+def get_budget_cache():
+    """
+    Returns the cache the budget pages are stored in.
+    """
+    return caches[BUDGET_CACHE]
+
+def clear_budget_cache():
+    """
+    Removes every cached value and ETag of the budget pages.
+
+    The entries of one Budget cannot be found without their parts, so the whole cache is cleared.
+    It is only needed when a Budget is deleted, which is rare.
+    """
+    get_budget_cache().clear()
+
+def budget_cache_key(budget_id, change_version, name, *parts):
+    """
+    Builds the cache key of a value computed from a Budget's data.
+
+    Every write to the Budget or its estimates, periods and actual amounts claims a new change_version,
+    so a key made with the current version can only ever match a value computed since the last write.
+    The entries made with older versions are never read again and expire with the cache's timeout.
+
+    :param: budget_id, the id of the Budget
+    :param: change_version, the Budget's current change_version
+    :param: name, the name of the value, normally the view it is for
+    :param: parts, anything else the value depends on, such as the period id or the page's query string
+
+    :returns: the cache key
+    """
+    return ":".join(
+        str(part) for part in ("budget", budget_id, change_version, name, *parts)
+    )
+
+def get_or_compute(budget_id, change_version, name, compute, *parts):
+    """
+    Gets a value computed from a Budget's data from the cache, computing and storing it if it is missing or stale.
+
+    :param: budget_id, the id of the Budget
+    :param: change_version, the Budget's current change_version
+    :param: name, the name of the value, see budget_cache_key
+    :param: compute, a function with no arguments that computes the value, it must return something that can be pickled
+    :param: parts, anything else the value depends on, see budget_cache_key
+
+    :returns: the value
+    """
+    cache = get_budget_cache()
+    key = budget_cache_key(budget_id, change_version, name, *parts)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value)
+    return value
+
+def budget_etag(budget_id, change_version, name, *parts):
+    """
+    Builds the ETag of a page made from a Budget's data, it changes whenever the Budget's change_version does.
+
+    The ETag is weak as it is not a hash of the page itself, two responses with the same ETag show the same data.
+    It is made only from its arguments and never reads the cache, so every process gives a page the same ETag
+    and it is still matched after the cache is cleared.
+
+    :param: budget_id, the id of the Budget
+    :param: change_version, the Budget's current change_version
+    :param: name, the name of the page, normally the view
+    :param: parts, anything else the page depends on, see budget_cache_key
+
+    :returns: the quoted ETag
+    """
+    digest = hashlib.md5(":".join(str(part) for part in (budget_id, change_version, name, *parts)).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+class CachedContext():
+    """
+    The context of a page made from a Budget's data, cached until the Budget next changes.
+
+    The data is fetched by functions that do not depend on each other and the context is built from their results,
+    so the sync views run the functions one after another and the async views run them at the same time,
+    while both build the same context under the same cache key.
+
+    :param: budget, the Budget the page is made from
+    :param: name, the name of the value, see budget_cache_key
+    :param: fetchers, the functions with no arguments that fetch the data
+    :param: build, a function that is passed the results of the fetchers in order and returns the context,
+    it must return something that can be pickled
+    :param: parts, anything else the context depends on, see budget_cache_key
+    """
+    def __init__(self, budget, name, fetchers, build, *parts):
+        self.budget = budget
+        self.name = name
+        self.fetchers = fetchers
+        self.build = build
+        self.parts = parts
+
+    def get_key(self):
+        return budget_cache_key(self.budget.pk, self.budget.change_version, self.name, *self.parts)
+
+    def get(self):
+        """
+        Gets the context, fetching its data one function after another if it is not cached.
+        """
+        return get_or_compute(
+            self.budget.pk, self.budget.change_version, self.name,
+            lambda: self.build(*[fetch() for fetch in self.fetchers]), *self.parts,
+        )
+
+    async def aget(self, queries):
+        """
+        Gets the context in an async view, fetching its data at the same time if it is not cached.
+
+        :param: queries, the view's QueryRunner, the cache is read and written through it as it may do I/O
+
+        :returns: the context
+        """
+        cache = get_budget_cache()
+        key = self.get_key()
+        value = await queries.run(lambda: cache.get(key))
+        if value is None:
+            value = self.build(*await queries.gather(*self.fetchers))
+            await queries.run(lambda: cache.set(key, value))
+        return value
@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import get_or_compute
+from .models import Amount
+
+CENT = Decimal("0.01")
+
+def forecast_expenses(period_ids, today=None):
+    """
+    Projects the spend of each expense estimate of the periods at the end of the period from its spend rate to date.
+
+    The spend of every estimate of every period is read from the estimate rollups in one aggregate query, and the
+    projections are made in one pass over its rows, so the number of queries does not depend on the number of periods
+    or estimates. The spend to date is spread over the days of the period that have passed, including today, and
+    carried on at the same rate over the days remaining.
+
+    :param: period_ids, the ids of the BudgetPeriods
+    :param: today, the date the spend is projected from, defaults to today
+
+    :returns: a dictionary keyed by period id of the days elapsed and remaining and the forecast of each estimate,
+    periods without expense estimates are left out
+    """
+    today = today or timezone.now().date()
+    rows = Amount.objects.filter(budget_period__in=period_ids, amount_type="EX").values(
+        "amount_id", "name", "amount", "budget_period", "budget_period__start_date", "budget_period__end_date",
+    ).annotate(
+        spent=Coalesce(Sum("rollups__expense_total"), Decimal(0), output_field=DecimalField()),
+    ).order_by("budget_period", "name", "amount_id")
+
+    forecasts = {}
+    for row in rows:
+        forecast = forecasts.get(row["budget_period"])
+        if forecast is None:
+            start_date, end_date = row["budget_period__start_date"], row["budget_period__end_date"]
+            days = (end_date - start_date).days + 1
+            # A period that has not started has no spend rate, one that has ended has no days remaining
+            days_elapsed = min(max((today - start_date).days + 1, 0), days)
+            forecast = forecasts[row["budget_period"]] = {
+                "days_elapsed": days_elapsed,
+                "days_remaining": days - days_elapsed,
+                "estimates": [],
+            }
+        spent = row["spent"]
+        daily_rate = spent / forecast["days_elapsed"] if forecast["days_elapsed"] else Decimal(0)
+        projected = spent + daily_rate * forecast["days_remaining"]
+        forecast["estimates"].append({
+            "estimate_id": row["amount_id"],
+            "name": row["name"],
+            "estimate": row["amount"],
+            "spent": spent,
+            "daily_rate": daily_rate.quantize(CENT),
+            "projected": projected.quantize(CENT),
+            "variance": (row["amount"] - projected).quantize(CENT),
+            "is_over": projected > row["amount"],
+        })
+    return forecasts
+
+def forecast_period(period, today=None):
+    """
+    Returns the forecast of a period that is in progress, see forecast_expenses.
+
+    :param: period, the BudgetPeriod
+
+    :returns: the forecast, None if the period is not in progress
+    """
+    today = today or timezone.now().date()
+    if not period.is_active(today):
+        return None
+    return forecast_expenses([period.pk], today).get(period.pk, {
+        "days_elapsed": (today - period.start_date).days + 1,
+        "days_remaining": (period.end_date - today).days,
+        "estimates": [],
+    })
+
+def forecast_parts(period, today=None):
+    """
+    Returns the parts to add to the cache key and ETag of a page that shows the period's forecast.
+
+    The forecast of a period in progress changes each day without the Budget changing, so its date is a part.
+    """
+    today = today or timezone.now().date()
+    return (today.isoformat(),) if period.is_active(today) else ()
+
+def get_cached_forecast(period, today=None):
+    """
+    Returns the forecast of a period that is in progress, cached until the Budget next changes or the day ends.
+
+    :param: period, the BudgetPeriod with its Budget
+
+    :returns: the forecast, None if the period is not in progress
+    """
+    today = today or timezone.now().date()
+    parts = forecast_parts(period, today)
+    if not parts:
+        return None
+    budget = period.budget
+    return get_or_compute(
+        budget.pk, budget.change_version, "forecast", lambda: forecast_period(period, today), period.pk, *parts
+    )
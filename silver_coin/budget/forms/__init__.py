@@ -2,6 +2,8 @@ from .amount import AmountForm
 from .amount import IncomeForm
 from .amount import ActualAmountForm
 from .amount import ActualAmountModelForm
+from .amount import ActualAmountImportForm
 from .budget import BudgetForm
 from .budget import BudgetModelForm
-from .budget_period import BudgetPeriodForm, BudgetPeriodModelForm
\ No newline at end of file
+from .budget_period import BudgetPeriodForm, BudgetPeriodModelForm
+from .report import TrendsForm
\ No newline at end of file
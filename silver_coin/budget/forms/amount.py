@@ -1,6 +1,8 @@
 from datetime import date
 from django import forms
+from django.core.exceptions import ValidationError
 
+from ..importers import FORMAT_CHOICES, detect_format
 from ..models import Amount
 from ..models import ActualAmount
 
@@ -48,3 +50,47 @@ class ActualAmountModelForm(forms.ModelForm):
     amount = forms.DecimalField(required=True, max_digits=7, decimal_places=2)
     estimate_id = forms.ChoiceField(required=True, widget=forms.Select())
 
+
+class ActualAmountImportForm(forms.Form):
+    """
+    The form for importing a bank statement into a BudgetPeriod.
+    """
+    statement = forms.FileField(required=True)
+    file_format = forms.ChoiceField(
+        required=False,
+        label="Format",
+        choices=[("", "From the file extension")] + FORMAT_CHOICES,
+        widget=forms.Select(attrs={"class": "browser-default"}),
+    )
+    default_income = forms.ModelChoiceField(
+        queryset=Amount.objects.none(),
+        required=False,
+        help_text="Used for incomes without an estimate column or category",
+        widget=forms.Select(attrs={"class": "browser-default"}),
+    )
+    default_expense = forms.ModelChoiceField(
+        queryset=Amount.objects.none(),
+        required=False,
+        help_text="Used for expenses without an estimate column or category",
+        widget=forms.Select(attrs={"class": "browser-default"}),
+    )
+
+    def __init__(self, *args, period, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["default_income"].queryset = period.estimates.filter(amount_type="IN")
+        self.fields["default_expense"].queryset = period.estimates.filter(amount_type="EX")
+        for field in ("default_income", "default_expense"):
+            self.fields[field].label_from_instance = lambda estimate: f"{estimate.name} - ${estimate.amount}"
+
+    def clean(self):
+        """
+        Override to get the format from the file extension if it was not chosen.
+        """
+        cleaned_data = super().clean()
+        statement = cleaned_data.get("statement")
+        if statement is not None and not cleaned_data.get("file_format"):
+            file_format = detect_format(statement.name)
+            if file_format is None:
+                raise ValidationError("Please choose the format of the file")
+            cleaned_data["file_format"] = file_format
+        return cleaned_data
@@ -0,0 +1,18 @@
+from django import forms
+
+class TrendsForm(forms.Form):
+    """
+    The options of the trends report, read from the query string so the report can be bookmarked.
+    """
+    periods = forms.IntegerField(required=False, initial=6, min_value=1, max_value=24, label="Periods")
+    average_over = forms.IntegerField(required=False, initial=3, min_value=1, max_value=12, label="Average Over")
+
+    def get_options(self):
+        """
+        Returns the number of periods and the periods averaged over, the initial values are used for any that are missing or invalid.
+        """
+        cleaned_data = self.cleaned_data if self.is_valid() else {}
+        return {
+            name: cleaned_data.get(name) or field.initial
+            for name, field in self.fields.items()
+        }
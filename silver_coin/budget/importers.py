@@ -0,0 +1,384 @@
+import csv
+import html
+import io
+import re
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import NamedTuple, Optional
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from .models import ActualAmount
+from .models import Budget
+from .models import PeriodRollup
+
+class StatementRow(NamedTuple):
+    """
+    A transaction read from a bank statement, a negative amount is an expense.
+    """
+    line: int
+    occurred_on: date
+    name: str
+    amount: Decimal
+    # The name of the estimate to record the transaction against, None to use the default
+    estimate: Optional[str]
+
+class ValidRow(NamedTuple):
+    """
+    A statement row that passed validation, with the estimate it is recorded against and the amount made positive.
+    """
+    name: str
+    occurred_on: date
+    amount: Decimal
+    estimate_id: int
+
+class RowError(NamedTuple):
+    """
+    A row of the statement that could not be imported.
+    """
+    line: int
+    message: str
+
+def parse_amount(value):
+    """
+    Parses an amount such as -1,234.50, $12.00 or (12.00).
+
+    :returns: the amount as a Decimal
+    """
+    value = value.strip().replace(",", "").replace("$", "")
+    if value.startswith("(") and value.endswith(")"):
+        value = f"-{value[1:-1]}"
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Amount '{value}' is not a number")
+    if not amount.is_finite():
+        raise ValueError(f"Amount '{value}' is not a number")
+    return amount
+
+ISO_DATE_FORMATS = ("%Y-%m-%d",)
+
+def parse_date(value, formats):
+    """
+    Parses a date trying each of the formats in turn.
+
+    :returns: the date
+    """
+    value = value.strip()
+    if formats == ISO_DATE_FORMATS:
+        # Much faster than strptime for the common case
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Date '{value}' is not a valid date")
+    for date_format in formats:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Date '{value}' is not a valid date")
+
+def parse_csv(lines):
+    """
+    Reads the transactions from a CSV file with a header row.
+
+    The date, amount and name (or description) columns are required, the dates are YYYY-MM-DD.
+    An estimate (or category) column can give the name of the estimate for each row.
+
+    :param: lines, an iterable of the lines of the file
+
+    :returns: a generator of StatementRows and RowErrors
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = {name.strip().lower(): index for index, name in enumerate(header)}
+    name_column = columns.get("name", columns.get("description"))
+    estimate_column = columns.get("estimate", columns.get("category"))
+    if "date" not in columns or "amount" not in columns or name_column is None:
+        yield RowError(reader.line_num, "The header must have date, amount and name columns")
+        return
+
+    width = max(columns.values()) + 1
+    for row in reader:
+        if not any(value.strip() for value in row):
+            continue
+        if len(row) < width:
+            yield RowError(reader.line_num, f"Expected {width} columns but found {len(row)}")
+            continue
+        estimate = row[estimate_column].strip() if estimate_column is not None else ""
+        try:
+            yield StatementRow(
+                reader.line_num,
+                parse_date(row[columns["date"]], ISO_DATE_FORMATS),
+                row[name_column].strip(),
+                parse_amount(row[columns["amount"]]),
+                estimate or None,
+            )
+        except ValueError as error:
+            yield RowError(reader.line_num, str(error))
+
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)")
+
+def parse_ofx(lines):
+    """
+    Reads the transactions from an OFX file, both the SGML (1.x) and XML (2.x) versions.
+
+    Each STMTTRN block becomes a row using DTPOSTED, TRNAMT and NAME (or MEMO).
+    OFX does not have categories so every row uses the default estimate.
+
+    :param: lines, an iterable of the lines of the file
+
+    :returns: a generator of StatementRows and RowErrors
+    """
+    values = None
+    start = 0
+    for line_number, line in enumerate(lines, 1):
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if closing and values is not None:
+                    yield build_ofx_row(start, values)
+                    values = None
+                elif not closing:
+                    values = {}
+                    start = line_number
+            elif values is not None and not closing:
+                values[tag] = html.unescape(value.strip())
+
+def build_ofx_row(line, values):
+    """
+    Builds a row from the values of a STMTTRN block.
+    """
+    try:
+        return StatementRow(
+            line,
+            # The date may be followed by a time and timezone, e.g. 20230628120000[+12:NZST]
+            parse_date(values.get("DTPOSTED", "")[:8], ("%Y%m%d",)),
+            values.get("NAME") or values.get("MEMO", ""),
+            parse_amount(values.get("TRNAMT", "")),
+            None,
+        )
+    except ValueError as error:
+        return RowError(line, str(error))
+
+# QIF dates are month first, the year can be separated by an apostrophe, e.g. 6/28'23
+QIF_DATE_FORMATS = ("%m/%d/%Y", "%m/%d/%y", "%Y-%m-%d")
+
+def parse_qif(lines):
+    """
+    Reads the transactions from a QIF file.
+
+    Each record is ended by a ^ line and uses D (date), T (amount), P (payee) or M (memo), and L (category) lines.
+    The category is used as the name of the estimate.
+
+    :param: lines, an iterable of the lines of the file
+
+    :returns: a generator of StatementRows and RowErrors
+    """
+    values = {}
+    start = None
+    for line_number, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("!"):
+            continue
+        if line.startswith("^"):
+            if values:
+                yield build_qif_row(start, values)
+            values = {}
+            start = None
+            continue
+        if start is None:
+            start = line_number
+        # Split transactions repeat the category and amount, only the first (the total) is kept
+        values.setdefault(line[0], line[1:].strip())
+    if values:
+        yield build_qif_row(start, values)
+
+def build_qif_row(line, values):
+    """
+    Builds a row from the values of a QIF record.
+    """
+    try:
+        return StatementRow(
+            line,
+            parse_date(values.get("D", "").replace("'", "/").replace(" ", ""), QIF_DATE_FORMATS),
+            values.get("P") or values.get("M", ""),
+            parse_amount(values.get("T", values.get("U", ""))),
+            values.get("L") or None,
+        )
+    except ValueError as error:
+        return RowError(line, str(error))
+
+PARSERS = {
+    "csv": parse_csv,
+    "ofx": parse_ofx,
+    "qif": parse_qif,
+}
+
+FORMAT_CHOICES = [
+    ("csv", "CSV"),
+    ("ofx", "OFX"),
+    ("qif", "QIF"),
+]
+
+def detect_format(filename):
+    """
+    Gets the format of a statement from its file extension.
+
+    :returns: the format, or None if the extension is not known
+    """
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return extension if extension in PARSERS else None
+
+class ImportResult():
+    """
+    The number of actual amounts imported and the rows that were rejected.
+    """
+    def __init__(self):
+        self.imported = 0
+        self.errors = []
+        self.duration = 0.0
+
+    @property
+    def rows(self):
+        return self.imported + len(self.errors)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.duration if self.duration > 0 else 0
+
+def validate_rows(rows, period, estimates, defaults, errors):
+    """
+    Checks a batch of statement rows with the ActualAmount field validators and rules.
+
+    The values are checked without creating model instances and the period and estimates are loaded once
+    by the caller, so validating a row does not query the database.
+
+    :param: rows, a list of StatementRows and RowErrors
+    :param: period, the BudgetPeriod the actuals are recorded in
+    :param: estimates, a dictionary of the period's estimates keyed by (amount_type, lowercase name)
+    :param: defaults, a dictionary of the estimate to use for each amount_type when a row does not name one
+    :param: errors, the list the RowErrors are added to
+
+    :returns: a list of the ValidRows
+    """
+    name_field = ActualAmount._meta.get_field("name")
+    amount_field = ActualAmount._meta.get_field("amount")
+    actuals = []
+    for row in rows:
+        if isinstance(row, RowError):
+            errors.append(row)
+            continue
+
+        amount_type = "EX" if row.amount < 0 else "IN"
+        if row.estimate is not None:
+            estimate = estimates.get((amount_type, row.estimate.casefold()))
+            if estimate is None:
+                errors.append(RowError(row.line, f"The period has no {'expense' if amount_type == 'EX' else 'income'} estimate named '{row.estimate}'"))
+                continue
+        else:
+            estimate = defaults.get(amount_type)
+            if estimate is None:
+                errors.append(RowError(row.line, f"No {'expense' if amount_type == 'EX' else 'income'} estimate was given for rows without one"))
+                continue
+
+        amount = abs(row.amount)
+        try:
+            if not row.name:
+                raise ValidationError(f"name: {name_field.error_messages['blank']}")
+            name_field.run_validators(row.name)
+            amount_field.run_validators(amount)
+            ActualAmount.check_amount_and_date(amount, row.occurred_on, period)
+        except ValidationError as error:
+            errors.append(RowError(row.line, " ".join(error.messages)))
+            continue
+        actuals.append(ValidRow(row.name, row.occurred_on, amount, estimate.pk))
+    return actuals
+
+# The columns the imported ActualAmounts are written to
+COPY_FIELDS = ("name", "occurred_on", "amount", "estimate", "period", "version")
+
+def insert_rows(rows, period):
+    """
+    Inserts the valid rows as ActualAmounts of the period, each is given the next change version of the Budget.
+
+    On PostgreSQL the rows are written with COPY, which skips building a model instance and compiling an INSERT
+    for each row. Other databases use bulk_create.
+
+    :param: rows, a list of ValidRows
+    :param: period, the BudgetPeriod the actuals are recorded in
+    """
+    if not rows:
+        return
+    version = Budget.objects.claim_versions({period.budget_id: len(rows)})[period.budget_id]
+    if connection.vendor != "postgresql":
+        ActualAmount.objects.bulk_create([
+            ActualAmount(**row._asdict(), period_id=period.pk, version=version + index) for index, row in enumerate(rows)
+        ])
+        return
+
+    data = io.StringIO()
+    writer = csv.writer(data)
+    for index, row in enumerate(rows):
+        writer.writerow((row.name, row.occurred_on.isoformat(), row.amount, row.estimate_id, period.pk, version + index))
+    data.seek(0)
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(quote_name(ActualAmount._meta.get_field(name).column) for name in COPY_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {quote_name(ActualAmount._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)", data)
+
+def import_actual_amounts(period, lines, file_format, default_income=None, default_expense=None, batch_size=1000):
+    """
+    Imports the transactions of a bank statement as ActualAmounts of the period.
+
+    The file is parsed as it is read and the rows are validated and inserted a batch at a time, see insert_rows,
+    so memory does not grow with the size of the file. Rows that fail validation are skipped and reported,
+    the valid rows are all saved in one transaction. The rows are inserted without the signals that keep the
+    PeriodRollups up to date, so the rollups are updated together at the end.
+
+    :param: period, the BudgetPeriod to record the actuals in
+    :param: lines, an iterable of the lines of the file
+    :param: file_format, one of csv, ofx or qif
+    :param: default_income, the estimate to use for incomes that do not name one
+    :param: default_expense, the estimate to use for expenses that do not name one
+    :param: batch_size, the number of rows validated and inserted at a time
+
+    :returns: an ImportResult
+    """
+    started = time.monotonic()
+    result = ImportResult()
+    period_estimates = list(period.estimates.all())
+    estimates = {(estimate.amount_type, estimate.name.casefold()): estimate for estimate in period_estimates}
+    defaults = {"IN": default_income, "EX": default_expense}
+    # The sum and count of the imported actuals of each estimate
+    totals = defaultdict(lambda: [Decimal(0), 0])
+
+    rows = PARSERS[file_format](lines)
+    with transaction.atomic():
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            actuals = validate_rows(batch, period, estimates, defaults, result.errors)
+            insert_rows(actuals, period)
+            result.imported += len(actuals)
+            for actual in actuals:
+                total = totals[actual.estimate_id]
+                total[0] += actual.amount
+                total[1] += 1
+
+        amount_types = {estimate.pk: estimate.amount_type for estimate in period_estimates}
+        amount_types.update({estimate.pk: estimate.amount_type for estimate in defaults.values() if estimate is not None})
+        PeriodRollup.objects.apply_many(period.pk, {
+            estimate_id: (amount_types[estimate_id], amount, count)
+            for estimate_id, (amount, count) in totals.items()
+        })
+
+    result.duration = time.monotonic() - started
+    return result
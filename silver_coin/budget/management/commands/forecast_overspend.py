@@ -0,0 +1,62 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from budget.forecast import forecast_expenses
+from budget.models import BudgetPeriod
+
+class Command(BaseCommand):
+    """
+    Lists the expense estimates of the periods in progress that are projected to go over.
+
+    Meant to be run nightly from cron: each batch of periods is forecast with one query, see budget.forecast.
+    """
+    help = "Lists the expense estimates of every period in progress that are projected to go over their estimate."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The number of periods to forecast with each query.",
+        )
+        parser.add_argument(
+            "--date",
+            type=date.fromisoformat,
+            default=None,
+            help="The date (YYYY-MM-DD) the spend is projected from, defaults to today.",
+        )
+
+    def handle(self, *args, **options):
+        today = options["date"] or timezone.now().date()
+        checked = 0
+        over = 0
+        last_id = 0
+
+        while True:
+            # Walk the periods in primary key order so memory stays bounded by the batch size
+            periods = list(
+                BudgetPeriod.objects.active(today).filter(pk__gt=last_id)
+                .select_related("budget__owner")
+                .order_by("pk")[:options["batch_size"]]
+            )
+            if not periods:
+                break
+            last_id = periods[-1].pk
+            checked += len(periods)
+
+            forecasts = forecast_expenses([period.pk for period in periods], today)
+            for period in periods:
+                forecast = forecasts.get(period.pk)
+                if forecast is None:
+                    continue
+                for item in forecast["estimates"]:
+                    if item["is_over"]:
+                        over += 1
+                        self.stdout.write(
+                            f"{period.budget.owner.username}: {item['name']} in {period.start_date} to {period.end_date} "
+                            f"is projected to be ${item['projected']} of ${item['estimate']}"
+                        )
+
+        self.stdout.write(self.style.SUCCESS(f"{over} estimates projected to go over in {checked} periods"))
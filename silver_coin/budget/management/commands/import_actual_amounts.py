@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.importers import FORMAT_CHOICES, detect_format, import_actual_amounts
+from budget.models import BudgetPeriod
+
+class Command(BaseCommand):
+    """
+    Imports a CSV, OFX or QIF bank statement as the actual amounts of a budget period.
+    """
+    help = "Imports the transactions of a bank statement as actual amounts of a budget period, reporting the rows that are rejected."
+
+    def add_arguments(self, parser):
+        parser.add_argument("period_id", type=int, help="The id of the budget period to import into.")
+        parser.add_argument("path", help="The statement file.")
+        parser.add_argument(
+            "--format",
+            choices=[choice for choice, _ in FORMAT_CHOICES],
+            default=None,
+            help="The format of the file, defaults to the file extension.",
+        )
+        parser.add_argument("--default-income", default=None, help="The name of the estimate for incomes that do not name one.")
+        parser.add_argument("--default-expense", default=None, help="The name of the estimate for expenses that do not name one.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The number of rows validated and inserted at a time.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            period = BudgetPeriod.objects.get(pk=options["period_id"])
+        except BudgetPeriod.DoesNotExist:
+            raise CommandError(f"Budget period {options['period_id']} does not exist")
+
+        file_format = options["format"] or detect_format(options["path"])
+        if file_format is None:
+            raise CommandError("Could not tell the format from the file extension, please use --format")
+
+        default_income = self.get_estimate(period, "IN", options["default_income"])
+        default_expense = self.get_estimate(period, "EX", options["default_expense"])
+
+        try:
+            with open(options["path"], encoding="utf-8-sig", errors="replace", newline="") as lines:
+                result = import_actual_amounts(
+                    period,
+                    lines,
+                    file_format,
+                    default_income=default_income,
+                    default_expense=default_expense,
+                    batch_size=options["batch_size"],
+                )
+        except OSError as error:
+            raise CommandError(str(error))
+
+        for error in result.errors:
+            self.stderr.write(f"Line {error.line}: {error.message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} of {result.rows} rows in {result.duration:.2f}s "
+            f"({result.rows_per_second:.0f} rows/s)"
+        ))
+
+    def get_estimate(self, period, amount_type, name):
+        """
+        Gets the period's estimate with the name.
+
+        :returns: the estimate Amount, or None if no name was given
+        """
+        if name is None:
+            return None
+        estimate = period.estimates.filter(amount_type=amount_type, name__iexact=name).first()
+        if estimate is None:
+            raise CommandError(f"The period has no {'expense' if amount_type == 'EX' else 'income'} estimate named '{name}'")
+        return estimate
@@ -0,0 +1,166 @@
+import asyncio
+import itertools
+import statistics
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from budget.models import BudgetPeriod
+
+# The sync pages and the async versions of them, and if their url has the period
+ROUTES = [
+    ("dashboard", "async_dashboard", False),
+    ("amount", "async_amount", False),
+    ("actual_amount", "async_actual_amount", True),
+    ("actual_expense_summary", "async_actual_expense_summary", True),
+]
+
+def summarise(timings, elapsed):
+    """
+    Returns the requests per second and the median and 95th percentile latency in milliseconds.
+    """
+    percentiles = statistics.quantiles(timings, n=20) if len(timings) > 1 else timings * 19
+    return len(timings) / elapsed, statistics.median(timings) * 1000, percentiles[18] * 1000
+
+class Command(BaseCommand):
+    """
+    Compares the sync (WSGI) and async (ASGI) read pages under concurrent load.
+
+    The requests are made in process with Django's test clients against the configured database, the WSGI path
+    with a thread per concurrent client and the ASGI path with a task per client on one event loop. It measures
+    Django and the database, not a web server, so use it to compare the two paths and choose the number of
+    threads or workers to try under a real server.
+    """
+    help = "Compares the requests per second and latency of the sync and async read pages under concurrent load."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="The user whose pages are requested, they must have a budget and a period.")
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="The number of requests made to each page on each path.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=10,
+            help="The number of requests in flight at once.",
+        )
+        parser.add_argument(
+            "--period",
+            type=int,
+            default=None,
+            help="The id of the period to request, defaults to the user's latest.",
+        )
+        parser.add_argument(
+            "--cached",
+            action="store_true",
+            help="Use the budget cache, by default it is disabled so every request runs the pages' queries.",
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["username"]).first()
+        if user is None:
+            raise CommandError(f"User '{options['username']}' does not exist")
+        period = BudgetPeriod.objects.for_user(user)
+        period = period.filter(pk=options["period"]) if options["period"] else period.order_by("-start_date")
+        period = period.first()
+        if period is None:
+            raise CommandError("The user does not have that budget period")
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("The requests and concurrency must be at least 1")
+
+        overrides = {
+            # The test clients use testserver as the host
+            "ALLOWED_HOSTS": ["testserver"],
+            "REQUEST_INSTRUMENTATION_SAMPLE_RATE": 0,
+        }
+        if not options["cached"]:
+            overrides["CACHES"] = {
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                "budget": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+            }
+
+        with override_settings(**overrides):
+            # One session is shared by the clients so logging in is not part of the measurement
+            login = Client()
+            login.force_login(user)
+
+            self.stdout.write(f"{options['requests']} requests to each page, {options['concurrency']} at a time")
+            self.stdout.write(f"{'page':<24}{'path':<6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+            for sync_name, async_name, has_period in ROUTES:
+                kwargs = {"period_id": period.pk} if has_period else {}
+                results = [
+                    ("wsgi", self.run_wsgi(reverse(sync_name, kwargs=kwargs), login.cookies, options["requests"], options["concurrency"])),
+                    ("asgi", asyncio.run(self.run_asgi(reverse(async_name, kwargs=kwargs), login.cookies, options["requests"], options["concurrency"]))),
+                ]
+                for path, (timings, elapsed) in results:
+                    per_second, median, p95 = summarise(timings, elapsed)
+                    self.stdout.write(f"{sync_name:<24}{path:<6}{per_second:>10.1f}{median:>10.1f}{p95:>10.1f}")
+
+    def check_response(self, url, response):
+        if response.status_code != 200:
+            raise CommandError(f"{url} returned {response.status_code}")
+
+    def run_wsgi(self, url, cookies, total, concurrency):
+        """
+        Requests the sync page total times from concurrency threads.
+
+        :returns: the duration of each request and the time taken for all of them, in seconds
+        """
+        counter = itertools.count()
+        timings = []
+        errors = []
+
+        def worker():
+            client = Client()
+            client.cookies = cookies
+            try:
+                while next(counter) < total:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    timings.append(time.perf_counter() - start)
+                    self.check_response(url, response)
+            except CommandError as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if errors:
+            raise errors[0]
+        return timings, elapsed
+
+    async def run_asgi(self, url, cookies, total, concurrency):
+        """
+        Requests the async page total times from concurrency tasks.
+
+        :returns: the duration of each request and the time taken for all of them, in seconds
+        """
+        counter = itertools.count()
+        timings = []
+
+        async def worker():
+            client = AsyncClient()
+            client.cookies = cookies
+            while next(counter) < total:
+                start = time.perf_counter()
+                response = await client.get(url)
+                timings.append(time.perf_counter() - start)
+                self.check_response(url, response)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return timings, time.perf_counter() - started
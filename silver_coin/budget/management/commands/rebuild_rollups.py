@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.models import PeriodRollup
+
+class Command(BaseCommand):
+    """
+    Rebuilds the PeriodRollups from the ActualAmounts and verifies them.
+    """
+    help = "Rebuilds the period rollups from scratch and verifies them against the actual amounts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="Only verify the stored rollups, do not rebuild them.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["verify_only"]:
+            count = PeriodRollup.objects.rebuild()
+            self.stdout.write(f"Rebuilt {count} rollups")
+
+        mismatches = PeriodRollup.objects.verify()
+        if mismatches:
+            for period_id, estimate_id in mismatches:
+                self.stderr.write(f"Rollup for period {period_id} estimate {estimate_id or '-'} does not match the actual amounts")
+            raise CommandError(f"{len(mismatches)} rollups do not match the actual amounts")
+
+        self.stdout.write(self.style.SUCCESS("Rollups match the actual amounts"))
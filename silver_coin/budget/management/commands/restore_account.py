@@ -0,0 +1,48 @@
+import zipfile
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from budget.archive import read_manifest, restore_archive
+
+class Command(BaseCommand):
+    """
+    Restores an account archive downloaded from the export_account route.
+    """
+    help = "Bulk loads an account archive into a fresh database, creating the user if they do not exist."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The archive zip file.")
+        parser.add_argument("--username", default=None, help="The user to restore the budget to, defaults to the user in the archive.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The number of rows inserted at a time.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with zipfile.ZipFile(options["path"]) as archive:
+                manifest = read_manifest(archive)
+        except (OSError, zipfile.BadZipFile, ValueError) as error:
+            raise CommandError(str(error))
+
+        username = options["username"] or manifest["username"]
+        owner, created = User.objects.get_or_create(username=username)
+        if created:
+            # The user has to reset their password before they can log in
+            owner.set_unusable_password()
+            owner.save()
+
+        try:
+            counts = restore_archive(options["path"], owner, batch_size=options["batch_size"])
+        except IntegrityError as error:
+            raise CommandError(f"The archive clashes with existing data, it must be restored into a fresh database ({error})")
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        for name, count in counts.items():
+            self.stdout.write(f"{name}: {count} rows")
+        self.stdout.write(self.style.SUCCESS(f"Restored the account of {username}"))
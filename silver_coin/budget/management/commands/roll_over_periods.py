@@ -0,0 +1,86 @@
+import time
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from budget.models import Budget, BudgetPeriod
+
+class Command(BaseCommand):
+    """
+    Creates the missed periods of every budget whose latest period has ended.
+
+    Safe to run from cron: running it again, or from two hosts at the same time, does not create any extra periods.
+    """
+    help = "Creates the next contiguous periods, with their estimates, up to today for every budget whose latest period has ended."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The number of budgets to roll over in each transaction.",
+        )
+        parser.add_argument(
+            "--date",
+            type=date.fromisoformat,
+            default=None,
+            help="The date (YYYY-MM-DD) used to decide if a period has ended, defaults to today.",
+        )
+
+    def handle(self, *args, **options):
+        today = options["date"] or timezone.now().date()
+        batch_size = options["batch_size"]
+        started = time.monotonic()
+        scanned = 0
+        created = 0
+        rolled_over = 0
+        skipped = 0
+        last_id = 0
+
+        while True:
+            # Walk the budgets in primary key order so memory stays bounded by the batch size
+            budget_ids = list(
+                Budget.objects.filter(pk__gt=last_id)
+                .annotate(latest_end_date=Max("budgetperiod__end_date"))
+                .filter(latest_end_date__lt=today)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not budget_ids:
+                break
+            last_id = budget_ids[-1]
+            scanned += len(budget_ids)
+
+            try:
+                periods = BudgetPeriod.objects.create_next_periods(budget_ids, today)
+            except ValidationError:
+                # A period was created by hand at the same time, roll the budgets over one at a time instead
+                periods = []
+                for budget_id in budget_ids:
+                    try:
+                        periods += BudgetPeriod.objects.create_next_periods([budget_id], today)
+                    except ValidationError:
+                        pass
+            created += len(periods)
+            # A budget may be given several periods
+            budgets = len({period.budget_id for period in periods})
+            rolled_over += budgets
+            # Budgets that were locked by another process or were rolled over in the meantime
+            skipped += len(budget_ids) - budgets
+
+            self.stdout.write(f"Rolled over {rolled_over} of {scanned} budgets ({self.rate(created, started):.0f} periods/s)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} periods, skipped {skipped} budgets in {time.monotonic() - started:.2f}s "
+            f"({self.rate(created, started):.0f} periods/s)"
+        ))
+
+    def rate(self, count, started):
+        """
+        Returns the number per second since the command started.
+        """
+        elapsed = time.monotonic() - started
+        return count / elapsed if elapsed > 0 else 0
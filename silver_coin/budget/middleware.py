@@ -0,0 +1,32 @@
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from .models import Budget
+
+def get_budget(request):
+    """
+    Gets the Budget of the user making the request, it is only fetched from the database once per request.
+
+    :param: request, the request being handled
+
+    :returns: the user's Budget, or None if they are not logged in or do not have a Budget
+    """
+    if not hasattr(request, "_cached_budget"):
+        if request.user.is_authenticated:
+            request._cached_budget = Budget.objects.filter(owner=request.user).first()
+        else:
+            request._cached_budget = None
+    return request._cached_budget
+
+class BudgetMiddleware(MiddlewareMixin):
+    """
+    Adds the user's Budget to the request as request.budget.
+
+    The Budget is lazily evaluated so requests that do not use it do not query the database.
+    If the user does not have a Budget then request.budget evaluates to False.
+    Must come after the AuthenticationMiddleware.
+
+    Async views must read it in a sync function run with sync_to_async, see budget/views/asynchronous.py.
+    """
+    def process_request(self, request):
+        request.budget = SimpleLazyObject(lambda: get_budget(request))
@@ -0,0 +1,69 @@
+# Generated by Django 3.2 on 2026-10-18 12:23
+
+from decimal import Decimal
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_rollups(apps, schema_editor):
+    """
+    Creates the rollups for the ActualAmounts that already exist.
+    """
+    ActualAmount = apps.get_model("budget", "ActualAmount")
+    PeriodRollup = apps.get_model("budget", "PeriodRollup")
+
+    rollups = {}
+    grouped = ActualAmount.objects.values(
+        "period_id", "estimate_id", "estimate__amount_type"
+    ).annotate(total=models.Sum("amount"), count=models.Count("actual_id")).order_by()
+    for row in grouped.iterator():
+        prefix = "income" if row["estimate__amount_type"] == "IN" else "expense"
+        for key in ((row["period_id"], None), (row["period_id"], row["estimate_id"])):
+            values = rollups.setdefault(key, {
+                "income_total": Decimal(0),
+                "income_count": 0,
+                "expense_total": Decimal(0),
+                "expense_count": 0,
+            })
+            values[f"{prefix}_total"] += row["total"]
+            values[f"{prefix}_count"] += row["count"]
+
+    PeriodRollup.objects.bulk_create(
+        [
+            PeriodRollup(period_id=period_id, estimate_id=estimate_id, **values)
+            for (period_id, estimate_id), values in rollups.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0003_add_related_name_for_amounts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodRollup',
+            fields=[
+                ('rollup_id', models.AutoField(primary_key=True, serialize=False)),
+                ('income_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('income_count', models.IntegerField(default=0)),
+                ('expense_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expense_count', models.IntegerField(default=0)),
+                ('estimate', models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='budget.amount')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='budget.budgetperiod')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='periodrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'estimate'), name='unique_period_estimate_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='periodrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(estimate__isnull=True), fields=('period',), name='unique_period_rollup'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
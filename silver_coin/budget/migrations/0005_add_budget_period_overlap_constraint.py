@@ -0,0 +1,62 @@
+# Generated by Django 3.2 on 2026-10-18 12:28
+
+from django.db import migrations
+
+# A single value range is used to compare the budget, ranges support equality in a GiST index without needing the
+# btree_gist extension. A period may start on the day the one before it ends, as the overlap check in full_clean
+# allows, so the end date is excluded from the range.
+ADD_CONSTRAINT = (
+    'ALTER TABLE "budget_budgetperiod" ADD CONSTRAINT "exclude_overlapping_budget_periods" EXCLUDE USING GIST '
+    '(INT4RANGE("budget", "budget", \'[]\') WITH =, DATERANGE("start_date", "end_date", \'[)\') WITH &&)'
+)
+DROP_CONSTRAINT = 'ALTER TABLE "budget_budgetperiod" DROP CONSTRAINT "exclude_overlapping_budget_periods"'
+
+def check_overlapping_periods(apps, schema_editor):
+    """
+    Stops the migration with a list of the periods that overlap, the constraint cannot be added while any do.
+
+    The periods are read a budget at a time in order of their start date, so only the latest end date is kept.
+    """
+    BudgetPeriod = apps.get_model("budget", "BudgetPeriod")
+    periods = BudgetPeriod.objects.order_by("budget", "start_date", "budget_period_id").values_list(
+        "budget", "budget_period_id", "start_date", "end_date"
+    )
+    conflicts = []
+    previous = None
+    for budget_id, period_id, start_date, end_date in periods.iterator():
+        if previous is not None and previous[0] == budget_id and start_date < previous[3]:
+            conflicts.append(f"budget {budget_id}: period {period_id} overlaps period {previous[1]}")
+        if previous is None or previous[0] != budget_id or end_date > previous[3]:
+            previous = (budget_id, period_id, start_date, end_date)
+    if conflicts:
+        raise RuntimeError(
+            "Change or delete the overlapping Budget Periods before migrating:\n" + "\n".join(conflicts)
+        )
+
+def add_overlap_constraint(apps, schema_editor):
+    """
+    Adds the constraint that stops the periods of a budget overlapping.
+
+    Exclusion constraints only exist in PostgreSQL, other databases (e.g. SQLite for local tests) skip it. It is not
+    in the model's Meta, so the migrations that follow can alter the table on every database without working around it.
+    """
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(ADD_CONSTRAINT)
+
+def remove_overlap_constraint(apps, schema_editor):
+    """
+    Removes the constraint added by add_overlap_constraint.
+    """
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_CONSTRAINT)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0004_create_period_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_overlapping_periods, migrations.RunPython.noop),
+        migrations.RunPython(add_overlap_constraint, remove_overlap_constraint),
+    ]
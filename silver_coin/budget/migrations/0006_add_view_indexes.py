@@ -0,0 +1,51 @@
+# Generated by Django 3.2 on 2026-10-18 12:33
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyIfPostgres(AddIndexConcurrently):
+    """
+    Builds the index without locking the table for writes on PostgreSQL, other databases (e.g. SQLite for local tests)
+    add the index normally.
+    """
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    # Indexes cannot be created concurrently inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('budget', '0005_add_budget_period_overlap_constraint'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPostgres(
+            model_name='actualamount',
+            index=models.Index(fields=['period', '-occurred_on', '-actual_id'], include=('estimate', 'amount'), name='actual_period_occurred_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='amount',
+            index=models.Index(fields=['budget', 'amount_type'], include=('amount',), name='amount_budget_type_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='amount',
+            index=models.Index(fields=['budget_period', 'amount_type'], include=('amount',), name='amount_period_type_idx'),
+        ),
+        AddIndexConcurrentlyIfPostgres(
+            model_name='budgetperiod',
+            index=models.Index(fields=['budget', '-start_date', '-budget_period_id'], name='period_budget_start_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 3.2 on 2026-10-18 13:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def number_existing_rows(apps, schema_editor):
+    """
+    Gives the rows that already exist distinct change versions, so the first sync can be paged.
+
+    Each table's versions are its primary keys moved past the versions of the tables before it, so every row is
+    numbered by one UPDATE per table rather than one per row.
+    """
+    Budget = apps.get_model("budget", "Budget")
+    offset = 0
+    for name in ("BudgetPeriod", "Amount", "ActualAmount"):
+        model = apps.get_model("budget", name)
+        model.objects.update(version=models.F("pk") + offset)
+        offset += model.objects.aggregate(latest=models.Max("pk"))["latest"] or 0
+    Budget.objects.update(change_version=offset)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0006_add_view_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('tombstone_id', models.AutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('budget_period', 'Budget Period'), ('estimate', 'Estimate'), ('actual_amount', 'Actual Amount')], max_length=13)),
+                ('object_id', models.IntegerField()),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='actualamount',
+            name='version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='amount',
+            name='version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='budget',
+            name='change_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='budgetperiod',
+            name='version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(number_existing_rows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='actualamount',
+            index=models.Index(fields=['period', 'version'], name='actual_period_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='amount',
+            index=models.Index(fields=['budget', 'version'], name='amount_budget_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='amount',
+            index=models.Index(fields=['budget_period', 'version'], name='amount_period_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='budgetperiod',
+            index=models.Index(fields=['budget', 'version'], name='period_budget_version_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='budget',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='budget.budget'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['budget', 'version'], name='tombstone_budget_version_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from .amount import ActualAmount
 from .amount import Amount
 from .budget import Budget
-from .budget_period import BudgetPeriod
\ No newline at end of file
+from .budget_period import BudgetPeriod
+from .period_rollup import PeriodRollup
+from .change_tracking import Tombstone
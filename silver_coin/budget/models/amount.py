@@ -1,27 +1,202 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Avg, Count, ExpressionWrapper, F, Q, StdDev, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
 
+from collections import defaultdict
 from datetime import datetime
+from decimal import Decimal
 from django.core.exceptions import ValidationError
 
+from .change_tracking import ChangeTracked
+from .change_tracking import assign_versions
+from .period_rollup import PeriodRollup
+
+# Written with a decimal place so SQLite does not use integer division
+ONE_HUNDRED = Value(Decimal("100.0"))
+CENT = Decimal("0.01")
+
+class AmountQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """
+        Filters the Amounts to the estimates on the user's Budget or on one of its BudgetPeriods.
+
+        An estimate reaches its Budget through one of two foreign keys, so the ids are selected by a UNION of one
+        inner join per path rather than an OR across two outer joins, letting each side use the indexed owner column.
+        The owner is still checked in the same query, so an amount that is not theirs is not found.
+
+        :param: user, the user that owns the Budget
+
+        :returns: the filtered queryset
+        """
+        amounts = self.model._default_manager
+        on_budget = amounts.filter(budget__owner=user).values("pk")
+        on_period = amounts.filter(budget_period__budget__owner=user).values("pk")
+        return self.filter(pk__in=on_budget.union(on_period))
+
+    def with_actuals(self):
+        """
+        Annotates each estimate with the sum of its actual amounts, the variance and the percentage of the estimate used.
+
+        The actual amounts are summed with a LEFT JOIN and GROUP BY on the estimate, so estimates without any actual amounts
+        are included and estimates sharing a name are kept separate.
+
+        :returns: the queryset annotated with actual_total, variance and percent_used
+        """
+        return self.annotate(
+            actual_total=Coalesce(Sum("actual_amounts__amount"), Decimal(0), output_field=models.DecimalField()),
+        ).annotate(
+            variance=ExpressionWrapper(F("amount") - F("actual_total"), output_field=models.DecimalField()),
+            percent_used=ExpressionWrapper(F("actual_total") * ONE_HUNDRED / NullIf(F("amount"), Value(Decimal(0))), output_field=models.DecimalField()),
+        )
+
+    def summary(self):
+        """
+        Returns the estimates compared with their actual amounts, split into incomes and expenses.
+
+        Runs a single query using with_actuals.
+
+        :returns: a dictionary containing lists of dictionaries with the name, estimate, actual, variance and percent used of each estimate
+        """
+        summary = {"incomes": [], "expenses": []}
+        estimates = self.with_actuals().order_by("name", "amount_id").values(
+            "amount_id", "name", "amount_type", "amount", "actual_total", "variance", "percent_used"
+        )
+        for estimate in estimates:
+            group = "incomes" if estimate["amount_type"] == "IN" else "expenses"
+            summary[group].append({
+                "amount_id": estimate["amount_id"],
+                "name": estimate["name"],
+                "estimate": estimate["amount"],
+                "actual": estimate["actual_total"],
+                "variance": estimate["variance"],
+                "percent_used": estimate["percent_used"],
+            })
+        return summary
+
+    def variance_history(self, today=None):
+        """
+        Returns how the estimates compared with their actual amounts, grouped by type and name across their periods.
+
+        Each estimate is a snapshot made for one period, so grouping them by name gives the history of each Income and Expense.
+        Only the periods that have ended are included, the actual amounts of one in progress or not started are not final.
+        Runs a single grouped query that reads each estimate's actual total from its PeriodRollup row,
+        so the actual amounts are not summed again however many periods there are.
+
+        :param: today, the date the periods must have ended before, defaults to today
+
+        :returns: a dictionary containing lists of dictionaries with the name, the number of estimates, the mean estimate
+        and actual, the mean and standard deviation of the variance and the number of times the actual went over the estimate
+        """
+        actual = Coalesce(
+            F("rollups__income_total") + F("rollups__expense_total"), Decimal(0), output_field=models.DecimalField()
+        )
+        variance = ExpressionWrapper(F("amount") - actual, output_field=models.DecimalField())
+        today = today or timezone.now().date()
+        rows = self.filter(budget_period__end_date__lt=today).values("amount_type", "name").annotate(
+            periods=Count("amount_id"),
+            mean_estimate=Avg("amount"),
+            mean_actual=Avg(actual),
+            mean_variance=Avg(variance),
+            variance_deviation=StdDev(variance),
+            times_over=Count("amount_id", filter=Q(amount__lt=actual)),
+        ).order_by("name")
+
+        def to_decimal(value):
+            # SQLite returns floats, and the averages have more decimal places than the amounts
+            return Decimal(str(value)).quantize(CENT)
+
+        history = {"incomes": [], "expenses": []}
+        for row in rows:
+            group = "incomes" if row["amount_type"] == "IN" else "expenses"
+            history[group].append({
+                "name": row["name"],
+                "periods": row["periods"],
+                "mean_estimate": to_decimal(row["mean_estimate"]),
+                "mean_actual": to_decimal(row["mean_actual"]),
+                "mean_variance": to_decimal(row["mean_variance"]),
+                "variance_deviation": to_decimal(row["variance_deviation"]),
+                "times_over": row["times_over"],
+                "percent_over": (Decimal(row["times_over"]) * 100 / row["periods"]).quantize(CENT),
+            })
+        return history
+
+class ActualAmountQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """
+        Filters the ActualAmounts to the ones recorded against the BudgetPeriods of the user's Budget.
+
+        :param: user, the user that owns the Budget
+
+        :returns: the filtered queryset
+        """
+        return self.filter(period__budget__owner=user)
+
 class AmountManager(models.Manager):
-    def create_amount(self, amount, period):
-        """ 
-        This method will be called when creating a new BudgetPeriod.
-        The Amount objects on the Budget must be copied so they are recorded as they were at the time 
+    def build_copies(self, periods, get_estimates):
+        """
+        Builds the copies of the Budget's estimates for each period, unsaved.
+
+        The Amount objects on the Budget must be copied so they are recorded as they were at the time
         (remember Budget objects can change and historical data should remain unchanged).
+        The name, amount_type and amount are copied and the copy is linked to the period.
+
+        :param: periods, the saved BudgetPeriod objects to link the copies to
+        :param: get_estimates, a function that is passed a period and returns the Amount objects to copy onto it
 
-        The name, amount_type and amount will be copied and the parent will be assigned to either the
-        budget or budget_period depending on the type of the parent.
+        :returns: the list of Amount objects
         """
-        # Link it to a Budget Period
-        self.create(
-            name=amount.name, 
-            amount_type=amount.amount_type, 
-            amount=amount.amount,
-            budget_period=period,
-        )
+        return [
+            self.model(
+                name=amount.name,
+                amount_type=amount.amount_type,
+                amount=amount.amount,
+                budget_period=period,
+            )
+            for period in periods
+            for amount in get_estimates(period)
+        ]
+
+    def create_amounts(self, amounts, periods, batch_size=1000, version=None):
+        """
+        Copies each of the amounts onto each of the periods, see build_copies.
+
+        The copies are inserted with bulk_create, so the number of queries does not depend on the
+        number of amounts or periods. It should be called inside the same transaction as the period inserts.
+
+        :param: amounts, the Budget's Amount objects to copy
+        :param: periods, the saved BudgetPeriod objects to link the copies to
+        :param: version, the first of the change versions already claimed for the copies, they are claimed if not given
+
+        :returns: the list of created Amount objects
+        """
+        copies = self.build_copies(periods, lambda period: amounts)
+        if version is None:
+            assign_versions(copies)
+        else:
+            for index, copy in enumerate(copies):
+                copy.version = version + index
+        return self.bulk_create(copies, batch_size=batch_size)
+
+    def copy_budget_estimates(self, periods, batch_size=1000):
+        """
+        Copies the estimates of each period's Budget onto the period, the periods can belong to different Budgets.
+
+        The estimates of all the Budgets are read in one query and the copies inserted with bulk_create.
+
+        :param: periods, the saved BudgetPeriod objects to copy the estimates onto
 
-class Amount(models.Model):
+        :returns: the list of created Amount objects
+        """
+        estimates = defaultdict(list)
+        for amount in self.filter(budget_id__in={period.budget_id for period in periods}):
+            estimates[amount.budget_id].append(amount)
+
+        copies = self.build_copies(periods, lambda period: estimates[period.budget_id])
+        assign_versions(copies)
+        return self.bulk_create(copies, batch_size=batch_size)
+
+class Amount(ChangeTracked):
     """
     An Amount represents an estimate expense/income or an actual expense/income.
     An Amount may be linked to either a Budget or BudgetPeriod but not both.
@@ -43,8 +218,38 @@ class Amount(models.Model):
     budget_period = models.ForeignKey("BudgetPeriod", null=True, blank=True, default=None, db_column="budget_period", on_delete=models.CASCADE, verbose_name="Budget Period", related_name="estimates")
 
     # Define the model manager
-    objects = AmountManager()
+    objects = AmountManager.from_queryset(AmountQuerySet)()
+
+    class Meta:
+        indexes = [
+            # The incomes and expenses of a Budget or BudgetPeriod are always listed and totalled separately,
+            # including the amount lets PostgreSQL total them from the index alone
+            models.Index(fields=["budget", "amount_type"], include=["amount"], name="amount_budget_type_idx"),
+            models.Index(fields=["budget_period", "amount_type"], include=["amount"], name="amount_period_type_idx"),
+            # The estimates changed since a client last synced
+            models.Index(fields=["budget", "version"], name="amount_budget_version_idx"),
+            models.Index(fields=["budget_period", "version"], name="amount_period_version_idx"),
+        ]
+
+    TOMBSTONE_KIND = "estimate"
+    budget_paths = ("budget", "budget_period__budget")
 
+    def delete(self, *args, **kwargs):
+        """
+        Override to take the estimate's actual amounts out of its period's rollup.
+
+        The actual amounts and the estimate's own rollup row are deleted by the cascade without being loaded,
+        the period's row is reduced by the estimate's rollup in one grouped update.
+        """
+        with transaction.atomic():
+            if self.budget_period_id is not None:
+                prefix = "income" if self.amount_type == "IN" else "expense"
+                rollup = self.rollups.values_list(f"{prefix}_total", f"{prefix}_count").first()
+                if rollup is not None:
+                    PeriodRollup.objects.apply_many(
+                        self.budget_period_id, {self.pk: (self.amount_type, -rollup[0], -rollup[1])}
+                    )
+            return super().delete(*args, **kwargs)
 
     def full_clean(self, exclude=None, validate_unique=True, validate_constraints=True):
         """
@@ -54,9 +259,10 @@ class Amount(models.Model):
         """
         super().full_clean()
 
-        if self.budget is None and self.budget_period is None:
+        # The ids are checked so the related objects are not fetched from the database
+        if self.budget_id is None and self.budget_period_id is None:
             raise ValidationError("An Amount must be linked to either a Budget or BudgetPeriod")
-        elif self.budget is not None and self.budget_period is not None:
+        elif self.budget_id is not None and self.budget_period_id is not None:
             raise ValidationError("An Amount cannot be linked to both a Budget and BudgetPeriod")
 
         if self.amount <= 0:
@@ -67,14 +273,18 @@ class Amount(models.Model):
         """
         Returns the percentage of the income the amount is rounded to 2dp.
         """
-        income = self.budget.total_income()
-        if income != 0:
-            percentage = (self.amount / income) * 100
+        if hasattr(self, "percentage_of_income"):
+            percentage = self.percentage_of_income
+        else:
+            income = self.budget.total_income()
+            percentage = (self.amount / income) * 100 if income != 0 else None
+
+        if percentage is not None:
             return "{:0.2f}".format(percentage)
         else:
             return "N/A"
     
-class ActualAmount(models.Model):
+class ActualAmount(ChangeTracked):
     """
     An ActualAmount is the model that represents what a user actually spends.
 
@@ -88,15 +298,66 @@ class ActualAmount(models.Model):
     estimate = models.ForeignKey("Amount", null=False, on_delete=models.CASCADE, related_name="actual_amounts")
     period = models.ForeignKey("BudgetPeriod", null=False, on_delete=models.CASCADE, related_name="amounts")
 
+    # Define the model manager
+    objects = ActualAmountQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The actual amounts of a period are listed newest first
+            models.Index(fields=["period", "-occurred_on", "-actual_id"], include=["estimate", "amount"], name="actual_period_occurred_idx"),
+            # The actual amounts changed since a client last synced
+            models.Index(fields=["period", "version"], name="actual_period_version_idx"),
+        ]
+
+    TOMBSTONE_KIND = "actual_amount"
+    budget_paths = ("period__budget",)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Override to remember the values as they were loaded so the rollups can be moved when the amount is edited.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, (value for value in values if value is not models.DEFERRED)))
+        return instance
+
+    def delete(self, *args, **kwargs):
+        """
+        Override to take the ActualAmount out of the rollups.
+
+        This is not a post_delete receiver as any delete receiver stops Django deleting the actual amounts of a
+        deleted period or estimate in one query, those rollup rows are deleted by the same cascade.
+        The estimate's type decides which totals it is taken from, so the estimate should be selected with the amount
+        (select_related("estimate")) rather than loaded by another query here.
+        """
+        with transaction.atomic():
+            period_id, estimate_id, amount_type = self.period_id, self.estimate_id, self.estimate.amount_type
+            result = super().delete(*args, **kwargs)
+            PeriodRollup.objects.apply(period_id, estimate_id, amount_type, self.amount, sign=-1)
+            return result
+
     def full_clean(self, exclude=None, validate_unique=True, validate_constraints=True) -> None:
         super().full_clean()
 
-        if self.amount <= 0:
+        self.check_amount_and_date(self.amount, self.occurred_on, self.period)
+
+    @staticmethod
+    def check_amount_and_date(amount, occurred_on, period):
+        """
+        Checks the amount is positive and the actual occurred within the period.
+
+        Split out of full_clean so the importer can check many rows against a period it has already loaded.
+
+        :param: amount, the amount of the actual
+        :param: occurred_on, the date the actual occurred on
+        :param: period, the BudgetPeriod the actual belongs to
+        """
+        if amount <= 0:
             raise ValidationError("Amount must be greater than zero")
         
-        if self.occurred_on < self.period.start_date:
+        if occurred_on < period.start_date:
             raise ValidationError("Occurred On must be greater than or equal to period start date")
-        elif self.occurred_on > self.period.end_date:
+        elif occurred_on > period.end_date:
             raise ValidationError("Occurred On must be less than or equal to the end date")
         
     @property
@@ -104,9 +365,13 @@ class ActualAmount(models.Model):
         """
         Returns the percentage of the income the amount is rounded to 2dp.
         """
-        income = self.period.total_income()
-        if income != 0:
-            percentage = (self.amount / income) * 100
+        if hasattr(self, "percentage_of_income"):
+            percentage = self.percentage_of_income
+        else:
+            income = self.period.total_income()
+            percentage = (self.amount / income) * 100 if income != 0 else None
+
+        if percentage is not None:
             return "{:0.2f}".format(percentage)
         else:
             return "N/A"
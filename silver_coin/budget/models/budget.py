@@ -1,10 +1,77 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import connections, models, transaction
+from django.db.models import BigIntegerField, Case, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import MaxLengthValidator, MinValueValidator
 from django.core.exceptions import ValidationError
 
 from ..helpers import PERIOD_CHOICES
 
+def supports_update_returning(connection):
+    """
+    Returns if the database can return the updated values from an UPDATE, PostgreSQL and SQLite 3.35+ can.
+    """
+    if connection.vendor == "postgresql":
+        return True
+    return connection.vendor == "sqlite" and connection.Database.sqlite_version_info >= (3, 35)
+
+class BudgetQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotates each Budget with the estimated income, expense and NET amount.
+
+        The three values are calculated by the database in a single conditional aggregate query
+        and are picked up by total_income, total_expense and net_amount instead of querying again.
+        """
+        income = Coalesce(Sum("amounts__amount", filter=Q(amounts__amount_type="IN")), Decimal(0), output_field=models.DecimalField())
+        expense = Coalesce(Sum("amounts__amount", filter=Q(amounts__amount_type="EX")), Decimal(0), output_field=models.DecimalField())
+        return self.annotate(
+            income_total=income,
+            expense_total=expense,
+        ).annotate(
+            net_total=F("income_total") - F("expense_total")
+        )
+
+    def claim_versions(self, counts):
+        """
+        Claims the next change versions of the Budgets for the rows that are about to be written.
+
+        Each Budget's change_version is incremented by one UPDATE, which also locks the Budget's row until the transaction ends
+        and returns the new versions where the database supports it.
+        The changes to a Budget are therefore given their versions in the order they are committed, so a client that
+        has synced up to a version cannot miss a change committed later with a lower one. Must be called in a transaction.
+
+        :param: counts, a dictionary of the number of versions to claim keyed by budget id
+
+        :returns: a dictionary of the first claimed version keyed by budget id, the rest follow on from it
+        """
+        if not counts:
+            return {}
+        connection = connections[self.db]
+        if supports_update_returning(connection):
+            # The new versions are read back by the UPDATE itself
+            quote = connection.ops.quote_name
+            table, pk, version = quote(self.model._meta.db_table), quote("budget_id"), quote("change_version")
+            whens = " ".join(["WHEN %s THEN %s"] * len(counts))
+            placeholders = ", ".join(["%s"] * len(counts))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {table} SET {version} = {version} + CASE {pk} {whens} ELSE 0 END "
+                    f"WHERE {pk} IN ({placeholders}) RETURNING {pk}, {version}",
+                    [value for item in counts.items() for value in item] + list(counts),
+                )
+                versions = dict(cursor.fetchall())
+        else:
+            self.filter(pk__in=counts).update(change_version=F("change_version") + Case(
+                *[When(pk=budget_id, then=Value(count)) for budget_id, count in counts.items()],
+                default=Value(0),
+                output_field=BigIntegerField(),
+            ))
+            versions = dict(self.filter(pk__in=counts).values_list("budget_id", "change_version"))
+        return {budget_id: versions[budget_id] - count + 1 for budget_id, count in counts.items()}
+
 class Budget(models.Model):
     """
     This model is the core of the project and what the other models will be based around.
@@ -18,6 +85,28 @@ class Budget(models.Model):
     period_length = models.IntegerField(validators=[MinValueValidator(1, "Period Length must be greater than zero")], null=False, blank=False, default=1, verbose_name="Period Length")
     # Link to the User so that we can easily filter by the logged in User
     owner = models.ForeignKey(User, null=False, editable=False, on_delete=models.CASCADE, db_column="owner")
+    # The version of the latest change to the budget or its periods, estimates and actual amounts, see claim_versions
+    change_version = models.BigIntegerField(null=False, default=0, editable=False)
+
+    # Define the model manager
+    objects = BudgetQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        """
+        Override so an edit is given a change version and never writes back a change_version that was loaded before
+        another request claimed newer versions.
+        """
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            if kwargs.get("update_fields") is None:
+                kwargs["update_fields"] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name != "change_version"
+                ]
+            super().save(*args, **kwargs)
+            self.change_version = Budget.objects.claim_versions({self.pk: 1})[self.pk]
 
     def clean(self):
         """
@@ -29,20 +118,33 @@ class Budget(models.Model):
         except User.DoesNotExist:
             raise ValidationError("Budget must be linked to a User")
         
+    def totals(self):
+        """
+        Returns a dictionary containing the income, expense and net totals.
+
+        Uses the values annotated by BudgetQuerySet.with_totals when present, otherwise the totals are aggregated
+        by the database in one query.
+        """
+        if hasattr(self, "income_total"):
+            return {"income": self.income_total, "expense": self.expense_total, "net": self.net_total}
+
+        totals = Budget.objects.filter(pk=self.pk).with_totals().values("income_total", "expense_total", "net_total").get()
+        return {"income": totals["income_total"], "expense": totals["expense_total"], "net": totals["net_total"]}
+
     def total_income(self):
         """
         Returns the total income.
         """
-        return sum([income.amount for income in self.amounts.filter(amount_type="IN")])
+        return self.totals()["income"]
     
     def total_expense(self):
         """
         Returns the total expense.
         """
-        return sum([expense.amount for expense in self.amounts.filter(amount_type="EX")])
+        return self.totals()["expense"]
     
     def net_amount(self):
         """
         The estimated NET amount of the budget.
         """
-        return self.total_income() - self.total_expense()
\ No newline at end of file
+        return self.totals()["net"]
@@ -1,6 +1,10 @@
+from contextlib import contextmanager
+from decimal import Decimal
+
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Q
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import datetime, timedelta
 
@@ -9,8 +13,176 @@ from dateutil.relativedelta import relativedelta
 from ..helpers import DAYS, WEEKS, MONTHS, YEARS
 
 from ..models import Amount
+from ..models import Budget
+from .change_tracking import ChangeTracked
+from .change_tracking import assign_versions
+from .period_rollup import PeriodRollup
+
+OVERLAP_MESSAGE = "Budget Period overlaps with existing period, please check the dates and try again!"
+# The PostgreSQL exclusion constraint added by migration 0005, it is not in the model's Meta as other databases lack it
+OVERLAP_CONSTRAINT = "exclude_overlapping_budget_periods"
 
-class BudgetPeriod(models.Model):
+@contextmanager
+def atomic_overlap_check():
+    """
+    Runs the block in a transaction and raises the overlap ValidationError if the exclusion constraint is violated.
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as error:
+        if OVERLAP_CONSTRAINT in str(error):
+            raise ValidationError(OVERLAP_MESSAGE)
+        raise
+
+class BudgetPeriodQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """
+        Filters the BudgetPeriods to the ones belonging to the user's Budget.
+
+        Ownership is checked by joining to the Budget on its indexed owner column, so fetching a period
+        through this queryset checks the owner in the same query and a period that is not theirs is not found.
+
+        :param: user, the user that owns the Budget
+
+        :returns: the filtered queryset
+        """
+        return self.filter(budget__owner=user)
+
+    def active(self, today=None):
+        """
+        Filters the BudgetPeriods to the ones that have started and not ended.
+
+        :param: today, defaults to today
+
+        :returns: the filtered queryset
+        """
+        today = today or timezone.now().date()
+        return self.filter(start_date__lte=today, end_date__gte=today)
+
+    def with_totals(self):
+        """
+        Annotates each BudgetPeriod with the actual income, expense and NET amount.
+
+        The three values are calculated by the database in a single conditional aggregate query
+        and are picked up by total_income, total_expense and net_amount instead of querying again.
+        """
+        income = Coalesce(Sum("amounts__amount", filter=Q(amounts__estimate__amount_type="IN")), Decimal(0), output_field=models.DecimalField())
+        expense = Coalesce(Sum("amounts__amount", filter=Q(amounts__estimate__amount_type="EX")), Decimal(0), output_field=models.DecimalField())
+        return self.annotate(
+            income_total=income,
+            expense_total=expense,
+        ).annotate(
+            net_total=F("income_total") - F("expense_total")
+        )
+
+    def create_periods(self, budget, count, start_date=None):
+        """
+        Creates the next count contiguous periods of a budget with their estimates.
+
+        The periods and the estimate copies are each inserted with bulk_create in one transaction,
+        so the number of queries does not depend on the number of periods or estimates.
+
+        :param: budget, the Budget to create the periods for
+        :param: count, the number of periods to create
+        :param: start_date, the start of the first period, defaults to the day after the budget's latest period ends or today
+
+        :returns: the list of created BudgetPeriod objects
+        """
+        if start_date is None:
+            latest_end_date = self.filter(budget=budget).aggregate(latest=models.Max("end_date"))["latest"]
+            start_date = latest_end_date + timedelta(days=1) if latest_end_date else timezone.now().date()
+
+        periods = []
+        for _ in range(count):
+            period = self.model(start_date=start_date, budget=budget)
+            period.end_date = period.calculate_end_date()
+            periods.append(period)
+            start_date = period.end_date + timedelta(days=1)
+
+        if not periods:
+            return periods
+
+        overlapping = self.filter(
+            budget=budget,
+            start_date__lt=periods[-1].end_date,
+            end_date__gt=periods[0].start_date,
+        )
+        if overlapping.exists():
+            raise ValidationError(OVERLAP_MESSAGE)
+
+        with atomic_overlap_check():
+            # The versions of the periods and the estimate copies are claimed together
+            amounts = list(Amount.objects.filter(budget=budget))
+            version = Budget.objects.claim_versions({budget.pk: len(periods) * (len(amounts) + 1)})[budget.pk]
+            for period in periods:
+                period.version = version
+                version += 1
+            periods = self.bulk_create(periods)
+            # Databases that cannot return the ids from a bulk insert need to fetch them
+            if periods[0].pk is None:
+                periods = list(self.filter(
+                    budget=budget,
+                    start_date__gte=periods[0].start_date,
+                    start_date__lte=periods[-1].start_date,
+                ).order_by("start_date"))
+            Amount.objects.create_amounts(amounts, periods, version=version)
+
+        return periods
+
+    def create_next_periods(self, budget_ids, today=None):
+        """
+        Creates the next contiguous periods, with their estimates, for each of the budgets whose latest period has ended.
+
+        A budget that has missed several periods is given all of them, up to the period that has not ended on today,
+        so one run catches every budget up. The budgets are locked with SELECT ... FOR UPDATE SKIP LOCKED and checked again once locked, so running this
+        at the same time from two processes (or running it twice) never creates a period twice. The periods and
+        estimates of all the budgets are inserted with bulk_create, so the number of queries does not depend on the
+        number of budgets.
+
+        :param: budget_ids, the ids of the budgets to roll over
+        :param: today, the date used to decide if a period has ended, defaults to today
+
+        :returns: the list of created BudgetPeriod objects
+        """
+        today = today or timezone.now().date()
+        with atomic_overlap_check():
+            locked_ids = list(
+                Budget.objects.select_for_update(skip_locked=True).filter(pk__in=budget_ids).values_list("pk", flat=True)
+            )
+            # Another process may have rolled the budget over before the lock was taken
+            budgets = Budget.objects.filter(pk__in=locked_ids).annotate(
+                latest_end_date=models.Max("budgetperiod__end_date")
+            ).filter(latest_end_date__lt=today)
+
+            periods = []
+            for budget in budgets:
+                end_date = budget.latest_end_date
+                while end_date < today:
+                    period = self.model(start_date=end_date + timedelta(days=1), budget=budget)
+                    period.end_date = end_date = period.calculate_end_date()
+                    periods.append(period)
+
+            if not periods:
+                return periods
+
+            assign_versions(periods)
+            periods = self.bulk_create(periods)
+            # Databases that cannot return the ids from a bulk insert need to fetch them
+            if periods[0].pk is None:
+                created = {(period.budget_id, period.start_date) for period in periods}
+                periods = [
+                    period for period in self.filter(
+                        budget_id__in=[period.budget_id for period in periods],
+                        start_date__gte=min(period.start_date for period in periods),
+                    )
+                    if (period.budget_id, period.start_date) in created
+                ]
+            Amount.objects.copy_budget_estimates(periods)
+
+        return periods
+
+class BudgetPeriod(ChangeTracked):
     """
     A Budget Period is based on a Budget object. The end date is calculated using the period type and length from the Budget and is not editable.
     The estimates should be copied from the Budget as well. This is because a Budget object can change and we want to keep a record of the estimates as they were at the
@@ -24,45 +196,60 @@ class BudgetPeriod(models.Model):
     # Actual Incomes are defined on the Amount model
     budget = models.ForeignKey("Budget", null=False, blank=False, db_column="budget", on_delete=models.CASCADE, verbose_name="Budget")
 
+    # Define the model manager
+    objects = BudgetPeriodQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The periods of a budget are listed newest first
+            models.Index(fields=["budget", "-start_date", "-budget_period_id"], name="period_budget_start_idx"),
+            # The periods changed since a client last synced
+            models.Index(fields=["budget", "version"], name="period_budget_version_idx"),
+        ]
+
+    TOMBSTONE_KIND = "budget_period"
+    budget_paths = ("budget",)
+
     def full_clean(self, exclude=None, validate_unique=True):
         super().full_clean(exclude=["end_date"])
         end_date = self.calculate_end_date()
 
+        # Only the periods of the same budget can overlap, this uses the index on the budget.
+        # A period may start on the day another ends, see the exclusion constraint
+        overlapping = BudgetPeriod.objects.filter(
+            budget_id=self.budget_id,
+            start_date__lt=end_date,
+            end_date__gt=self.start_date,
+        )
         # If we are editing an existing period exclude the current model instance
         if self.budget_period_id:
-            # Once the dates are calculated, double check that there are no overlapping periods
-            overlapping_count = BudgetPeriod.objects.filter(
-                ~Q(budget_period_id=self.budget_period_id),
-                Q(start_date__lte=self.start_date, end_date__gt=self.start_date) |
-                Q(start_date__lte=end_date, end_date__gt=end_date)
-            ).count()
-        else:
-            # Once the dates are calculated, double check that there are no overlapping periods
-            overlapping_count = BudgetPeriod.objects.filter(
-                Q(start_date__lte=self.start_date, end_date__gt=self.start_date) |
-                Q(start_date__lte=end_date, end_date__gt=end_date)
-            ).count()
-        if overlapping_count > 0:
-            raise ValidationError("Budget Period overlaps with existing period, please check the dates and try again!")
+            overlapping = overlapping.exclude(budget_period_id=self.budget_period_id)
+        if overlapping.exists():
+            raise ValidationError(OVERLAP_MESSAGE)
         
         return None
 
     def save(self, *args, **kwargs):
+        """
+        Override to calculate the end date and copy the estimates when the period is created.
+
+        The period and its estimates are inserted in one transaction. The exclusion constraint stops periods that are
+        saved at the same time from overlapping, if it is violated a ValidationError with the overlap message is raised.
+        """
         self.end_date = self.calculate_end_date()
 
-        # Only create amounts if it is the first time saving
-        if self._state.adding:
-            super().save(*args, **kwargs)
+        with atomic_overlap_check():
+            # Only create amounts if it is the first time saving
+            if self._state.adding:
+                super().save(*args, **kwargs)
 
-            # Create the Incomes and Expense for this Budget Period
-            costs = Amount.objects.filter(budget=self.budget)
-            for cost in costs.all():
                 # Copy the estimates from the budget as they are currently
-                Amount.objects.create_amount(cost, self)
-            
-            return None
-        else:
-            return super().save(*args, **kwargs)
+                costs = Amount.objects.filter(budget=self.budget)
+                Amount.objects.create_amounts(costs, [self])
+                
+                return None
+            else:
+                return super().save(*args, **kwargs)
         
     def calculate_end_date(self):
         """
@@ -86,37 +273,58 @@ class BudgetPeriod(models.Model):
         Returns if the Budget period has ended.
         """
         return self.end_date < timezone.now().date()
+
+    def is_active(self, today=None):
+        """
+        Returns if the Budget period has started and not ended.
+        """
+        today = today or timezone.now().date()
+        return self.start_date <= today <= self.end_date
     
+    def totals(self):
+        """
+        Returns a dictionary containing the actual income, expense and net totals.
+
+        Uses the values annotated by BudgetPeriodQuerySet.with_totals when present, otherwise the totals are read
+        from the period's PeriodRollup row.
+        """
+        if hasattr(self, "income_total"):
+            return {"income": self.income_total, "expense": self.expense_total, "net": self.net_total}
+
+        return PeriodRollup.objects.period_totals(self.pk)
+
     def total_income(self):
         """
         Returns the total income.
         """
-        return sum([income.amount for income in self.amounts.filter(estimate__amount_type="IN")])
+        return self.totals()["income"]
     
     def total_expense(self):
         """
         Returns the total expense.
         """
-        return sum([expense.amount for expense in self.amounts.filter(estimate__amount_type="EX")])
+        return self.totals()["expense"]
     
     def net_amount(self):
         """
-        The estimated NET amount of the budget.
+        The actual NET amount of the budget period.
         """
-        return self.total_income() - self.total_expense()
+        return self.totals()["net"]
     
+    def summary(self):
+        """
+        Returns the estimates of the period compared with their actual amounts, split into incomes and expenses.
+
+        :returns: a dictionary containing the incomes and expenses summaries, see AmountQuerySet.summary
+        """
+        return self.estimates.summary()
+
     def summary_by_group(self, is_expense):
         """
-        Returns a dictionary containing the amount for each amount type.
+        Returns the summary for each estimate of the given type.
 
         :param: is_expense, if the amount is an expense
 
-        :returns: a dictionary containing the sum for each amount
+        :returns: a list of dictionaries containing the estimate and actual sum for each estimate
         """
-        amount_type = "EX" if is_expense else "IN"
-        sums = {}
-        for amount in Amount.objects.filter(budget_period=self, amount_type=amount_type):
-            amount_sum = sum([actual.amount for actual in self.amounts.filter(estimate__amount_type=amount_type)])
-            name = amount.name
-            sums[name] = amount_sum
-        return sums
\ No newline at end of file
+        return self.summary()["expenses" if is_expense else "incomes"]
@@ -0,0 +1,141 @@
+from collections import Counter
+
+from django.core import checks
+from django.db import models, transaction
+
+from .budget import Budget
+
+def assign_versions(instances, budget_id=None):
+    """
+    Gives each of the instances the next change version of its Budget, for rows written with bulk_create or bulk_update.
+
+    The versions of every Budget are claimed together, so the number of queries does not depend on the number of instances.
+    Must be called in the transaction that writes the instances.
+
+    :param: instances, the ChangeTracked model instances about to be written
+    :param: budget_id, the id of the Budget if all the instances belong to it, saves looking it up for each instance
+    """
+    budget_ids = [budget_id if budget_id is not None else instance.get_budget_id() for instance in instances]
+    versions = Budget.objects.claim_versions(Counter(budget_id for budget_id in budget_ids if budget_id is not None))
+    for instance, budget_id in zip(instances, budget_ids):
+        if budget_id is None:
+            continue
+        instance.version = versions[budget_id]
+        versions[budget_id] += 1
+
+class ChangeTracked(models.Model):
+    """
+    An abstract model for the rows a client can sync, each write is given the next change version of the row's Budget.
+
+    Deleting a row records a Tombstone so clients can remove it too. The rows deleted along with it by a cascade
+    do not get their own Tombstones, clients delete a period's estimates and actual amounts with the period.
+
+    Subclasses set budget_paths and TOMBSTONE_KIND.
+    """
+    version = models.BigIntegerField(null=False, default=0, editable=False)
+
+    # The foreign keys that lead from the row to its Budget, tried in order until one is set. Each is a foreign key
+    # to the Budget, or a foreign key followed by the related row's foreign key to the Budget, e.g. "period__budget"
+    budget_paths = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def check(cls, **kwargs):
+        """
+        Override to check the model says how to find its Budget.
+        """
+        errors = super().check(**kwargs)
+        if not cls.budget_paths:
+            errors.append(checks.Error("ChangeTracked models must set budget_paths.", obj=cls, id="budget.E001"))
+        return errors
+
+    def get_budget_id(self):
+        """
+        Returns the id of the Budget the row belongs to, see budget_paths.
+
+        The related row is only queried when it has not been loaded, and then only for its Budget's id.
+
+        :returns: the id, or None if none of the paths are set
+        """
+        for path in self.budget_paths:
+            name, _, budget_name = path.partition("__")
+            field = self._meta.get_field(name)
+            related_id = getattr(self, field.attname)
+            if related_id is None:
+                continue
+            if not budget_name:
+                return related_id
+            budget_attname = field.related_model._meta.get_field(budget_name).attname
+            if field.is_cached(self):
+                return getattr(getattr(self, name), budget_attname)
+            return field.related_model._default_manager.filter(pk=related_id).values_list(budget_attname, flat=True).first()
+        return None
+
+    def save(self, *args, **kwargs):
+        """
+        Override to give the row the next change version, the version is claimed in the same transaction as the write.
+        """
+        with transaction.atomic():
+            budget_id = self.get_budget_id()
+            # Rows that do not belong to a Budget yet will fail validation, they are left for it to report
+            if budget_id is not None:
+                self.version = Budget.objects.claim_versions({budget_id: 1})[budget_id]
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+            return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """
+        Override to record a Tombstone for the row.
+        """
+        with transaction.atomic():
+            budget_id = self.get_budget_id()
+            if budget_id is not None:
+                Tombstone.objects.record(budget_id, self.TOMBSTONE_KIND, [self.pk])
+            return super().delete(*args, **kwargs)
+
+class TombstoneManager(models.Manager):
+    def record(self, budget_id, kind, object_ids):
+        """
+        Records the deletion of rows of a Budget, each is given the next change version.
+
+        :param: budget_id, the id of the Budget the rows belonged to
+        :param: kind, the kind of the rows, one of Tombstone.KINDS
+        :param: object_ids, the primary keys of the deleted rows
+
+        :returns: the list of created Tombstones
+        """
+        if not object_ids:
+            return []
+        version = Budget.objects.claim_versions({budget_id: len(object_ids)})[budget_id]
+        return self.bulk_create([
+            self.model(budget_id=budget_id, kind=kind, object_id=object_id, version=version + index)
+            for index, object_id in enumerate(object_ids)
+        ])
+
+class Tombstone(models.Model):
+    """
+    A Tombstone records that a BudgetPeriod, estimate or ActualAmount was deleted so syncing clients can delete it too.
+    """
+    KINDS = [
+        ("budget_period", "Budget Period"),
+        ("estimate", "Estimate"),
+        ("actual_amount", "Actual Amount"),
+    ]
+
+    tombstone_id = models.AutoField(primary_key=True)
+    budget = models.ForeignKey("Budget", null=False, on_delete=models.CASCADE, related_name="tombstones")
+    kind = models.CharField(choices=KINDS, null=False, max_length=13)
+    # The primary key of the deleted row
+    object_id = models.IntegerField(null=False)
+    version = models.BigIntegerField(null=False)
+
+    # Define the model manager
+    objects = TombstoneManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["budget", "version"], name="tombstone_budget_version_idx"),
+        ]
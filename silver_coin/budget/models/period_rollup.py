@@ -0,0 +1,311 @@
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Case, Count, DecimalField, F, Func, IntegerField, Q, RowRange, Sum, Value, When, Window
+from django.db.models.functions import Coalesce, Lag
+
+from .budget import Budget
+
+CENT = Decimal("0.01")
+
+class WindowAvg(Func):
+    """
+    AVG as a window function, Django's Avg cannot be given an aggregate such as a grouped Sum.
+    """
+    function = "AVG"
+    window_compatible = True
+    output_field = DecimalField()
+
+class PeriodRollupManager(models.Manager):
+    def apply(self, period_id, estimate_id, amount_type, amount, sign=1, count=1):
+        """
+        Adds an ActualAmount to, or removes it from, the rollups.
+
+        Both the period row and the estimate row are updated in one UPDATE using F() expressions,
+        so concurrent writes to the same period cannot lose an update.
+
+        :param: period_id, the id of the BudgetPeriod the actual belongs to
+        :param: estimate_id, the id of the estimate Amount the actual belongs to
+        :param: amount_type, the type of the estimate, either IN or EX
+        :param: amount, the amount of the actual
+        :param: sign, 1 to add the actual, -1 to remove it
+        :param: count, the number of actuals the amount is the sum of, for adding many at once
+        """
+        prefix = "income" if amount_type == "IN" else "expense"
+        amount = Decimal(str(amount)) * sign
+        count = count * sign
+        with transaction.atomic():
+            # Rows are only created when adding, a removal may be the result of the period being deleted
+            if sign > 0:
+                self.get_or_create(period_id=period_id, estimate_id=None)
+                self.get_or_create(period_id=period_id, estimate_id=estimate_id)
+            self.filter(
+                Q(estimate_id__isnull=True) | Q(estimate_id=estimate_id),
+                period_id=period_id,
+            ).update(**{
+                f"{prefix}_total": F(f"{prefix}_total") + amount,
+                f"{prefix}_count": F(f"{prefix}_count") + count,
+            })
+
+    def apply_many(self, period_id, changes):
+        """
+        Adds many changes to the rollups of a period at once, for when ActualAmounts are written in bulk.
+
+        The missing rollup rows are created with one INSERT and every row is updated with one UPDATE,
+        so the number of queries does not depend on the number of estimates.
+
+        :param: period_id, the id of the BudgetPeriod the actuals belong to
+        :param: changes, a dictionary keyed by estimate id of (amount_type, amount, count) to add, negative to remove
+        """
+        if not changes:
+            return None
+
+        period_change = {"income_total": Decimal(0), "income_count": 0, "expense_total": Decimal(0), "expense_count": 0}
+        estimate_changes = {field: [] for field in period_change}
+        for estimate_id, (amount_type, amount, count) in changes.items():
+            prefix = "income" if amount_type == "IN" else "expense"
+            period_change[f"{prefix}_total"] += amount
+            period_change[f"{prefix}_count"] += count
+            estimate_changes[f"{prefix}_total"].append(When(estimate_id=estimate_id, then=Value(amount)))
+            estimate_changes[f"{prefix}_count"].append(When(estimate_id=estimate_id, then=Value(count)))
+
+        with transaction.atomic():
+            self.bulk_create(
+                [self.model(period_id=period_id, estimate_id=estimate_id) for estimate_id in [None, *changes]],
+                ignore_conflicts=True,
+            )
+            updates = {}
+            for field, whens in estimate_changes.items():
+                output_field = DecimalField() if field.endswith("total") else IntegerField()
+                updates[field] = F(field) + Case(
+                    When(estimate_id__isnull=True, then=Value(period_change[field])),
+                    *whens,
+                    default=Value(0),
+                    output_field=output_field,
+                )
+            self.filter(
+                Q(estimate_id__isnull=True) | Q(estimate_id__in=list(changes)),
+                period_id=period_id,
+            ).update(**updates)
+
+    def period_totals(self, period_id):
+        """
+        Returns a dictionary containing the actual income, expense and net totals of a period read from its rollup row,
+        along with the number of actual incomes and expenses.
+
+        :param: period_id, the id of the BudgetPeriod
+
+        :returns: the totals, all zero if no actual amounts have been recorded
+        """
+        rollup = self.filter(period_id=period_id, estimate_id__isnull=True).first()
+        if rollup is None:
+            return {"income": Decimal(0), "expense": Decimal(0), "net": Decimal(0), "income_count": 0, "expense_count": 0}
+        return {
+            "income": rollup.income_total,
+            "expense": rollup.expense_total,
+            "net": rollup.net_amount,
+            "income_count": rollup.income_count,
+            "expense_count": rollup.expense_count,
+        }
+
+    def trends(self, budget_id, periods=6, average_over=3):
+        """
+        Returns the actual total of each estimate name in the latest periods of a Budget, along with the change from
+        the previous period and the rolling average, for a table of names by periods.
+
+        The latest periods are selected by a subquery and their estimate rollups summed by name and period in the same
+        query, with the change and average calculated over each name's periods in date order by window functions.
+        The estimates are outer joined so a period without any is still a column.
+        A name without an estimate in a period has no total there and no change in the next period,
+        the average is of its latest totals so the period is skipped.
+
+        :param: budget_id, the id of the Budget
+        :param: periods, the number of latest periods to include
+        :param: average_over, the number of periods in the rolling average, including the current one
+
+        :returns: a dictionary of the periods oldest first, and the incomes and expenses as lists of dictionaries
+        containing the name and the total, delta and average of each period
+        """
+        if periods < 1 or average_over < 1:
+            raise ValueError("The number of periods and the periods averaged over must be at least 1")
+
+        period_model = self.model._meta.get_field("period").related_model
+        latest = period_model.objects.filter(budget_id=budget_id).order_by("-start_date").values("pk")[:periods]
+        total = Sum(Coalesce(
+            F("estimates__rollups__income_total") + F("estimates__rollups__expense_total"), Decimal(0), output_field=DecimalField()
+        ))
+
+        def window(expression, **kwargs):
+            return Window(
+                expression,
+                partition_by=[F("estimates__amount_type"), F("estimates__name")],
+                order_by=F("start_date").asc(),
+                **kwargs,
+            )
+
+        rows = list(period_model.objects.filter(pk__in=latest).values(
+            "start_date", "end_date",
+            period_id=F("budget_period_id"),
+            amount_type=F("estimates__amount_type"),
+            name=F("estimates__name"),
+        ).annotate(
+            total=total,
+            previous_total=window(Lag(total)),
+            previous_start_date=window(Lag("start_date")),
+            average=window(WindowAvg(total), frame=RowRange(start=-(average_over - 1), end=0)),
+        ).order_by("amount_type", "name", "start_date"))
+
+        trend_periods = sorted(
+            {row["period_id"]: {"start_date": row["start_date"], "end_date": row["end_date"], "period_id": row["period_id"]} for row in rows}.values(),
+            key=lambda period: period["start_date"],
+        )
+        positions = {period["period_id"]: index for index, period in enumerate(trend_periods)}
+
+        def to_decimal(value):
+            # SQLite returns floats and PostgreSQL returns the averages to many decimal places
+            return None if value is None else Decimal(str(value)).quantize(CENT)
+
+        names = {"IN": {}, "EX": {}}
+        for row in rows:
+            # The row of a period without any estimates
+            if row["name"] is None:
+                continue
+            cells = names[row["amount_type"]].setdefault(row["name"], [{"total": None, "delta": None, "average": None} for _ in trend_periods])
+            position = positions[row["period_id"]]
+            # The change is only from the period just before, not across a gap
+            follows = position > 0 and row["previous_start_date"] == trend_periods[position - 1]["start_date"]
+            cells[position] = {
+                "total": to_decimal(row["total"]),
+                "delta": to_decimal(row["total"] - row["previous_total"]) if follows else None,
+                "average": to_decimal(row["average"]),
+            }
+        return {
+            "periods": trend_periods,
+            "incomes": [{"name": row_name, "cells": cells} for row_name, cells in names["IN"].items()],
+            "expenses": [{"name": row_name, "cells": cells} for row_name, cells in names["EX"].items()],
+        }
+
+    def calculate(self):
+        """
+        Calculates the rollups from scratch using the ActualAmounts.
+
+        :returns: a dictionary keyed by (period_id, estimate_id) containing the totals and counts
+        """
+        from .amount import ActualAmount
+
+        rollups = {}
+        grouped = ActualAmount.objects.values(
+            "period_id", "estimate_id", "estimate__amount_type"
+        ).annotate(total=Sum("amount"), count=Count("actual_id")).order_by()
+        for row in grouped.iterator():
+            prefix = "income" if row["estimate__amount_type"] == "IN" else "expense"
+            for key in ((row["period_id"], None), (row["period_id"], row["estimate_id"])):
+                values = rollups.setdefault(key, {
+                    "income_total": Decimal(0),
+                    "income_count": 0,
+                    "expense_total": Decimal(0),
+                    "expense_count": 0,
+                })
+                values[f"{prefix}_total"] += row["total"]
+                values[f"{prefix}_count"] += row["count"]
+        return rollups
+
+    def rebuild_periods(self, period_ids):
+        """
+        Recreates the rollups of the given periods from their ActualAmounts, for actuals written without the signals.
+
+        The periods' actual amounts are summed by estimate in one grouped query and each period is written with
+        apply_many, so memory is bounded by the number of estimates and the other periods' rollups are not touched.
+
+        :param: period_ids, the ids of the BudgetPeriods, or a queryset of them
+        """
+        from .amount import ActualAmount
+
+        changes = {}
+        grouped = ActualAmount.objects.filter(period_id__in=period_ids).values(
+            "period_id", "estimate_id", "estimate__amount_type"
+        ).annotate(total=Sum("amount"), count=Count("actual_id")).order_by()
+        for row in grouped.iterator():
+            changes.setdefault(row["period_id"], {})[row["estimate_id"]] = (
+                row["estimate__amount_type"], row["total"], row["count"]
+            )
+        with transaction.atomic():
+            self.filter(period_id__in=period_ids).delete()
+            for period_id, period_changes in changes.items():
+                self.apply_many(period_id, period_changes)
+
+    def rebuild(self, batch_size=1000):
+        """
+        Deletes every rollup and recreates them from the ActualAmounts.
+
+        Every Budget's change_version is bumped as well, so pages cached with the old totals are not served again.
+
+        :returns: the number of rollup rows created
+        """
+        rollups = self.calculate()
+        with transaction.atomic():
+            Budget.objects.update(change_version=F("change_version") + 1)
+            self.all().delete()
+            self.bulk_create(
+                [
+                    self.model(period_id=period_id, estimate_id=estimate_id, **values)
+                    for (period_id, estimate_id), values in rollups.items()
+                ],
+                batch_size=batch_size,
+            )
+        return len(rollups)
+
+    def verify(self):
+        """
+        Compares the stored rollups with the ones calculated from the ActualAmounts.
+
+        :returns: a list of (period_id, estimate_id) keys that do not match
+        """
+        expected = self.calculate()
+        fields = ("income_total", "income_count", "expense_total", "expense_count")
+        stored = {
+            (row["period_id"], row["estimate_id"]): {field: row[field] for field in fields}
+            for row in self.values("period_id", "estimate_id", *fields)
+        }
+        mismatches = []
+        for key in expected.keys() | stored.keys():
+            values = stored.get(key)
+            # Rows that have been emptied by deletes are equivalent to missing rows
+            if values is not None and not any(values.values()):
+                values = None
+            if values != expected.get(key):
+                mismatches.append(key)
+        return sorted(mismatches, key=lambda key: (key[0], key[1] or 0))
+
+class PeriodRollup(models.Model):
+    """
+    A PeriodRollup stores the sums and counts of the actual incomes and expenses of a BudgetPeriod.
+
+    The row without an estimate holds the totals for the whole period, the other rows hold the totals for each estimate.
+    They are kept up to date whenever an ActualAmount is saved (see budget/signals.py) or deleted (see ActualAmount.delete
+    and Amount.delete), so totals can be read from one row rather than summing every ActualAmount.
+    """
+    rollup_id = models.AutoField(primary_key=True)
+    period = models.ForeignKey("BudgetPeriod", null=False, on_delete=models.CASCADE, related_name="rollups")
+    # If the estimate is null then the row contains the totals for the whole period
+    estimate = models.ForeignKey("Amount", null=True, blank=True, default=None, on_delete=models.CASCADE, related_name="rollups")
+    income_total = models.DecimalField(null=False, default=0, max_digits=12, decimal_places=2)
+    income_count = models.IntegerField(null=False, default=0)
+    expense_total = models.DecimalField(null=False, default=0, max_digits=12, decimal_places=2)
+    expense_count = models.IntegerField(null=False, default=0)
+
+    # Define the model manager
+    objects = PeriodRollupManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["period", "estimate"], name="unique_period_estimate_rollup"),
+            models.UniqueConstraint(fields=["period"], condition=Q(estimate__isnull=True), name="unique_period_rollup"),
+        ]
+
+    @property
+    def net_amount(self):
+        """
+        The actual NET amount of the rollup.
+        """
+        return self.income_total - self.expense_total
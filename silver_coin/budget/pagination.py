@@ -0,0 +1,159 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+class KeysetPage():
+    """
+    A page of results from the KeysetPaginator.
+
+    The cursors are the encoded ordering values of the first and last rows, the next page starts after the last row
+    and the previous page ends before the first row.
+    """
+    def __init__(self, object_list, next_cursor, previous_cursor, query, prefix):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.query = query
+        self.prefix = prefix
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return len(self.object_list) > 0
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_query(self):
+        """
+        The query string for the next page, the other parameters of the request are kept.
+        """
+        return self.build_query("after", self.next_cursor)
+
+    def previous_query(self):
+        """
+        The query string for the previous page, the other parameters of the request are kept.
+        """
+        return self.build_query("before", self.previous_cursor)
+
+    def build_query(self, direction, cursor):
+        query = self.query.copy()
+        query.pop(f"{self.prefix}after", None)
+        query.pop(f"{self.prefix}before", None)
+        query[f"{self.prefix}{direction}"] = cursor
+        return query.urlencode()
+
+class KeysetPaginator():
+    """
+    Paginates a queryset by filtering on the values of the last row seen instead of using OFFSET.
+
+    The database seeks straight to the start of the page using the index on the ordering fields,
+    so fetching a page takes the same time however many rows come before it. The last ordering field must
+    be unique (normally the primary key) so every row has a distinct position.
+    """
+    def __init__(self, queryset, ordering, per_page, prefix=""):
+        """
+        :param: queryset, the queryset to paginate
+        :param: ordering, the fields to order by, prefixed with - for descending
+        :param: per_page, the number of rows on each page
+        :param: prefix, added to the after and before query parameters so a view can paginate more than one list
+        """
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = per_page
+        self.prefix = prefix
+        self.fields = [field.lstrip("-") for field in ordering]
+
+    def get_page(self, query):
+        """
+        Gets the page requested by the after or before cursor in the query parameters.
+
+        An invalid cursor returns the first page.
+
+        :param: query, the request's GET QueryDict
+
+        :returns: a KeysetPage
+        """
+        after = self.decode(query.get(f"{self.prefix}after"))
+        before = self.decode(query.get(f"{self.prefix}before")) if after is None else None
+
+        if before is not None:
+            # Walk backwards from the cursor then put the rows back in order
+            reverse_ordering = [field[1:] if field.startswith("-") else f"-{field}" for field in self.ordering]
+            rows = list(self.queryset.filter(self.seek(before, reverse=True)).order_by(*reverse_ordering)[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.queryset.order_by(*self.ordering)
+            if after is not None:
+                queryset = queryset.filter(self.seek(after))
+            rows = list(queryset[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = after is not None
+
+        return KeysetPage(
+            rows,
+            self.encode(rows[-1]) if rows and has_next else None,
+            self.encode(rows[0]) if rows and has_previous else None,
+            query,
+            self.prefix,
+        )
+
+    def seek(self, values, reverse=False):
+        """
+        Builds the filter for the rows that come after the values in the ordering.
+
+        For an ordering of (-a, -b) this is a <= x AND (a < x OR (a = x AND b < y)). The leading bound on the first
+        field lets the database start its index scan at the cursor, the OR alone is checked against every row before it.
+
+        :param: values, the ordering values of the cursor row
+        :param: reverse, True for the rows that come before the values
+
+        :returns: a Q object
+        """
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith("-") != reverse
+            name = self.fields[index]
+            equal = {self.fields[previous]: values[previous] for previous in range(index)}
+            condition |= Q(**equal, **{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+        descending = self.ordering[0].startswith("-") != reverse
+        return Q(**{f"{self.fields[0]}__{'lte' if descending else 'gte'}": values[0]}) & condition
+
+    def encode(self, row):
+        """
+        Encodes the ordering values of the row as a url safe cursor.
+        """
+        values = [self.queryset.model._meta.get_field(name).value_to_string(row) for name in self.fields]
+        return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode(self, cursor):
+        """
+        Decodes a cursor back into the ordering values.
+
+        :returns: a list of the values, or None if the cursor is missing or invalid
+        """
+        if not cursor:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                return None
+            return [
+                self.queryset.model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            return None
@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import clear_budget_cache
+from .models import ActualAmount
+from .models import Amount
+from .models import Budget
+from .models import PeriodRollup
+
+ROLLUP_FIELDS = ("period_id", "estimate_id", "amount")
+
+def get_rollup_values(instance):
+    """
+    Returns the values of the ActualAmount that the rollups are keyed and summed by.
+    """
+    return {
+        "period_id": int(instance.period_id),
+        "estimate_id": int(instance.estimate_id),
+        "amount": instance.amount,
+    }
+
+def get_amount_types(*estimate_ids):
+    """
+    Returns a dictionary mapping the estimate ids to their amount type.
+    """
+    return dict(Amount.objects.filter(pk__in=estimate_ids).values_list("amount_id", "amount_type"))
+
+@receiver(pre_save, sender=ActualAmount)
+def remember_previous_rollup(sender, instance, raw=False, **kwargs):
+    """
+    Records the values the ActualAmount was counted under in the rollups before it is edited.
+    """
+    if raw or instance._state.adding:
+        instance._rollup_previous = None
+        return None
+
+    loaded = getattr(instance, "_loaded_values", {})
+    if all(field in loaded for field in ROLLUP_FIELDS):
+        instance._rollup_previous = {field: loaded[field] for field in ROLLUP_FIELDS}
+    else:
+        instance._rollup_previous = ActualAmount.objects.filter(pk=instance.pk).values(*ROLLUP_FIELDS).first()
+
+@receiver(post_save, sender=ActualAmount)
+def update_rollup_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Adds the ActualAmount to the rollups, removing it from the previous period and estimate first if it was edited.
+    """
+    if raw:
+        return None
+
+    current = get_rollup_values(instance)
+    previous = getattr(instance, "_rollup_previous", None)
+    estimate_ids = [current["estimate_id"]] + ([previous["estimate_id"]] if previous else [])
+    amount_types = get_amount_types(*estimate_ids)
+
+    if previous is not None:
+        PeriodRollup.objects.apply(
+            previous["period_id"],
+            previous["estimate_id"],
+            amount_types.get(previous["estimate_id"]),
+            previous["amount"],
+            sign=-1,
+        )
+    PeriodRollup.objects.apply(
+        current["period_id"],
+        current["estimate_id"],
+        amount_types[current["estimate_id"]],
+        current["amount"],
+    )
+    # The saved values are now the ones counted in the rollups
+    instance._loaded_values = current
+
+@receiver(post_delete, sender=Budget)
+def clear_cache_on_delete(sender, instance, **kwargs):
+    """
+    Clears the cached pages once a Budget is deleted, SQLite can give a new Budget the deleted one's id
+    and its change_version starts again from 0.
+    """
+    transaction.on_commit(clear_budget_cache)
@@ -0,0 +1,82 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from ..helpers import Authenticate
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
+from ...forecast import forecast_expenses, forecast_period
+
+class ForecastTests(Authenticate):
+    """
+    Tests for the burn-rate forecasts and the forecast_overspend command.
+    """
+    def setUp(self):
+        super().setUp()
+
+        budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=budget)
+        AmountFactory.create(name="Food", amount_type="EX", amount=200, budget=budget)
+        AmountFactory.create(name="Power", amount_type="EX", amount=100, budget=budget)
+        # Ends on 2023-06-30
+        self.period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=budget)
+        ActualAmountFactory.create(amount=60, occurred_on=date(2023, 6, 2), estimate=self.period.estimates.get(name="Food"), period=self.period)
+        ActualAmountFactory.create(amount=40, occurred_on=date(2023, 6, 9), estimate=self.period.estimates.get(name="Food"), period=self.period)
+        ActualAmountFactory.create(amount=500, occurred_on=date(2023, 6, 9), estimate=self.period.estimates.get(name="Work"), period=self.period)
+
+        second_user = User.objects.create(username="testUser2")
+        second_budget = BudgetFactory.create(owner=second_user)
+        AmountFactory.create(name="Rent", amount_type="EX", amount=500, budget=second_budget)
+        self.second_period = BudgetPeriodFactory.create(start_date=date(2023, 6, 6), budget=second_budget)
+        ActualAmountFactory.create(amount=400, occurred_on=date(2023, 6, 7), estimate=self.second_period.estimates.get(name="Rent"), period=self.second_period)
+
+    def test_forecast(self):
+        with self.assertNumQueries(1):
+            forecasts = forecast_expenses([self.period.pk, self.second_period.pk], date(2023, 6, 10))
+
+        forecast = forecasts[self.period.pk]
+        self.assertEqual((10, 20), (forecast["days_elapsed"], forecast["days_remaining"]))
+        self.assertEqual(["Food", "Power"], [item["name"] for item in forecast["estimates"]])
+        food, power = forecast["estimates"]
+        self.assertEqual(Decimal("100"), food["spent"])
+        self.assertEqual(Decimal("10"), food["daily_rate"])
+        self.assertEqual(Decimal("300"), food["projected"])
+        self.assertEqual(Decimal("-100"), food["variance"])
+        self.assertTrue(food["is_over"])
+        self.assertEqual(Decimal("0"), power["projected"])
+        self.assertFalse(power["is_over"])
+
+        rent = forecasts[self.second_period.pk]["estimates"][0]
+        # 400 over the 5 days from 2023-06-06, carried on for the 25 days remaining to 2023-07-05
+        self.assertEqual(Decimal("2400"), rent["projected"])
+        self.assertTrue(rent["is_over"])
+
+    def test_period_not_in_progress(self):
+        self.assertIsNone(forecast_period(self.period, date(2023, 7, 1)))
+        self.assertIsNone(forecast_period(self.period, date(2023, 5, 31)))
+
+        # A period that has not started has no spend rate
+        forecast = forecast_expenses([self.second_period.pk], date(2023, 6, 1))[self.second_period.pk]
+        self.assertEqual(0, forecast["days_elapsed"])
+        self.assertEqual(Decimal("400"), forecast["estimates"][0]["projected"])
+
+    def test_command(self):
+        output = StringIO()
+
+        call_command("forecast_overspend", "--date", "2023-06-10", "--batch-size", "1", stdout=output)
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertIn("testUser: Food", lines[0])
+        self.assertIn("$300.00 of $200.00", lines[0])
+        self.assertIn("testUser2: Rent", lines[1])
+        self.assertIn("2 estimates projected to go over in 2 periods", lines[2])
+
+    def test_command_no_active_periods(self):
+        output = StringIO()
+
+        call_command("forecast_overspend", "--date", "2023-08-01", stdout=output)
+
+        self.assertIn("0 estimates projected to go over in 0 periods", output.getvalue())
@@ -0,0 +1,183 @@
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from ..helpers import Authenticate
+from ..factories import AmountFactory, BudgetFactory, BudgetPeriodFactory
+from ...importers import RowError, StatementRow, parse_csv, parse_ofx, parse_qif
+from ...models import ActualAmount, Budget, PeriodRollup
+
+OFX = """OFXHEADER:100
+DATA:OFXSGML
+
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20230605120000[+12:NZST]
+<TRNAMT>-45.50
+<NAME>Countdown &amp; Co
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT</TRNTYPE><DTPOSTED>20230615</DTPOSTED><TRNAMT>1000.00</TRNAMT><MEMO>Salary</MEMO></STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1>
+</OFX>
+"""
+
+QIF = """!Type:Bank
+D06/05/2023
+T-45.50
+PCountdown
+LFood
+^
+D6/15'23
+T1,000.00
+PPay
+^
+"""
+
+class StatementParserTests(Authenticate):
+    """
+    Tests for the CSV, OFX and QIF parsers.
+    """
+    def test_parse_csv(self):
+        lines = [
+            "Date,Description,Amount,Category\n",
+            "2023-06-05,Countdown,-45.50,Food\n",
+            "2023-06-15,Pay,\"1,000.00\",\n",
+            "\n",
+            "2023-06-31,Bad date,10,\n",
+            "2023-06-20,Bad amount,ten,\n",
+        ]
+        self.assertEquals(list(parse_csv(lines)), [
+            StatementRow(2, date(2023, 6, 5), "Countdown", Decimal("-45.50"), "Food"),
+            StatementRow(3, date(2023, 6, 15), "Pay", Decimal("1000.00"), None),
+            RowError(5, "Date '2023-06-31' is not a valid date"),
+            RowError(6, "Amount 'ten' is not a number"),
+        ])
+
+    def test_parse_csv_missing_columns(self):
+        self.assertEquals(list(parse_csv(["Date,Amount\n", "2023-06-05,10\n"])), [
+            RowError(1, "The header must have date, amount and name columns"),
+        ])
+
+    def test_parse_ofx(self):
+        self.assertEquals(list(parse_ofx(OFX.splitlines(keepends=True))), [
+            StatementRow(6, date(2023, 6, 5), "Countdown & Co", Decimal("-45.50"), None),
+            StatementRow(12, date(2023, 6, 15), "Salary", Decimal("1000.00"), None),
+        ])
+
+    def test_parse_qif(self):
+        self.assertEquals(list(parse_qif(QIF.splitlines(keepends=True))), [
+            StatementRow(2, date(2023, 6, 5), "Countdown", Decimal("-45.50"), "Food"),
+            StatementRow(7, date(2023, 6, 15), "Pay", Decimal("1000.00"), None),
+        ])
+
+class ImportActualAmountsTests(Authenticate):
+    """
+    Tests for the import_actual_amounts command.
+    """
+    def setUp(self):
+        super().setUp()
+
+        budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=budget)
+        AmountFactory.create(name="Food", amount_type="EX", amount=200, budget=budget)
+        AmountFactory.create(name="Power", amount_type="EX", amount=100, budget=budget)
+        # Ends on 2023-06-30
+        self.period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=budget)
+
+    def write(self, content, suffix):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, "w") as statement:
+            statement.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_file(self, path, *args):
+        output = StringIO()
+        errors = StringIO()
+        call_command("import_actual_amounts", self.period.pk, path, *args, "--batch-size", "2", stdout=output, stderr=errors)
+        return output.getvalue(), errors.getvalue()
+
+    def test_import_csv(self):
+        rows = "".join(f"2023-06-{day:02},Shop {day},-{day}.25,food\n" for day in range(1, 11))
+        path = self.write(
+            "date,name,amount,estimate\n"
+            + rows
+            + "2023-06-15,Pay,1000,Work\n"
+            + "2023-07-15,Too late,-10,Food\n"
+            + "2023-06-15,Nothing,0,Work\n"
+            + "2023-06-15,Unknown,-10,Rent\n"
+            + "2023-06-15,No estimate,-10,\n"
+            + "2023-06-15,Too big,-100000,Food\n",
+            ".csv",
+        )
+        output, errors = self.import_file(path, "--default-income", "work")
+
+        self.assertIn("Imported 11 of 16 rows", output)
+        self.assertEquals(errors.splitlines(), [
+            "Line 13: Occurred On must be less than or equal to the end date",
+            "Line 14: Amount must be greater than zero",
+            "Line 15: The period has no expense estimate named 'Rent'",
+            "Line 16: No expense estimate was given for rows without one",
+            "Line 17: Ensure that there are no more than 5 digits before the decimal point.",
+        ])
+
+        food = self.period.estimates.get(name="Food")
+        self.assertEquals(ActualAmount.objects.filter(estimate=food).count(), 10)
+        self.assertEquals(ActualAmount.objects.get(name="Pay").estimate.name, "Work")
+        # The rollups are updated even though the rows are inserted without signals
+        totals = PeriodRollup.objects.period_totals(self.period.pk)
+        self.assertEquals(totals["income"], Decimal("1000"))
+        self.assertEquals(totals["expense"], Decimal("57.50"))
+        self.assertEquals(totals["expense_count"], 10)
+        self.assertEquals(PeriodRollup.objects.verify(), [])
+
+    def test_import_ofx_and_qif(self):
+        self.import_file(self.write(OFX, ".ofx"), "--default-income", "Work", "--default-expense", "Power")
+        self.import_file(self.write(QIF, ".qif"), "--default-income", "Work")
+
+        self.assertEquals(
+            sorted(ActualAmount.objects.values_list("name", "estimate__name", "amount")),
+            [
+                ("Countdown", "Food", Decimal("45.50")),
+                ("Countdown & Co", "Power", Decimal("45.50")),
+                ("Pay", "Work", Decimal("1000.00")),
+                ("Salary", "Work", Decimal("1000.00")),
+            ],
+        )
+        self.assertEquals(PeriodRollup.objects.verify(), [])
+
+    def test_import_quoted_names(self):
+        """
+        Tests that names with the characters COPY quotes are saved as they are, each with its own change version.
+        """
+        path = self.write(
+            "date,name,amount\n"
+            + '2023-06-05,"Fish, Chips",-10\n'
+            + '2023-06-06,"The ""Deli""",-10\n'
+            + '2023-06-07,"Back\\slash\nLine",-10\n',
+            ".csv",
+        )
+        self.import_file(path, "--default-expense", "Food")
+
+        actuals = ActualAmount.objects.order_by("occurred_on")
+        self.assertEquals([actual.name for actual in actuals], ["Fish, Chips", 'The "Deli"', "Back\\slash\nLine"])
+        versions = [actual.version for actual in actuals]
+        self.assertEquals(len(set(versions)), 3)
+        self.assertEquals(max(versions), Budget.objects.get(pk=self.period.budget_id).change_version)
+
+    def test_unknown_default_estimate(self):
+        path = self.write("date,name,amount\n", ".csv")
+        with self.assertRaisesMessage(CommandError, "The period has no expense estimate named 'Rent'"):
+            self.import_file(path, "--default-expense", "Rent")
+
+    def test_unknown_format(self):
+        path = self.write("date,name,amount\n", ".txt")
+        with self.assertRaisesMessage(CommandError, "please use --format"):
+            self.import_file(path)
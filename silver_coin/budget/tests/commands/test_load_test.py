@@ -0,0 +1,44 @@
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase
+
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
+
+class LoadTestTests(TransactionTestCase):
+    """
+    Tests for the load_test command.
+
+    The async pages run their queries in worker threads with their own connections, so the rows are committed.
+    """
+    def setUp(self):
+        self.user = User.objects.create(username="testUser")
+        budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=budget)
+        period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=budget)
+        ActualAmountFactory.create(name="Pay", amount=900, occurred_on=date(2023, 6, 2), estimate=period.estimates.get(name="Work"), period=period)
+
+    def test_compares_paths(self):
+        """
+        Tests that every page is measured on both paths.
+        """
+        out = StringIO()
+
+        call_command("load_test", "testUser", requests=4, concurrency=2, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        for page in ["dashboard", "amount", "actual_amount", "actual_expense_summary"]:
+            for path in ["wsgi", "asgi"]:
+                self.assertTrue(any(line.split()[:2] == [page, path] for line in lines), f"{page} {path}")
+
+    def test_no_period(self):
+        """
+        Tests that a user without a period is an error.
+        """
+        User.objects.create(username="testUser2")
+
+        with self.assertRaises(CommandError):
+            call_command("load_test", "testUser2", stdout=StringIO())
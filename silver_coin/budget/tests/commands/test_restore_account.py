@@ -0,0 +1,114 @@
+import os
+import tempfile
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+from ..helpers import Authenticate
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
+from ...archive import restore_archive
+from ...models import ActualAmount, Amount, Budget, BudgetPeriod, PeriodRollup
+
+class RestoreAccountTests(Authenticate):
+    """
+    Tests for restoring the archive downloaded from the export_account route.
+    """
+    def setUp(self):
+        super().setUp()
+
+        self.budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=self.budget)
+        AmountFactory.create(name="Food", amount_type="EX", amount=200, budget=self.budget)
+        period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=self.budget)
+        food = period.estimates.get(name="Food")
+        for day in range(1, 6):
+            ActualAmountFactory.create(name=f"Shop {day}", amount=f"{day}.50", occurred_on=date(2023, 6, day), estimate=food, period=period)
+        ActualAmountFactory.create(name="Pay", amount="1000", estimate=period.estimates.get(name="Work"), period=period)
+
+        self.rows = {
+            BudgetPeriod: list(BudgetPeriod.objects.values()),
+            Amount: list(Amount.objects.order_by("pk").values()),
+            ActualAmount: list(ActualAmount.objects.order_by("pk").values()),
+        }
+        self.path = self.download()
+
+    def download(self):
+        """
+        Downloads the user's archive to a temporary file.
+        """
+        self.client.login(username="testUser", password="test123")
+        response = self.client.get(reverse("export_account"))
+        handle, path = tempfile.mkstemp(suffix=".zip")
+        with os.fdopen(handle, "wb") as archive:
+            for chunk in response.streaming_content:
+                archive.write(chunk)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_restore_archive(self):
+        budget_id = self.budget.pk
+        other_budget = BudgetFactory.create(owner=User.objects.create(username="testUser2"))
+        other_version = Budget.objects.get(pk=other_budget.pk).change_version
+        self.budget.delete()
+        self.assertFalse(ActualAmount.objects.exists())
+
+        counts = restore_archive(self.path, self.user, batch_size=2)
+
+        self.assertEquals(counts, {
+            "budgets.jsonl": 1,
+            "budget_periods.jsonl": 1,
+            "estimates.jsonl": 4,
+            "actual_amounts.jsonl": 6,
+        })
+        self.assertEquals(Budget.objects.get(owner=self.user).pk, budget_id)
+        self.assertEquals(list(BudgetPeriod.objects.values()), self.rows[BudgetPeriod])
+        self.assertEquals(list(Amount.objects.order_by("pk").values()), self.rows[Amount])
+        self.assertEquals(list(ActualAmount.objects.order_by("pk").values()), self.rows[ActualAmount])
+        self.assertEquals(PeriodRollup.objects.verify(), [])
+        # Only the restored periods' rollups are rebuilt, the other budgets are not changed
+        self.assertEquals(Budget.objects.get(pk=other_budget.pk).change_version, other_version)
+
+        # The sequences are moved past the restored keys so new rows can be added
+        actual = ActualAmount.objects.first()
+        ActualAmountFactory.create(estimate=actual.estimate, period=actual.period)
+
+    def test_restore_command_new_user(self):
+        self.user.delete()
+        output = StringIO()
+
+        call_command("restore_account", self.path, "--username", "restored", stdout=output)
+
+        self.assertIn("actual_amounts.jsonl: 6 rows", output.getvalue())
+        restored = User.objects.get(username="restored")
+        self.assertFalse(restored.has_usable_password())
+        self.assertEquals(ActualAmount.objects.for_user(restored).count(), 6)
+
+    def test_restore_command_existing_rows(self):
+        with self.assertRaisesMessage(CommandError, "must be restored into a fresh database"):
+            call_command("restore_account", self.path, "--username", "restored", stdout=StringIO())
+
+        # Nothing is restored when it fails
+        self.assertEquals(ActualAmount.objects.count(), 6)
+        self.assertFalse(Budget.objects.filter(owner__username="restored").exists())
+
+    def test_restore_command_owner_has_budget(self):
+        Budget.objects.all().delete()
+        BudgetFactory.create(owner=self.user)
+
+        with self.assertRaisesMessage(CommandError, "testUser already has a Budget"):
+            call_command("restore_account", self.path, stdout=StringIO())
+
+        self.assertEquals(Budget.objects.filter(owner=self.user).count(), 1)
+        self.assertFalse(ActualAmount.objects.exists())
+
+    def test_restore_command_not_archive(self):
+        handle, path = tempfile.mkstemp(suffix=".zip")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+
+        with self.assertRaises(CommandError):
+            call_command("restore_account", path, stdout=StringIO())
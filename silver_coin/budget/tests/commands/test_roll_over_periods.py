@@ -0,0 +1,78 @@
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from ..helpers import Authenticate
+from ..factories import AmountFactory, BudgetFactory, BudgetPeriodFactory
+from ...models import BudgetPeriod
+
+class RollOverPeriodsTests(Authenticate):
+    """
+    Tests for the roll_over_periods command.
+    """
+    def setUp(self):
+        super().setUp()
+
+        self.budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=self.budget)
+        AmountFactory.create(name="Food", amount_type="EX", amount=200, budget=self.budget)
+        # Ends on 2023-06-30
+        BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=self.budget)
+
+        second_user = User.objects.create(username="testUser2")
+        self.second_budget = BudgetFactory.create(owner=second_user, period_type="weeks", period_length=2)
+        # Ends on 2023-07-13, has not ended on 2023-07-05
+        BudgetPeriodFactory.create(start_date=date(2023, 6, 30), budget=self.second_budget)
+
+        # A budget without any periods is not rolled over
+        third_user = User.objects.create(username="testUser3")
+        BudgetFactory.create(owner=third_user)
+
+    def roll_over(self, on):
+        output = StringIO()
+        call_command("roll_over_periods", "--date", on.isoformat(), "--batch-size", "1", stdout=output)
+        return output.getvalue()
+
+    def test_roll_over(self):
+        output = self.roll_over(date(2023, 7, 5))
+
+        self.assertIn("Created 1 periods", output)
+        period = BudgetPeriod.objects.filter(budget=self.budget).latest("start_date")
+        self.assertEquals(period.start_date, date(2023, 7, 1))
+        self.assertEquals(period.end_date, date(2023, 7, 31))
+        self.assertEquals(sorted(period.estimates.values_list("name", flat=True)), ["Food", "Work"])
+        self.assertEquals(BudgetPeriod.objects.filter(budget=self.second_budget).count(), 1)
+
+    def test_roll_over_idempotent(self):
+        self.roll_over(date(2023, 7, 20))
+        output = self.roll_over(date(2023, 7, 20))
+
+        self.assertIn("Created 0 periods", output)
+        self.assertEquals(BudgetPeriod.objects.filter(budget=self.budget).count(), 2)
+        second_period = BudgetPeriod.objects.filter(budget=self.second_budget).latest("start_date")
+        self.assertEquals(second_period.start_date, date(2023, 7, 14))
+
+    def test_roll_over_missed_periods(self):
+        """
+        Tests that a budget several periods behind is given every period it missed in one run.
+        """
+        output = self.roll_over(date(2023, 9, 10))
+
+        self.assertIn("Created 8 periods, skipped 0 budgets", output)
+        periods = BudgetPeriod.objects.filter(budget=self.budget).order_by("start_date")
+        self.assertEquals(
+            [(period.start_date, period.end_date) for period in periods[1:]],
+            [(date(2023, 7, 1), date(2023, 7, 31)), (date(2023, 8, 1), date(2023, 8, 31)), (date(2023, 9, 1), date(2023, 9, 30))],
+        )
+        self.assertEquals(sorted(periods.last().estimates.values_list("name", flat=True)), ["Food", "Work"])
+        # The last period is the one that has not ended on the date
+        second_periods = BudgetPeriod.objects.filter(budget=self.second_budget).order_by("start_date")
+        self.assertEquals(
+            [period.start_date for period in second_periods[1:]],
+            [date(2023, 7, 14), date(2023, 7, 28), date(2023, 8, 11), date(2023, 8, 25), date(2023, 9, 8)],
+        )
+        self.assertEquals(second_periods.last().end_date, date(2023, 9, 21))
+
+        self.assertIn("Created 0 periods", self.roll_over(date(2023, 9, 10)))
@@ -1 +1,2 @@
-from .authenticate import Authenticate
\ No newline at end of file
+from .authenticate import Authenticate
+from .lazy_loads import forbid_lazy_loads
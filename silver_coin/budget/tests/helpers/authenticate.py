@@ -1,4 +1,5 @@
 from django.contrib.auth.models import User
+from django.core.cache import caches
 from django.test import TestCase
 
 class Authenticate(TestCase):
@@ -8,4 +9,6 @@ class Authenticate(TestCase):
     def setUp(self):
         self.user = User.objects.create(username="testUser")
         self.user.set_password("test123")
-        self.user.save()
\ No newline at end of file
+        self.user.save()
+        # The budget cache is not rolled back with the test's transaction and SQLite reuses the rolled back ids
+        caches["budget"].clear()
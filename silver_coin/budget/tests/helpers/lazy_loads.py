@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+from unittest import mock
+
+from django.db.models import Model
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor
+
+class LazyLoadError(AssertionError):
+    """
+    Raised when a related object or deferred field is fetched from the database on access.
+    """
+
+@contextmanager
+def forbid_lazy_loads():
+    """
+    A context manager that raises LazyLoadError if a foreign key or a deferred field is loaded lazily inside the block.
+
+    Wrap a request with it to check the view loads everything its template renders in the original query.
+    """
+    def get_object(descriptor, instance):
+        raise LazyLoadError(f"{type(instance).__name__}.{descriptor.field.name} was loaded lazily, use select_related")
+
+    def refresh_from_db(instance, using=None, fields=None):
+        raise LazyLoadError(f"{type(instance).__name__}.{', '.join(fields or [])} was loaded lazily, check only/defer")
+
+    with mock.patch.object(ForwardManyToOneDescriptor, "get_object", get_object), \
+            mock.patch.object(Model, "refresh_from_db", refresh_from_db):
+        yield
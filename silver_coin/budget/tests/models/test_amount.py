@@ -1,4 +1,6 @@
 from datetime import date
+from decimal import Decimal
+from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 
 from ..helpers import Authenticate
@@ -7,6 +9,9 @@ from ..factories import AmountFactory
 from ..factories import BudgetFactory
 from ..factories import BudgetPeriodFactory
 
+from ...models import ActualAmount
+from ...models import Amount
+
 
 class AmountTests(Authenticate):
     """
@@ -57,6 +62,60 @@ class AmountTests(Authenticate):
         with self.assertRaisesMessage(ValidationError, "An Amount cannot be linked to both a Budget and BudgetPeriod"):
             self.amount.full_clean()
 
+    def test_for_user(self):
+        """
+        Tests that for_user returns the estimates on the user's budget and periods only.
+        """
+        budget_period = BudgetPeriodFactory.create(budget=self.amount.budget)
+        other_user = User.objects.create(username="testUser2")
+        AmountFactory.create(budget=BudgetFactory.create(owner=other_user))
+
+        with self.assertNumQueries(1):
+            amounts = list(Amount.objects.for_user(self.user))
+        self.assertCountEqual(amounts, [self.amount, *budget_period.estimates.all()])
+        self.assertFalse(Amount.objects.for_user(other_user).filter(pk=self.amount.pk).exists())
+        self.assertNotIn("LEFT OUTER JOIN", str(Amount.objects.for_user(self.user).query))
+
+    def test_variance_history(self):
+        budget = self.amount.budget
+        AmountFactory.create(name="Groceries", amount_type="EX", amount=100, budget=budget)
+        AmountFactory.create(name="Salary", amount_type="IN", amount=1000, budget=budget)
+        for month, amount in ((6, 80), (7, 130), (8, 120)):
+            period = BudgetPeriodFactory.create(start_date=date(2023, month, 1), budget=budget)
+            ActualAmountFactory.create(amount=amount, occurred_on=period.start_date, estimate=period.estimates.get(name="Groceries"), period=period)
+
+        with self.assertNumQueries(1):
+            history = Amount.objects.filter(budget_period__budget=budget).variance_history()
+
+        groceries = next(row for row in history["expenses"] if row["name"] == "Groceries")
+        self.assertEqual(3, groceries["periods"])
+        self.assertEqual(Decimal("100"), groceries["mean_estimate"])
+        self.assertEqual(Decimal("110"), groceries["mean_actual"])
+        self.assertEqual(Decimal("-10"), groceries["mean_variance"])
+        self.assertEqual(Decimal("21.60"), groceries["variance_deviation"])
+        self.assertEqual(2, groceries["times_over"])
+        self.assertEqual(Decimal("66.67"), groceries["percent_over"])
+
+        salary = next(row for row in history["incomes"] if row["name"] == "Salary")
+        self.assertEqual((Decimal("0"), Decimal("1000"), 0), (salary["mean_actual"], salary["mean_variance"], salary["times_over"]))
+
+    def test_variance_history_ended(self):
+        """
+        Tests that the periods that have not ended are not in the history.
+        """
+        budget = self.amount.budget
+        AmountFactory.create(name="Groceries", amount_type="EX", amount=100, budget=budget)
+        for month, amount in ((6, 80), (7, 130), (8, 0), (9, 0)):
+            period = BudgetPeriodFactory.create(start_date=date(2023, month, 1), budget=budget)
+            ActualAmountFactory.create(amount=amount, occurred_on=period.start_date, estimate=period.estimates.get(name="Groceries"), period=period)
+
+        history = Amount.objects.filter(budget_period__budget=budget).variance_history(today=date(2023, 8, 15))
+
+        groceries = next(row for row in history["expenses"] if row["name"] == "Groceries")
+        self.assertEqual(2, groceries["periods"])
+        self.assertEqual(Decimal("105"), groceries["mean_actual"])
+
+
 class ActualAmountTests(Authenticate):
     """
     Tests for the ActualAmount model.
@@ -122,3 +181,12 @@ class ActualAmountTests(Authenticate):
         self.actual_amount.occurred_on = date(2023, 7, 28)
         with self.assertRaisesMessage(ValidationError, "Occurred On must be less than or equal to the end date"):
             self.actual_amount.full_clean()
+
+    def test_for_user(self):
+        """
+        Tests that for_user only returns the actual amounts in the user's periods.
+        """
+        other_user = User.objects.create(username="testUser2")
+
+        self.assertEquals(list(ActualAmount.objects.for_user(self.user)), [self.actual_amount])
+        self.assertFalse(ActualAmount.objects.for_user(other_user).exists())
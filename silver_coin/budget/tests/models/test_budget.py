@@ -1,7 +1,9 @@
+from decimal import Decimal
 from django.core.exceptions import ValidationError
 
 from ..helpers import Authenticate
 from ..factories import BudgetFactory, AmountFactory
+from ...models import Budget
 
 class BudgetTests(Authenticate):
 
@@ -120,4 +122,56 @@ class BudgetTests(Authenticate):
         )
 
         self.assertEquals(food_expense.income_percentage, "33.33")
-        self.assertEquals(power_expense.income_percentage, "50.00")
\ No newline at end of file
+        self.assertEquals(power_expense.income_percentage, "50.00")
+
+    def test_totals(self):
+        AmountFactory.create(
+            name="Income",
+            amount_type="IN",
+            amount=300,
+            budget=self.budget
+        )
+        AmountFactory.create(
+            name="Food",
+            amount_type="EX",
+            amount=100,
+            budget=self.budget
+        )
+        AmountFactory.create(
+            name="Power",
+            amount_type="EX",
+            amount="50.50",
+            budget=self.budget
+        )
+
+        self.assertEquals(self.budget.total_income(), Decimal("300"))
+        self.assertEquals(self.budget.total_expense(), Decimal("150.50"))
+        self.assertEquals(self.budget.net_amount(), Decimal("149.50"))
+
+    def test_totals_no_amounts(self):
+        self.assertEquals(self.budget.total_income(), 0)
+        self.assertEquals(self.budget.total_expense(), 0)
+        self.assertEquals(self.budget.net_amount(), 0)
+
+    def test_with_totals(self):
+        """
+        Tests that the annotated totals are used without running any further queries.
+        """
+        AmountFactory.create(
+            name="Income",
+            amount_type="IN",
+            amount=300,
+            budget=self.budget
+        )
+        AmountFactory.create(
+            name="Food",
+            amount_type="EX",
+            amount=100,
+            budget=self.budget
+        )
+
+        with self.assertNumQueries(1):
+            budget = Budget.objects.with_totals().get(pk=self.budget.pk)
+            self.assertEquals(budget.total_income(), Decimal("300"))
+            self.assertEquals(budget.total_expense(), Decimal("100"))
+            self.assertEquals(budget.net_amount(), Decimal("200"))
@@ -1,9 +1,17 @@
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from importlib import import_module
+from unittest import skipIf, skipUnless
+from django.apps import apps
+from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from ..helpers import Authenticate
-from ..factories import AmountFactory, BudgetPeriodFactory, BudgetFactory
+from ..factories import ActualAmountFactory, AmountFactory, BudgetPeriodFactory, BudgetFactory
 from ...models import Amount
+from ...models import BudgetPeriod
 
 class BudgetPeriodTests(Authenticate):
     def setUp(self):
@@ -41,6 +49,9 @@ class BudgetPeriodTests(Authenticate):
 
 
     def test_end_date_days(self):
+        # Periods of the same budget cannot overlap, remove the one created in setUp
+        self.budget_period.delete()
+
         self.budget.period_type = "days"
         self.budget.period_length = 4
         self.budget.save()
@@ -51,6 +62,9 @@ class BudgetPeriodTests(Authenticate):
         self.assertEquals(self.budget_period.end_date, date(2022, 8, 25))
 
     def test_end_date_weeks(self):
+        # Periods of the same budget cannot overlap, remove the one created in setUp
+        self.budget_period.delete()
+
         self.budget.period_type = "weeks"
         self.budget.period_length = 6
         self.budget.save()
@@ -60,6 +74,9 @@ class BudgetPeriodTests(Authenticate):
         self.assertEquals(self.budget_period.end_date, date(2022, 10, 2))
 
     def test_end_date_months(self):
+        # Periods of the same budget cannot overlap, remove the one created in setUp
+        self.budget_period.delete()
+
         self.budget.period_type = "months"
         self.budget.period_length = 9
         self.budget.save()
@@ -113,4 +130,163 @@ class BudgetPeriodTests(Authenticate):
 
         with self.assertRaisesMessage(ValidationError, "Budget Period overlaps with existing period, please check the dates and try again!"):
             overlapping_period.full_clean()
-    
\ No newline at end of file
+
+    def test_date_overlap_contains_period(self):
+        self.budget.period_type = "days"
+        self.budget.period_length = 3
+        self.budget.save()
+        BudgetPeriodFactory.create(start_date=date(2023, 7, 2), budget=self.budget)
+
+        self.budget.period_length = 7
+        self.budget.save()
+        overlapping_period = BudgetPeriodFactory.build(start_date=date(2023, 7, 1), budget=self.budget)
+
+        with self.assertRaisesMessage(ValidationError, "Budget Period overlaps with existing period, please check the dates and try again!"):
+            overlapping_period.full_clean()
+
+    def test_date_overlap_other_budget(self):
+        """
+        Tests that the periods of another user's budget do not count as overlapping.
+        """
+        other_user = User.objects.create(username="testUser2")
+        other_budget = BudgetFactory.create(owner=other_user)
+
+        other_period = BudgetPeriodFactory.build(start_date=self.budget_period.start_date, budget=other_budget)
+        other_period.full_clean()
+        other_period.save()
+
+        self.assertIsNotNone(other_period.budget_period_id)
+
+    @skipUnless(connection.vendor == "postgresql", "Exclusion constraints are only supported by PostgreSQL")
+    def test_date_overlap_constraint(self):
+        """
+        Tests that the database stops overlapping periods that were not checked by full_clean, e.g. when saved at the same time.
+        """
+        overlapping_period = BudgetPeriodFactory.build(start_date=self.budget_period.end_date - timedelta(days=1), budget=self.budget)
+
+        with self.assertRaisesMessage(ValidationError, "Budget Period overlaps with existing period, please check the dates and try again!"):
+            overlapping_period.save()
+
+        self.assertEquals(BudgetPeriod.objects.filter(budget=self.budget).count(), 1)
+
+    def test_date_touching(self):
+        """
+        Tests that a period can start on the day the period before it ends.
+        """
+        touching_period = BudgetPeriodFactory.build(start_date=self.budget_period.end_date, budget=self.budget)
+        touching_period.full_clean()
+        touching_period.save()
+
+        self.assertEquals(BudgetPeriod.objects.filter(budget=self.budget).count(), 2)
+
+    @skipIf(connection.vendor == "postgresql", "The exclusion constraint stops the overlapping periods being saved")
+    def test_check_overlapping_periods(self):
+        """
+        Tests that the migration adding the exclusion constraint lists the periods that overlap, but not the ones that touch.
+        """
+        migration = import_module("budget.migrations.0005_add_budget_period_overlap_constraint")
+        BudgetPeriodFactory.create(start_date=self.budget_period.end_date, budget=self.budget)
+        migration.check_overlapping_periods(apps, None)
+
+        # Saved without the overlap check, as a period could be before the constraint was added
+        overlapping_period = BudgetPeriodFactory.build(start_date=self.budget_period.start_date + timedelta(days=1), budget=self.budget)
+        overlapping_period.end_date = overlapping_period.calculate_end_date()
+        BudgetPeriod.objects.bulk_create([overlapping_period])
+
+        with self.assertRaisesMessage(RuntimeError, f"budget {self.budget.pk}: period"):
+            migration.check_overlapping_periods(apps, None)
+
+    def test_totals(self):
+        income = self.budget_period.estimates.get(name="Income")
+        food = self.budget_period.estimates.get(name="Food")
+        ActualAmountFactory.create(amount=500, occurred_on=date(2022, 8, 10), estimate=income, period=self.budget_period)
+        ActualAmountFactory.create(amount="25.76", occurred_on=date(2022, 8, 11), estimate=food, period=self.budget_period)
+        ActualAmountFactory.create(amount="74.24", occurred_on=date(2022, 8, 12), estimate=food, period=self.budget_period)
+
+        self.assertEquals(self.budget_period.total_income(), Decimal("500"))
+        self.assertEquals(self.budget_period.total_expense(), Decimal("100"))
+        self.assertEquals(self.budget_period.net_amount(), Decimal("400"))
+
+    def test_with_totals(self):
+        """
+        Tests that the annotated totals are used without running any further queries.
+        """
+        income = self.budget_period.estimates.get(name="Income")
+        food = self.budget_period.estimates.get(name="Food")
+        ActualAmountFactory.create(amount=500, occurred_on=date(2022, 8, 10), estimate=income, period=self.budget_period)
+        ActualAmountFactory.create(amount=100, occurred_on=date(2022, 8, 11), estimate=food, period=self.budget_period)
+
+        with self.assertNumQueries(1):
+            budget_period = BudgetPeriod.objects.with_totals().get(pk=self.budget_period.pk)
+            self.assertEquals(budget_period.total_income(), Decimal("500"))
+            self.assertEquals(budget_period.total_expense(), Decimal("100"))
+            self.assertEquals(budget_period.net_amount(), Decimal("400"))
+
+    def test_summary(self):
+        """
+        Tests that each estimate is summarised separately, even when two estimates share a name.
+        """
+        income = self.budget_period.estimates.get(name="Income")
+        food = self.budget_period.estimates.get(name="Food")
+        second_food = AmountFactory.create(name="Food", amount_type="EX", amount=50, budget_period=self.budget_period)
+        ActualAmountFactory.create(amount=150, occurred_on=date(2022, 8, 10), estimate=income, period=self.budget_period)
+        ActualAmountFactory.create(amount=25, occurred_on=date(2022, 8, 11), estimate=food, period=self.budget_period)
+        ActualAmountFactory.create(amount=50, occurred_on=date(2022, 8, 12), estimate=food, period=self.budget_period)
+        ActualAmountFactory.create(amount=60, occurred_on=date(2022, 8, 12), estimate=second_food, period=self.budget_period)
+
+        with self.assertNumQueries(1):
+            summary = self.budget_period.summary()
+
+        self.assertEquals(len(summary["incomes"]), 1)
+        self.assertEquals(summary["incomes"][0]["actual"], Decimal("150"))
+        self.assertEquals(summary["incomes"][0]["percent_used"], Decimal("50"))
+
+        expenses = {expense["amount_id"]: expense for expense in summary["expenses"]}
+        self.assertEquals(len(expenses), 3)
+        self.assertEquals(expenses[food.amount_id]["actual"], Decimal("75"))
+        self.assertEquals(expenses[food.amount_id]["variance"], Decimal("25"))
+        self.assertEquals(expenses[food.amount_id]["percent_used"], Decimal("75"))
+        self.assertEquals(expenses[second_food.amount_id]["actual"], Decimal("60"))
+        self.assertEquals(expenses[second_food.amount_id]["variance"], Decimal("-10"))
+        self.assertEquals(expenses[second_food.amount_id]["percent_used"], Decimal("120"))
+        power = self.budget_period.estimates.get(name="Power")
+        self.assertEquals(expenses[power.amount_id]["actual"], Decimal("0"))
+        self.assertEquals(expenses[power.amount_id]["percent_used"], Decimal("0"))
+
+        self.assertEquals(self.budget_period.summary_by_group(is_expense=True), summary["expenses"])
+
+    def test_create_periods(self):
+        """
+        Tests that the next periods are created contiguously with a copy of the estimates each.
+        """
+        periods = BudgetPeriod.objects.create_periods(self.budget, 12)
+
+        self.assertEquals(len(periods), 12)
+        self.assertEquals(periods[0].start_date, date(2022, 9, 9))
+        self.assertEquals(periods[-1].end_date, date(2023, 9, 8))
+        for previous, period in zip(periods, periods[1:]):
+            self.assertEquals(period.start_date, previous.end_date + timedelta(days=1))
+        self.assertEquals(Amount.objects.filter(budget_period__in=periods).count(), 36)
+        self.assertEquals(
+            sorted(periods[5].estimates.values_list("name", flat=True)),
+            ["Food", "Income", "Power"]
+        )
+
+    def test_create_periods_query_count(self):
+        """
+        Tests that the number of queries does not depend on the number of periods.
+        """
+        with CaptureQueriesContext(connection) as two_periods:
+            BudgetPeriod.objects.create_periods(self.budget, 2)
+        with CaptureQueriesContext(connection) as twelve_periods:
+            BudgetPeriod.objects.create_periods(self.budget, 12)
+
+        self.assertEquals(len(two_periods), len(twelve_periods))
+        # Includes claiming the change versions of the periods and their estimates
+        self.assertLessEqual(len(twelve_periods), 9)
+
+    def test_create_periods_overlap(self):
+        with self.assertRaisesMessage(ValidationError, "Budget Period overlaps with existing period, please check the dates and try again!"):
+            BudgetPeriod.objects.create_periods(self.budget, 3, start_date=date(2022, 7, 20))
+
+        self.assertEquals(BudgetPeriod.objects.filter(budget=self.budget).count(), 1)
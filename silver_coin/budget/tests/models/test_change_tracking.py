@@ -0,0 +1,83 @@
+from datetime import date
+
+from ..helpers import Authenticate
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
+from ...models import ActualAmount, Amount, Budget, BudgetPeriod, Tombstone
+
+class ChangeTrackingTests(Authenticate):
+    """
+    Tests that writes are given increasing change versions and deletes leave Tombstones.
+    """
+    def setUp(self):
+        super().setUp()
+
+        self.budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Food", amount_type="EX", amount=200, budget=self.budget)
+        self.period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=self.budget)
+        self.food = self.period.estimates.get(name="Food")
+
+    def get_change_version(self):
+        return Budget.objects.get(pk=self.budget.pk).change_version
+
+    def test_versions_increase(self):
+        actual = ActualAmountFactory.create(occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+        first = actual.version
+        actual.name = "Edited"
+        actual.save()
+
+        self.assertGreater(actual.version, first)
+        self.assertEquals(actual.version, self.get_change_version())
+        self.assertGreater(first, self.food.version)
+        self.assertGreater(self.food.version, self.period.version)
+
+    def test_get_budget_id(self):
+        """
+        Tests that the Budget of a row is found through a loaded period without a query, and through its id otherwise.
+        """
+        actual = ActualAmountFactory.create(occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+
+        with self.assertNumQueries(0):
+            self.assertEquals(self.budget.pk, actual.get_budget_id())
+            self.assertEquals(self.budget.pk, self.food.get_budget_id())
+
+        actual = ActualAmount.objects.get(pk=actual.pk)
+        with self.assertNumQueries(1):
+            self.assertEquals(self.budget.pk, actual.get_budget_id())
+        self.assertFalse(ActualAmount.period.is_cached(actual))
+
+    def test_bulk_versions_distinct(self):
+        """
+        Tests that the periods and estimate copies created in bulk are each given their own version.
+        """
+        periods = BudgetPeriod.objects.create_periods(self.budget, 3)
+
+        versions = [period.version for period in periods]
+        versions += list(Amount.objects.filter(budget_period__in=periods).values_list("version", flat=True))
+        self.assertEquals(len(set(versions)), 6)
+        self.assertEquals(max(versions), self.get_change_version())
+
+    def test_budget_save_keeps_version(self):
+        """
+        Tests that saving a Budget loaded before other changes does not move its change version backwards.
+        """
+        budget = Budget.objects.get(pk=self.budget.pk)
+        ActualAmountFactory.create(occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+        latest = self.get_change_version()
+
+        budget.name = "Renamed"
+        budget.save()
+
+        self.assertEquals(self.get_change_version(), latest + 1)
+
+    def test_delete_tombstone(self):
+        actual = ActualAmountFactory.create(occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+        actual_id = actual.pk
+        period_id = self.period.pk
+
+        actual.delete()
+        self.period.delete()
+
+        tombstones = list(Tombstone.objects.order_by("version").values_list("kind", "object_id"))
+        # The period's estimates are deleted by the cascade so they do not get their own
+        self.assertEquals(tombstones, [("actual_amount", actual_id), ("budget_period", period_id)])
+        self.assertFalse(ActualAmount.objects.exists())
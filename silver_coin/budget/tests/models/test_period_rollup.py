@@ -0,0 +1,207 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ..helpers import Authenticate, forbid_lazy_loads
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
+from ...models import ActualAmount, PeriodRollup
+
+class PeriodRollupTests(Authenticate):
+    """
+    Tests that the PeriodRollups are kept up to date with the ActualAmounts.
+    """
+    def setUp(self):
+        super().setUp()
+
+        self.budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=self.budget)
+        AmountFactory.create(name="Food", amount_type="EX", amount=200, budget=self.budget)
+        AmountFactory.create(name="Power", amount_type="EX", amount=100, budget=self.budget)
+
+        self.period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=self.budget)
+        self.work = self.period.estimates.get(name="Work")
+        self.food = self.period.estimates.get(name="Food")
+        self.power = self.period.estimates.get(name="Power")
+
+    def get_rollup(self, period, estimate=None):
+        return PeriodRollup.objects.get(period=period, estimate=estimate)
+
+    def test_create(self):
+        ActualAmountFactory.create(amount=1000, occurred_on=date(2023, 6, 2), estimate=self.work, period=self.period)
+        ActualAmountFactory.create(amount="25.50", occurred_on=date(2023, 6, 3), estimate=self.food, period=self.period)
+        ActualAmountFactory.create(amount="14.50", occurred_on=date(2023, 6, 4), estimate=self.food, period=self.period)
+
+        rollup = self.get_rollup(self.period)
+        self.assertEquals(rollup.income_total, Decimal("1000"))
+        self.assertEquals(rollup.income_count, 1)
+        self.assertEquals(rollup.expense_total, Decimal("40"))
+        self.assertEquals(rollup.expense_count, 2)
+
+        food_rollup = self.get_rollup(self.period, self.food)
+        self.assertEquals(food_rollup.expense_total, Decimal("40"))
+        self.assertEquals(food_rollup.expense_count, 2)
+
+        self.assertEquals(self.period.total_expense(), Decimal("40"))
+        self.assertEquals(self.period.net_amount(), Decimal("960"))
+
+    def test_edit(self):
+        actual = ActualAmountFactory.create(amount=30, occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+
+        actual = ActualAmount.objects.get(pk=actual.pk)
+        actual.amount = Decimal("45")
+        actual.estimate = self.power
+        actual.save()
+
+        self.assertEquals(self.get_rollup(self.period, self.food).expense_total, Decimal("0"))
+        self.assertEquals(self.get_rollup(self.period, self.food).expense_count, 0)
+        self.assertEquals(self.get_rollup(self.period, self.power).expense_total, Decimal("45"))
+        self.assertEquals(self.get_rollup(self.period).expense_total, Decimal("45"))
+        self.assertEquals(self.get_rollup(self.period).expense_count, 1)
+
+    def test_move_period(self):
+        other_period = BudgetPeriodFactory.create(start_date=date(2023, 7, 1), budget=self.budget)
+        other_food = other_period.estimates.get(name="Food")
+        actual = ActualAmountFactory.create(amount=30, occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+
+        actual.period = other_period
+        actual.estimate = other_food
+        actual.save()
+
+        self.assertEquals(self.period.total_expense(), Decimal("0"))
+        self.assertEquals(other_period.total_expense(), Decimal("30"))
+        self.assertEquals(PeriodRollup.objects.verify(), [])
+
+    def test_delete(self):
+        actual = ActualAmountFactory.create(amount=30, occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+        ActualAmountFactory.create(amount=20, occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+
+        # The estimate's type is read from the estimate selected with the amount
+        with forbid_lazy_loads():
+            ActualAmount.objects.select_related("estimate").get(pk=actual.pk).delete()
+
+        self.assertEquals(self.get_rollup(self.period).expense_total, Decimal("20"))
+        self.assertEquals(self.get_rollup(self.period).expense_count, 1)
+
+    def test_delete_period(self):
+        ActualAmountFactory.create(amount=30, occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+
+        self.period.delete()
+
+        self.assertEquals(PeriodRollup.objects.count(), 0)
+
+    def test_delete_period_fast(self):
+        """
+        Tests that the actual amounts and rollups of a deleted period are deleted without loading them.
+        """
+        def count_delete_queries(size):
+            period = BudgetPeriodFactory.create(start_date=date(2023, 8, 1), budget=self.budget)
+            food = period.estimates.get(name="Food")
+            ActualAmountFactory.create_batch(size, amount=10, occurred_on=date(2023, 8, 2), estimate=food, period=period)
+            with CaptureQueriesContext(connection) as queries:
+                period.delete()
+            return len(queries)
+
+        self.assertEquals(count_delete_queries(2), count_delete_queries(20))
+        self.assertEquals(PeriodRollup.objects.filter(period__start_date=date(2023, 8, 1)).count(), 0)
+
+    def test_delete_estimate(self):
+        ActualAmountFactory.create(amount=30, occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+        ActualAmountFactory.create(amount=20, occurred_on=date(2023, 6, 3), estimate=self.food, period=self.period)
+        ActualAmountFactory.create(amount=15, occurred_on=date(2023, 6, 3), estimate=self.power, period=self.period)
+
+        self.food.delete()
+
+        rollup = self.get_rollup(self.period)
+        self.assertEquals((rollup.expense_total, rollup.expense_count), (Decimal("15"), 1))
+        self.assertEquals(PeriodRollup.objects.verify(), [])
+
+    def test_apply_many(self):
+        ActualAmountFactory.create(amount=30, occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+
+        with self.assertNumQueries(4):
+            PeriodRollup.objects.apply_many(self.period.pk, {
+                self.work.pk: ("IN", Decimal("1000"), 1),
+                self.food.pk: ("EX", Decimal("-10.50"), 0),
+                self.power.pk: ("EX", Decimal("20"), 2),
+            })
+
+        rollup = self.get_rollup(self.period)
+        self.assertEquals((rollup.income_total, rollup.income_count), (Decimal("1000"), 1))
+        self.assertEquals((rollup.expense_total, rollup.expense_count), (Decimal("39.50"), 3))
+        self.assertEquals(self.get_rollup(self.period, self.food).expense_total, Decimal("19.50"))
+        self.assertEquals(self.get_rollup(self.period, self.power).expense_count, 2)
+        self.assertEquals(self.get_rollup(self.period, self.work).income_total, Decimal("1000"))
+
+    def test_rebuild_command(self):
+        ActualAmountFactory.create(amount=1000, occurred_on=date(2023, 6, 2), estimate=self.work, period=self.period)
+        ActualAmountFactory.create(amount=30, occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+
+        # Simulate the rollups drifting from the actual amounts
+        PeriodRollup.objects.filter(estimate=None).update(expense_total=0)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_rollups", "--verify-only", stdout=StringIO(), stderr=StringIO())
+
+        output = StringIO()
+        call_command("rebuild_rollups", stdout=output)
+        self.assertIn("Rollups match the actual amounts", output.getvalue())
+        self.assertEquals(self.get_rollup(self.period).expense_total, Decimal("30"))
+        self.assertEquals(self.get_rollup(self.period).income_total, Decimal("1000"))
+
+    def test_trends(self):
+        july = BudgetPeriodFactory.create(start_date=date(2023, 7, 1), budget=self.budget)
+        august = BudgetPeriodFactory.create(start_date=date(2023, 8, 1), budget=self.budget)
+        ActualAmountFactory.create(amount=1000, occurred_on=date(2023, 6, 2), estimate=self.work, period=self.period)
+        ActualAmountFactory.create(amount=40, occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+        ActualAmountFactory.create(amount="60.50", occurred_on=date(2023, 7, 2), estimate=july.estimates.get(name="Food"), period=july)
+        # A name without an estimate in a period has no total there
+        july.estimates.get(name="Power").delete()
+
+        # The periods are selected by the query of the totals
+        with self.assertNumQueries(1):
+            trends = PeriodRollup.objects.trends(self.budget.pk, periods=3, average_over=2)
+
+        self.assertEquals([period["start_date"] for period in trends["periods"]], [date(2023, 6, 1), date(2023, 7, 1), date(2023, 8, 1)])
+        self.assertEquals(trends["periods"][-1]["period_id"], august.pk)
+        self.assertEquals([row["name"] for row in trends["incomes"]], ["Work"])
+        self.assertEquals([row["name"] for row in trends["expenses"]], ["Food", "Power"])
+
+        food = trends["expenses"][0]["cells"]
+        self.assertEquals([cell["total"] for cell in food], [Decimal("40"), Decimal("60.50"), Decimal("0")])
+        self.assertEquals([cell["delta"] for cell in food], [None, Decimal("20.50"), Decimal("-60.50")])
+        self.assertEquals([cell["average"] for cell in food], [Decimal("40"), Decimal("50.25"), Decimal("30.25")])
+
+        power = trends["expenses"][1]["cells"]
+        self.assertEquals([cell["total"] for cell in power], [Decimal("0"), None, Decimal("0")])
+        self.assertEquals([cell["delta"] for cell in power], [None, None, None])
+        self.assertEquals([cell["average"] for cell in power], [Decimal("0"), None, Decimal("0")])
+
+        # Only the latest periods are included
+        trends = PeriodRollup.objects.trends(self.budget.pk, periods=2, average_over=2)
+        self.assertEquals([period["period_id"] for period in trends["periods"]], [july.pk, august.pk])
+        self.assertEquals([cell["total"] for cell in trends["incomes"][0]["cells"]], [Decimal("0"), Decimal("0")])
+
+    def test_trends_skips_gaps(self):
+        """
+        Tests that a period without an estimate of a name is skipped by its average, and one without any estimates
+        is still a column.
+        """
+        july = BudgetPeriodFactory.create(start_date=date(2023, 7, 1), budget=self.budget)
+        august = BudgetPeriodFactory.create(start_date=date(2023, 8, 1), budget=self.budget)
+        september = BudgetPeriodFactory.create(start_date=date(2023, 9, 1), budget=self.budget)
+        ActualAmountFactory.create(amount=40, occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+        ActualAmountFactory.create(amount=60, occurred_on=date(2023, 8, 2), estimate=august.estimates.get(name="Food"), period=august)
+        july.estimates.get(name="Food").delete()
+        september.estimates.all().delete()
+
+        trends = PeriodRollup.objects.trends(self.budget.pk, periods=4, average_over=2)
+
+        self.assertEquals([period["period_id"] for period in trends["periods"]], [self.period.pk, july.pk, august.pk, september.pk])
+        food = next(row["cells"] for row in trends["expenses"] if row["name"] == "Food")
+        self.assertEquals([cell["total"] for cell in food], [Decimal("40"), None, Decimal("60"), None])
+        self.assertEquals([cell["delta"] for cell in food], [None, None, None, None])
+        self.assertEquals([cell["average"] for cell in food], [Decimal("40"), None, Decimal("50"), None])
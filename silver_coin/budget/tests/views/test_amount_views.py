@@ -1,15 +1,23 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from ..helpers import Authenticate
+from ..helpers import forbid_lazy_loads
 
 from ..factories import BudgetFactory
 from ..factories import BudgetPeriodFactory
 from ..factories import AmountFactory
+from ..factories import ActualAmountFactory
 
+from ...importers import parse_csv
 from ...models import Amount
+from ...models import ActualAmount
 from ...models import Budget
 
 
@@ -68,6 +76,25 @@ class AmountViewTests(Authenticate):
         self.assertEquals(test_income.name, "New Income")
         self.assertEquals(test_income.amount, 78.75)
 
+    def test_income_create_budget_fetched_once(self):
+        """
+        Tests that creating and editing an income only looks up the user's budget once per request.
+        """
+        self.client.login(username="testUser", password="test123")
+        income = AmountFactory.create(name="Work", amount=400, amount_type="IN", budget=self.budget)
+
+        requests = [
+            (self.client.post, reverse("create_income"), {"name": "New Income", "amount": 78.75}),
+            (self.client.get, reverse("edit_income", kwargs={"pk": income.amount_id}), None),
+            (self.client.post, reverse("edit_income", kwargs={"pk": income.amount_id}), {"name": "Work", "amount": 500}),
+        ]
+        for method, url, data in requests:
+            with CaptureQueriesContext(connection) as queries:
+                response = method(url, data=data)
+            self.assertEquals(response.status_code, 302 if data else 200)
+            budget_queries = [query for query in queries if query["sql"].startswith('SELECT "budget_budget"')]
+            self.assertEquals(len(budget_queries), 1, url)
+
     def test_income_create_no_budget(self):
         """
         Tests that the user is redirected to the dashboard on 'create_income' if they do not have a budget.
@@ -340,6 +367,37 @@ class AmountViewTests(Authenticate):
         response = self.client.post(reverse("delete_expense", kwargs={"pk": test_expense.amount_id}))
         self.assertEquals(response.status_code, 404)
 
+    def test_amount_list_income_percentage(self):
+        """
+        Tests that the percentage of income is rendered for each amount.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        AmountFactory.create(name="Work", amount=400, amount_type="IN", budget=self.budget)
+        AmountFactory.create(name="Food", amount=100, amount_type="EX", budget=self.budget)
+
+        response = self.client.get(reverse("amount"))
+
+        self.assertEquals(response.status_code, 200)
+        self.assertContains(response, "100.00%")
+        self.assertContains(response, "25.00%")
+
+    def test_amount_list_query_count(self):
+        """
+        Tests that the number of queries for the amount list does not grow with the number of amounts.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        AmountFactory.create(name="Work", amount=400, amount_type="IN", budget=self.budget)
+        AmountFactory.create(name="Food", amount=100, amount_type="EX", budget=self.budget)
+        with self.assertNumQueries(7):
+            self.client.get(reverse("amount"))
+
+        AmountFactory.create_batch(20, name="Bonus", amount=10, amount_type="IN", budget=self.budget)
+        AmountFactory.create_batch(20, name="Power", amount=10, amount_type="EX", budget=self.budget)
+        with self.assertNumQueries(7):
+            self.client.get(reverse("amount"))
+
 class ActualAmountViewTests(Authenticate):
     """
     Tests for the ActualAmount views.
@@ -458,4 +516,225 @@ class ActualAmountViewTests(Authenticate):
             }
         )
 
-        self.assertEquals(response.status_code, 200)
\ No newline at end of file
+        self.assertEquals(response.status_code, 200)
+
+    def test_actual_routes_not_owner(self):
+        """
+        Tests that the user recieves a 404 response on every actual amount route for a period that is not theirs.
+        """
+        self.client.login(username="testUser2", password="test123")
+
+        income = AmountFactory.create(name="Work", amount=500, amount_type="IN", budget_period=self.period)
+        expense = self.period.estimates.get(name="Food")
+        actual_income = ActualAmountFactory.create(occurred_on=self.period.start_date, estimate=income, period=self.period)
+        actual_expense = ActualAmountFactory.create(occurred_on=self.period.start_date, estimate=expense, period=self.period)
+
+        period_id = self.period.budget_period_id
+        urls = [
+            reverse("actual_amount", kwargs={"period_id": period_id}),
+            reverse("actual_expense_summary", kwargs={"period_id": period_id}),
+            reverse("create_actual_income", kwargs={"period_id": period_id}),
+            reverse("create_actual_expense", kwargs={"period_id": period_id}),
+            reverse("edit_actual_income", kwargs={"period_id": period_id, "pk": actual_income.actual_id}),
+            reverse("delete_actual_income", kwargs={"period_id": period_id, "pk": actual_income.actual_id}),
+            reverse("edit_actual_expense", kwargs={"period_id": period_id, "pk": actual_expense.actual_id}),
+            reverse("delete_actual_expense", kwargs={"period_id": period_id, "pk": actual_expense.actual_id}),
+        ]
+        for url in urls:
+            with self.assertNumQueries(3):
+                response = self.client.get(url)
+            self.assertEquals(response.status_code, 404, url)
+
+        response = self.client.post(
+            reverse("create_actual_income", kwargs={"period_id": period_id}),
+            data={
+                "name": "Work",
+                "amount": 500,
+                "occurred_on": self.period.start_date,
+                "estimate_id": income.amount_id
+            }
+        )
+        self.assertEquals(response.status_code, 404)
+        self.assertEquals(ActualAmount.objects.count(), 2)
+
+    def test_actual_amount_list_query_count(self):
+        """
+        Tests that the number of queries for the actual amount list does not grow with the number of actual amounts.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        income = AmountFactory.create(name="Work", amount=500, amount_type="IN", budget_period=self.period)
+        expense = self.period.estimates.get(name="Food")
+        ActualAmountFactory.create(amount=500, occurred_on=self.period.start_date, estimate=income, period=self.period)
+        ActualAmountFactory.create(amount=125, occurred_on=self.period.start_date, estimate=expense, period=self.period)
+
+        url = reverse("actual_amount", kwargs={"period_id": self.period.budget_period_id})
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertContains(response, "25.00%")
+
+        ActualAmountFactory.create_batch(20, amount=10, occurred_on=self.period.start_date, estimate=income, period=self.period)
+        ActualAmountFactory.create_batch(20, amount=10, occurred_on=self.period.start_date, estimate=expense, period=self.period)
+        with self.assertNumQueries(6):
+            self.client.get(url)
+
+    def test_actual_amount_list_forecast(self):
+        """
+        Tests that a period in progress shows the forecast of its expenses and an ended period does not.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        period = BudgetPeriodFactory.create(start_date=timezone.now().date() - timedelta(days=4), budget=self.budget)
+        ActualAmountFactory.create(amount=100, occurred_on=period.start_date, estimate=period.estimates.get(name="Food"), period=period)
+
+        response = self.client.get(reverse("actual_amount", kwargs={"period_id": period.budget_period_id}))
+
+        forecast = response.context["forecast"]
+        self.assertEquals(forecast["days_elapsed"], 5)
+        self.assertEquals([item["spent"] for item in forecast["estimates"]], [Decimal("100")])
+        self.assertEquals(forecast["estimates"][0]["daily_rate"], Decimal("20"))
+        self.assertContains(response, "Expense Forecast")
+
+        response = self.client.get(reverse("actual_amount", kwargs={"period_id": self.period.budget_period_id}))
+
+        self.assertIsNone(response.context["forecast"])
+        self.assertNotContains(response, "Expense Forecast")
+
+    def test_actual_amount_list_pagination(self):
+        """
+        Tests that paging forwards and backwards through the actual amounts visits every row once, in order.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        expense = self.period.estimates.get(name="Food")
+        # Several rows share a date so the id is needed to order them
+        for day in range(12):
+            ActualAmountFactory.create_batch(5, amount=10, occurred_on=self.period.start_date + timedelta(days=day % 4), estimate=expense, period=self.period)
+        expected = list(ActualAmount.objects.filter(period=self.period).order_by("-occurred_on", "-actual_id"))
+
+        url = reverse("actual_amount", kwargs={"period_id": self.period.budget_period_id})
+        pages = []
+        response = self.client.get(url)
+        while True:
+            page = response.context["expenses"]
+            pages.append([actual.actual_id for actual in page])
+            self.assertEquals(response.context["expense_count"], 60)
+            if not page.has_next():
+                break
+            response = self.client.get(f"{url}?{page.next_query()}")
+
+        self.assertEquals([len(page) for page in pages], [25, 25, 10])
+        self.assertEquals(sum(pages, []), [actual.actual_id for actual in expected])
+
+        # Go back from the last page
+        response = self.client.get(f"{url}?{page.previous_query()}")
+        self.assertEquals([actual.actual_id for actual in response.context["expenses"]], pages[1])
+        response = self.client.get(f"{url}?{response.context['expenses'].previous_query()}")
+        self.assertEquals([actual.actual_id for actual in response.context["expenses"]], pages[0])
+        self.assertFalse(response.context["expenses"].has_previous())
+
+    def test_actual_amount_list_invalid_cursor(self):
+        """
+        Tests that an invalid cursor shows the first page.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        url = reverse("actual_amount", kwargs={"period_id": self.period.budget_period_id})
+        response = self.client.get(f"{url}?expense_after=not-a-cursor")
+        self.assertEquals(response.status_code, 200)
+
+    def test_actual_views_no_lazy_loads(self):
+        """
+        Tests that the actual amount list, edit and delete views load everything they render in their queries.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        income = AmountFactory.create(name="Work", amount=500, amount_type="IN", budget_period=self.period)
+        expense = self.period.estimates.get(name="Food")
+        actual_income = ActualAmountFactory.create(amount=500, occurred_on=self.period.start_date, estimate=income, period=self.period)
+        actual_expense = ActualAmountFactory.create(amount=125, occurred_on=self.period.start_date, estimate=expense, period=self.period)
+        ActualAmountFactory.create_batch(10, amount=10, occurred_on=self.period.start_date, estimate=expense, period=self.period)
+
+        period_id = self.period.budget_period_id
+        urls = [
+            reverse("actual_amount", kwargs={"period_id": period_id}),
+            reverse("edit_actual_income", kwargs={"period_id": period_id, "pk": actual_income.actual_id}),
+            reverse("delete_actual_income", kwargs={"period_id": period_id, "pk": actual_income.actual_id}),
+            reverse("edit_actual_expense", kwargs={"period_id": period_id, "pk": actual_expense.actual_id}),
+            reverse("delete_actual_expense", kwargs={"period_id": period_id, "pk": actual_expense.actual_id}),
+        ]
+        for url in urls:
+            with forbid_lazy_loads():
+                response = self.client.get(url)
+            self.assertEquals(response.status_code, 200, url)
+
+        with forbid_lazy_loads():
+            response = self.client.post(
+                reverse("edit_actual_expense", kwargs={"period_id": period_id, "pk": actual_expense.actual_id}),
+                data={
+                    "name": "Countdown",
+                    "amount": 150,
+                    "occurred_on_year": self.period.start_date.year,
+                    "occurred_on_month": self.period.start_date.month,
+                    "occurred_on_day": self.period.start_date.day,
+                    "estimate_id": expense.amount_id,
+                }
+            )
+        self.assertEquals(response.status_code, 302)
+
+        for name, actual in (("delete_actual_income", actual_income), ("delete_actual_expense", actual_expense)):
+            with forbid_lazy_loads():
+                response = self.client.post(reverse(name, kwargs={"period_id": period_id, "pk": actual.actual_id}))
+            self.assertEquals(response.status_code, 302, name)
+        self.assertFalse(ActualAmount.objects.filter(pk__in=[actual_income.pk, actual_expense.pk]).exists())
+
+    def test_export_csv(self):
+        """
+        Tests that the actual amounts are streamed as a CSV that can be imported again.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        income = AmountFactory.create(name="Work", amount=500, amount_type="IN", budget_period=self.period)
+        expense = self.period.estimates.get(name="Food")
+        ActualAmountFactory.create(name="Pay", amount=500, occurred_on=self.period.start_date + timedelta(days=1), estimate=income, period=self.period)
+        ActualAmountFactory.create(name="Countdown", amount=45.5, occurred_on=self.period.start_date, estimate=expense, period=self.period)
+
+        response = self.client.get(reverse("export_actual_amounts", kwargs={"period_id": self.period.budget_period_id}))
+
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment;", response["Content-Disposition"])
+        content = b"".join(response.streaming_content).decode()
+        self.assertEquals(content.splitlines(), [
+            "date,name,amount,estimate,type",
+            f"{self.period.start_date},Countdown,-45.50,Food,Expense",
+            f"{self.period.start_date + timedelta(days=1)},Pay,500.00,Work,Income",
+        ])
+        rows = list(parse_csv(content.splitlines(keepends=True)))
+        self.assertEquals([(row.name, row.amount, row.estimate) for row in rows], [
+            ("Countdown", Decimal("-45.50"), "Food"),
+            ("Pay", Decimal("500.00"), "Work"),
+        ])
+
+    def test_export_csv_not_owner(self):
+        self.client.login(username="testUser2", password="test123")
+
+        response = self.client.get(reverse("export_actual_amounts", kwargs={"period_id": self.period.budget_period_id}))
+
+        self.assertEquals(response.status_code, 404)
+
+    def test_summary_view(self):
+        """
+        Tests that the summary shows both the incomes and expenses of the period.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        income = AmountFactory.create(name="Work", amount=500, amount_type="IN", budget_period=self.period)
+        ActualAmountFactory.create(amount=250, occurred_on=self.period.start_date, estimate=income, period=self.period)
+
+        response = self.client.get(reverse("actual_expense_summary", kwargs={"period_id": self.period.budget_period_id}))
+
+        self.assertEquals(response.status_code, 200)
+        self.assertContains(response, "Income Summary")
+        self.assertContains(response, "Expense Summary")
+        self.assertContains(response, "50.00%")
@@ -0,0 +1,307 @@
+import json
+from datetime import date
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import reverse
+
+from ..helpers import Authenticate
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
+from ...api import BATCH_LIMIT
+from ...models import ActualAmount, PeriodRollup
+
+class ApiViewTests(Authenticate):
+    """
+    Tests for the JSON API views.
+    """
+    def setUp(self):
+        super().setUp()
+
+        self.budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=self.budget)
+        AmountFactory.create(name="Food", amount_type="EX", amount=200, budget=self.budget)
+        # Ends on 2023-06-30
+        self.period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=self.budget)
+        self.work = self.period.estimates.get(name="Work")
+        self.food = self.period.estimates.get(name="Food")
+        self.url = reverse("api_actual_amounts", kwargs={"period_id": self.period.pk})
+
+        self.second_user = User.objects.create(username="testUser2")
+        self.second_user.set_password("test123")
+        self.second_user.save()
+        BudgetFactory.create(owner=self.second_user)
+
+    def post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type="application/json")
+
+    def test_unauthorised(self):
+        response = self.client.get(reverse("api_budget"))
+
+        self.assertEquals(response.status_code, 401)
+        self.assertEquals(response.json()["version"], 1)
+        self.assertEquals(self.post({"create": []}).status_code, 401)
+
+    def test_not_owner(self):
+        self.client.login(username="testUser2", password="test123")
+
+        self.assertEquals(self.client.get(reverse("api_budget_period", kwargs={"period_id": self.period.pk})).status_code, 404)
+        self.assertEquals(self.post({"delete": []}).status_code, 404)
+
+    def test_budget(self):
+        self.client.login(username="testUser", password="test123")
+
+        data = self.client.get(reverse("api_budget")).json()
+
+        self.assertEquals(data["budget"]["id"], self.budget.pk)
+        self.assertEquals([estimate["name"] for estimate in data["estimates"]], ["Food", "Work"])
+        self.assertEquals(Decimal(data["totals"]["net"]), Decimal("800"))
+
+    def test_budget_periods(self):
+        self.client.login(username="testUser", password="test123")
+        ActualAmountFactory.create(amount="25.50", occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+
+        data = self.client.get(reverse("api_budget_periods")).json()
+
+        self.assertEquals([period["id"] for period in data["budget_periods"]], [self.period.pk])
+        self.assertEquals(data["budget_periods"][0]["totals"]["expense"], "25.50")
+        self.assertIsNone(data["next"])
+
+        data = self.client.get(reverse("api_budget_period", kwargs={"period_id": self.period.pk})).json()
+        self.assertEquals(data["budget_period"]["end_date"], "2023-06-30")
+        self.assertEquals(data["totals"]["expense_count"], 1)
+        food = next(estimate for estimate in data["estimates"] if estimate["id"] == self.food.pk)
+        self.assertEquals(food["totals"]["expense"], "25.50")
+
+    def get_creates(self):
+        """
+        Returns a batch of 300 offline expenses and an income.
+        """
+        creates = [
+            {"name": f"Shop {index}", "occurred_on": f"2023-06-{index % 30 + 1:02}", "amount": "1.50", "estimate": self.food.pk}
+            for index in range(300)
+        ]
+        creates.append({"name": "Pay", "occurred_on": "2023-06-15", "amount": "1000", "estimate": self.work.pk})
+        return creates
+
+    @skipUnless(connection.features.can_return_rows_from_bulk_insert, "The ids of rows inserted in bulk are not returned by this database")
+    def test_batch_create_query_count(self):
+        """
+        Tests that a large batch of offline transactions is saved with a fixed number of queries.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        with self.assertNumQueries(13):
+            response = self.post({"create": self.get_creates()})
+
+        self.assertEquals(response.status_code, 200)
+
+    def test_batch_create(self):
+        """
+        Tests that a large batch of offline transactions is saved in one request.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        response = self.post({"create": self.get_creates()})
+
+        self.assertEquals(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(all(result["status"] == "created" for result in data["results"]["create"]))
+        self.assertEquals(data["results"]["create"][-1]["actual"]["name"], "Pay")
+        self.assertIsNotNone(data["results"]["create"][-1]["actual"]["id"])
+        self.assertEquals(ActualAmount.objects.filter(period=self.period).count(), 301)
+        self.assertEquals(data["totals"]["expense"], "450.00")
+        self.assertEquals(data["totals"]["income_count"], 1)
+        self.assertEquals(data["estimate_totals"][str(self.food.pk)]["expense_count"], 300)
+        self.assertEquals(PeriodRollup.objects.verify(), [])
+
+    def test_batch_invalid_items(self):
+        """
+        Tests that invalid items are reported with the model's validation messages and the valid ones are still saved.
+        """
+        self.client.login(username="testUser", password="test123")
+        other_period = BudgetPeriodFactory.create(start_date=date(2023, 7, 1), budget=self.budget)
+        other_actual = ActualAmountFactory.create(occurred_on=date(2023, 7, 2), estimate=other_period.estimates.get(name="Food"), period=other_period)
+
+        response = self.post({
+            "create": [
+                {"name": "Shop", "occurred_on": "2023-06-02", "amount": "10", "estimate": self.food.pk},
+                {"name": "", "occurred_on": "2023-06-31", "amount": "ten", "estimate": self.food.pk},
+                {"name": "Late", "occurred_on": "2023-07-02", "amount": "10", "estimate": self.food.pk},
+                {"name": "Unknown", "occurred_on": "2023-06-02", "amount": "10", "estimate": other_actual.estimate_id},
+                "not an object",
+            ],
+            "delete": [other_actual.pk],
+        })
+
+        results = response.json()["results"]
+        self.assertEquals([result["status"] for result in results["create"]], ["created", "invalid", "invalid", "invalid", "invalid"])
+        self.assertEquals(set(results["create"][1]["errors"]), {"name", "occurred_on", "amount"})
+        self.assertEquals(results["create"][2]["errors"], {"__all__": ["Occurred On must be less than or equal to the end date"]})
+        self.assertEquals(results["create"][3]["errors"], {"estimate": ["The period has no estimate with this id"]})
+        # Actuals of other periods cannot be changed through this period
+        self.assertEquals(results["delete"], [{"id": other_actual.pk, "status": "not_found"}])
+        self.assertTrue(ActualAmount.objects.filter(pk=other_actual.pk).exists())
+        self.assertEquals(ActualAmount.objects.filter(period=self.period).count(), 1)
+
+    def test_batch_update_delete(self):
+        self.client.login(username="testUser", password="test123")
+        actuals = [
+            ActualAmountFactory.create(amount=10, occurred_on=date(2023, 6, day), estimate=self.food, period=self.period)
+            for day in range(1, 6)
+        ]
+
+        with self.assertNumQueries(17):
+            response = self.post({
+                "update": [
+                    {"id": actuals[0].pk, "amount": "20.25"},
+                    {"id": actuals[1].pk, "estimate": self.work.pk, "name": "Refund"},
+                    {"id": actuals[2].pk, "amount": "-1"},
+                ],
+                "delete": [actuals[3].pk, actuals[4].pk, actuals[4].pk, actuals[0].pk],
+            })
+
+        results = response.json()["results"]
+        self.assertEquals([result["status"] for result in results["update"]], ["updated", "updated", "invalid"])
+        self.assertEquals([result["status"] for result in results["delete"]], ["deleted", "deleted", "duplicate", "duplicate"])
+        self.assertEquals(ActualAmount.objects.get(pk=actuals[0].pk).amount, Decimal("20.25"))
+        self.assertEquals(ActualAmount.objects.get(pk=actuals[1].pk).estimate, self.work)
+        self.assertEquals(ActualAmount.objects.get(pk=actuals[2].pk).amount, Decimal("10"))
+        self.assertEquals(ActualAmount.objects.filter(period=self.period).count(), 3)
+        self.assertEquals(response.json()["totals"]["expense"], "30.25")
+        self.assertEquals(PeriodRollup.objects.verify(), [])
+
+    def test_batch_malformed(self):
+        self.client.login(username="testUser", password="test123")
+
+        response = self.client.post(self.url, "{", content_type="application/json")
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(self.post({"create": {}}).status_code, 400)
+        self.assertEquals(self.post({"delete": list(range(BATCH_LIMIT + 1))}).status_code, 400)
+        self.assertEquals(self.client.delete(self.url).status_code, 405)
+
+    def test_actual_amounts_pagination(self):
+        self.client.login(username="testUser", password="test123")
+        for day in range(1, 31):
+            for _ in range(4):
+                ActualAmountFactory.create(occurred_on=date(2023, 6, day), estimate=self.food, period=self.period)
+
+        first = self.client.get(self.url).json()
+        second = self.client.get(self.url, {"after": first["next"]}).json()
+
+        self.assertEquals(len(first["actual_amounts"]), 100)
+        self.assertEquals(len(second["actual_amounts"]), 20)
+        self.assertIsNone(second["next"])
+        ids = [actual["id"] for actual in first["actual_amounts"] + second["actual_amounts"]]
+        self.assertEquals(ids, list(ActualAmount.objects.order_by("-occurred_on", "-actual_id").values_list("pk", flat=True)))
+
+class ChangesApiTests(Authenticate):
+    """
+    Tests for the delta sync endpoint.
+    """
+    def setUp(self):
+        super().setUp()
+        self.client.login(username="testUser", password="test123")
+
+        self.budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Food", amount_type="EX", amount=200, budget=self.budget)
+        self.period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=self.budget)
+        self.food = self.period.estimates.get(name="Food")
+        self.actual = ActualAmountFactory.create(occurred_on=date(2023, 6, 2), estimate=self.food, period=self.period)
+
+    def sync(self, cursor=None):
+        return self.client.get(reverse("api_changes"), {"cursor": cursor} if cursor else {}).json()
+
+    def test_full_sync(self):
+        data = self.sync()
+
+        self.assertTrue(data["reset"])
+        self.assertFalse(data["more"])
+        self.assertEquals(data["budget"]["id"], self.budget.pk)
+        self.assertEquals([period["id"] for period in data["budget_periods"]], [self.period.pk])
+        self.assertEquals(len(data["estimates"]), 2)
+        self.assertEquals([actual["id"] for actual in data["actual_amounts"]], [self.actual.pk])
+
+    def test_no_changes(self):
+        """
+        Tests that a sync with an up to date cursor only reads the budget and returns nothing.
+        """
+        cursor = self.sync()["cursor"]
+
+        # The session, the user and the budget
+        with self.assertNumQueries(3):
+            data = self.sync(cursor)
+
+        self.assertFalse(data["reset"])
+        self.assertIsNone(data["budget"])
+        self.assertEquals(data["actual_amounts"], [])
+        self.assertEquals(data["cursor"], cursor)
+
+    def test_changes_since_cursor(self):
+        cursor = self.sync()["cursor"]
+        self.actual.amount = 99
+        self.actual.save()
+        created = ActualAmountFactory.create(occurred_on=date(2023, 6, 3), estimate=self.food, period=self.period)
+        deleted = ActualAmountFactory.create(occurred_on=date(2023, 6, 4), estimate=self.food, period=self.period)
+        deleted_id = deleted.pk
+        deleted.delete()
+
+        data = self.sync(cursor)
+
+        self.assertFalse(data["reset"])
+        self.assertEquals([actual["id"] for actual in data["actual_amounts"]], [self.actual.pk, created.pk])
+        self.assertEquals(data["actual_amounts"][0]["amount"], "99.00")
+        self.assertEquals(data["budget_periods"], [])
+        self.assertEquals(data["deleted"]["actual_amounts"], [deleted_id])
+        self.assertEquals(self.sync(data["cursor"])["actual_amounts"], [])
+
+    def test_batch_changes(self):
+        """
+        Tests that the rows written in bulk by the batch API are synced.
+        """
+        cursor = self.sync()["cursor"]
+        url = reverse("api_actual_amounts", kwargs={"period_id": self.period.pk})
+        self.client.post(url, json.dumps({
+            "create": [{"name": "Shop", "occurred_on": "2023-06-05", "amount": "5", "estimate": self.food.pk}],
+            "delete": [self.actual.pk],
+        }), content_type="application/json")
+
+        data = self.sync(cursor)
+
+        self.assertEquals([actual["name"] for actual in data["actual_amounts"]], ["Shop"])
+        self.assertEquals(data["deleted"]["actual_amounts"], [self.actual.pk])
+
+    def test_paged_sync(self):
+        """
+        Tests that a sync with more changes than the limit is returned in parts without missing any.
+        """
+        ActualAmountFactory.create_batch(5, occurred_on=date(2023, 6, 5), estimate=self.food, period=self.period)
+        expected = set(ActualAmount.objects.values_list("pk", flat=True))
+
+        synced = set()
+        cursor = None
+        with patch("budget.api.SYNC_LIMIT", 2):
+            for _ in range(10):
+                data = self.sync(cursor)
+                synced.update(actual["id"] for actual in data["actual_amounts"])
+                cursor = data["cursor"]
+                if not data["more"]:
+                    break
+
+        self.assertFalse(data["more"])
+        self.assertEquals(synced, expected)
+
+    def test_cursor_other_budget(self):
+        """
+        Tests that a cursor for another budget starts a full sync.
+        """
+        cursor = self.sync()["cursor"]
+        self.budget.delete()
+        BudgetFactory.create(owner=self.user)
+
+        data = self.sync(cursor)
+
+        self.assertTrue(data["reset"])
+        self.assertEquals(data["actual_amounts"], [])
@@ -0,0 +1,186 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ...cache import budget_cache_key, get_budget_cache
+from ..helpers import Authenticate
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
+
+# The async routes and the sync routes they are versions of
+ASYNC_ROUTES = [
+    ("async_dashboard", "dashboard", False),
+    ("async_amount", "amount", False),
+    ("async_actual_amount", "actual_amount", True),
+    ("async_actual_expense_summary", "actual_expense_summary", True),
+]
+
+def create_budget(user):
+    """
+    Creates a budget with an income and expense, a period and an actual amount of each.
+
+    :returns: the period
+    """
+    budget = BudgetFactory.create(owner=user)
+    AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=budget)
+    AmountFactory.create(name="Food", amount_type="EX", amount=300, budget=budget)
+    period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=budget)
+    ActualAmountFactory.create(name="Pay", amount=900, occurred_on=date(2023, 6, 2), estimate=period.estimates.get(name="Work"), period=period)
+    ActualAmountFactory.create(name="Shop", amount=120, occurred_on=date(2023, 6, 3), estimate=period.estimates.get(name="Food"), period=period)
+    return period
+
+class AsyncViewTests(Authenticate):
+    """
+    Tests for the async versions of the read pages.
+    """
+    def setUp(self):
+        super().setUp()
+        self.client.login(username="testUser", password="test123")
+        self.period = create_budget(self.user)
+
+    def get_url(self, name, has_period):
+        return reverse(name, kwargs={"period_id": self.period.pk}) if has_period else reverse(name)
+
+    def test_same_as_sync(self):
+        """
+        Tests that each async page is the same as the sync page it is a version of, with the same ETag.
+        """
+        for async_name, sync_name, has_period in ASYNC_ROUTES:
+            with self.subTest(route=async_name):
+                async_response = self.client.get(self.get_url(async_name, has_period))
+                sync_response = self.client.get(self.get_url(sync_name, has_period))
+
+                self.assertEqual(200, async_response.status_code)
+                self.assertEqual(sync_response.content, async_response.content)
+                self.assertEqual(sync_response["ETag"], async_response["ETag"])
+
+    def test_same_as_sync_in_progress(self):
+        """
+        Tests that the async actual amount page of a period in progress has the same forecast and ETag as the sync page.
+        """
+        period = BudgetPeriodFactory.create(start_date=timezone.now().date() - timedelta(days=2), budget=self.period.budget)
+        ActualAmountFactory.create(name="Shop", amount=90, occurred_on=period.start_date, estimate=period.estimates.get(name="Food"), period=period)
+
+        async_response = self.client.get(reverse("async_actual_amount", kwargs={"period_id": period.pk}))
+        sync_response = self.client.get(reverse("actual_amount", kwargs={"period_id": period.pk}))
+
+        self.assertContains(async_response, "Expense Forecast")
+        self.assertEqual(sync_response.content, async_response.content)
+        self.assertEqual(sync_response["ETag"], async_response["ETag"])
+
+    def test_percentages(self):
+        """
+        Tests that the percentage of the income is set on each actual amount.
+        """
+        response = self.client.get(self.get_url("async_actual_amount", True))
+
+        self.assertEqual(["100.00"], [actual.income_percentage for actual in response.context["incomes"]])
+        self.assertEqual(["13.33"], [actual.income_percentage for actual in response.context["expenses"]])
+
+    def test_shares_cache(self):
+        """
+        Tests that the async pages cache their context under the same keys as the sync pages.
+        """
+        budget = self.period.budget
+        budget.refresh_from_db()
+        cache = get_budget_cache()
+        for async_name, name, parts in [
+            ("async_amount", "amount_list", (timezone.now().date().isoformat(),)),
+            ("async_actual_amount", "actual_amount_list", (self.period.pk, "")),
+            ("async_actual_expense_summary", "actual_expense_summary", (self.period.pk,)),
+        ]:
+            with self.subTest(route=async_name):
+                key = budget_cache_key(budget.pk, budget.change_version, name, *parts)
+
+                self.client.get(self.get_url(async_name, async_name != "async_amount"))
+
+                self.assertIsNotNone(cache.get(key))
+
+    def test_not_modified(self):
+        """
+        Tests that an async page returns 304 when the client has the current version.
+        """
+        url = self.get_url("async_actual_amount", True)
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(304, response.status_code)
+
+    def test_login_required(self):
+        """
+        Tests that the user is redirected to log in.
+        """
+        self.client.logout()
+        for async_name, _, has_period in ASYNC_ROUTES:
+            with self.subTest(route=async_name):
+                url = self.get_url(async_name, has_period)
+                response = self.client.get(url)
+
+                self.assertRedirects(response, f"{reverse('login')}?next={url}", fetch_redirect_response=False)
+
+    def test_period_not_theirs(self):
+        """
+        Tests that another user's period is a 404.
+        """
+        second_user = User.objects.create(username="testUser2")
+        other_period = create_budget(second_user)
+
+        for name in ["async_actual_amount", "async_actual_expense_summary"]:
+            with self.subTest(route=name):
+                response = self.client.get(reverse(name, kwargs={"period_id": other_period.pk}))
+
+                self.assertEqual(404, response.status_code)
+
+    def test_amount_list_without_budget(self):
+        """
+        Tests that a user without a budget is sent to the dashboard.
+        """
+        self.period.budget.delete()
+
+        response = self.client.get(reverse("async_amount"))
+
+        self.assertRedirects(response, reverse("dashboard"))
+
+class AsyncConcurrentQueryTests(TransactionTestCase):
+    """
+    Tests the async pages with their queries running at the same time in worker threads.
+
+    The rows must be committed for the worker threads' connections to see them, so these are not run in a transaction.
+    """
+    def setUp(self):
+        get_budget_cache().clear()
+        self.user = User.objects.create(username="testUser")
+        self.period = create_budget(self.user)
+        self.async_client.force_login(self.user)
+
+    async def test_pages(self):
+        """
+        Tests that the pages are rendered from the queries run in the worker threads and every query is recorded.
+        """
+        response = await self.async_client.get(reverse("async_actual_amount", kwargs={"period_id": self.period.pk}))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(["Pay"], [actual.name for actual in response.context["incomes"]])
+        self.assertEqual(["Shop"], [actual.name for actual in response.context["expenses"]])
+        self.assertEqual(900, response.context["total_income"])
+        # The session, the user, the period, the totals and the two pages
+        self.assertIn('desc="6 queries"', response["Server-Timing"])
+
+        response = await self.async_client.get(reverse("async_actual_expense_summary", kwargs={"period_id": self.period.pk}))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(["Work"], [item["name"] for item in response.context["incomes"]])
+        self.assertEqual(["Food"], [item["name"] for item in response.context["expenses"]])
+
+    async def test_sync_view_recorded(self):
+        """
+        Tests that the queries of a sync view served through the async handler are recorded.
+        """
+        response = await self.async_client.get(reverse("amount"))
+
+        self.assertEqual(200, response.status_code)
+        self.assertIn('desc="7 queries"', response["Server-Timing"])
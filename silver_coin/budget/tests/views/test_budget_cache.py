@@ -0,0 +1,198 @@
+import tempfile
+from io import StringIO
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..helpers import Authenticate
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
+
+from ...models import Budget
+
+class BudgetCacheTests(Authenticate):
+    """
+    Tests the budget pages are cached until the Budget changes.
+    """
+    def setUp(self):
+        super().setUp()
+        self.client.login(username="testUser", password="test123")
+        self.budget = BudgetFactory.create(owner=self.user)
+        self.income = AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=self.budget)
+        self.period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=self.budget)
+        self.estimate = self.period.estimates.get(name="Work")
+        self.actual = ActualAmountFactory.create(
+            name="Pay", amount=900, occurred_on=date(2023, 6, 2), estimate=self.estimate, period=self.period
+        )
+
+    def get_query_count(self, url):
+        """
+        Gets the url and returns the response and the number of queries made.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        return response, len(context.captured_queries)
+
+    def test_cached_pages_skip_queries(self):
+        """
+        Tests that getting a page again reads its context from the cache instead of the database.
+        """
+        urls = [
+            reverse("amount"),
+            reverse("actual_amount", kwargs={"period_id": self.period.pk}),
+            reverse("actual_expense_summary", kwargs={"period_id": self.period.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                first, first_count = self.get_query_count(url)
+                second, second_count = self.get_query_count(url)
+
+                self.assertLess(second_count, first_count)
+                self.assertEqual(first.content, second.content)
+
+    def test_amount_list_invalidated(self):
+        """
+        Tests that creating, editing and deleting an estimate replaces the cached amount list.
+        """
+        url = reverse("amount")
+        self.client.get(url)
+
+        rent = AmountFactory.create(name="Rent", amount_type="EX", amount=400, budget=self.budget)
+        self.assertContains(self.client.get(url), "Rent")
+
+        rent.name = "Mortgage"
+        rent.save()
+        response = self.client.get(url)
+        self.assertContains(response, "Mortgage")
+        self.assertNotContains(response, "Rent")
+
+        rent.delete()
+        self.assertNotContains(self.client.get(url), "Mortgage")
+
+    def test_amount_list_invalidated_by_budget_edit(self):
+        """
+        Tests that editing the Budget itself replaces the cached amount list.
+        """
+        url = reverse("amount")
+        _, first_count = self.get_query_count(url)
+
+        self.budget.name = "Renamed"
+        self.budget.save()
+
+        _, count = self.get_query_count(url)
+        self.assertEqual(first_count, count)
+
+    def test_actual_amount_list_invalidated(self):
+        """
+        Tests that recording, editing and deleting an actual amount replaces the cached list and totals.
+        """
+        url = reverse("actual_amount", kwargs={"period_id": self.period.pk})
+        self.assertEqual(Decimal(900), self.client.get(url).context["total_income"])
+
+        bonus = ActualAmountFactory.create(
+            name="Bonus", amount=50, occurred_on=date(2023, 6, 3), estimate=self.estimate, period=self.period
+        )
+        response = self.client.get(url)
+        self.assertContains(response, "Bonus")
+        self.assertEqual(Decimal(950), response.context["total_income"])
+
+        bonus.amount = 75
+        bonus.save()
+        self.assertEqual(Decimal(975), self.client.get(url).context["total_income"])
+
+        bonus.delete()
+        response = self.client.get(url)
+        self.assertNotContains(response, "Bonus")
+        self.assertEqual(Decimal(900), response.context["total_income"])
+
+    def test_actual_amount_list_keyed_by_page(self):
+        """
+        Tests that each page of the actual amounts is cached separately.
+        """
+        for day in range(3, 30):
+            ActualAmountFactory.create(name=f"Pay {day}", amount=1, occurred_on=date(2023, 6, day), estimate=self.estimate, period=self.period)
+        url = reverse("actual_amount", kwargs={"period_id": self.period.pk})
+        first = self.client.get(url)
+        second = self.client.get(f"{url}?{first.context['incomes'].next_query()}")
+
+        self.assertNotEqual(
+            [actual.pk for actual in first.context["incomes"]],
+            [actual.pk for actual in second.context["incomes"]],
+        )
+
+    def test_summary_invalidated_by_period_change(self):
+        """
+        Tests that a new estimate for the period replaces the cached summary.
+        """
+        url = reverse("actual_expense_summary", kwargs={"period_id": self.period.pk})
+        self.client.get(url)
+
+        AmountFactory.create(name="Groceries", amount_type="EX", amount=150, budget_period=self.period)
+
+        self.assertContains(self.client.get(url), "Groceries")
+
+    def test_pages_not_shared_between_budgets(self):
+        """
+        Tests that another user's cached pages are not served, the key includes the Budget.
+        """
+        url = reverse("amount")
+        self.client.get(url)
+
+        second_user = User.objects.create(username="testUser2")
+        second_user.set_password("test123")
+        second_user.save()
+        BudgetFactory.create(owner=second_user)
+        self.client.login(username="testUser2", password="test123")
+
+        self.assertNotContains(self.client.get(url), "Work")
+
+    def test_deleted_budget_not_served(self):
+        """
+        Tests that a new Budget with the id and change_version of a deleted one is not served its cached pages.
+        """
+        url = reverse("amount")
+        self.assertContains(self.client.get(url), "Work")
+        budget_id, version = self.budget.pk, Budget.objects.get(pk=self.budget.pk).change_version
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.budget.delete()
+        budget = BudgetFactory.create(owner=self.user, budget_id=budget_id)
+        Budget.objects.filter(pk=budget.pk).update(change_version=version)
+
+        self.assertNotContains(self.client.get(url), "Work")
+
+    def test_rebuild_rollups_invalidates(self):
+        """
+        Tests that rebuilding the rollups bumps the Budget's change_version so totals cached before are not served.
+        """
+        version = Budget.objects.get(pk=self.budget.pk).change_version
+
+        call_command("rebuild_rollups", stdout=StringIO())
+
+        self.assertEqual(version + 1, Budget.objects.get(pk=self.budget.pk).change_version)
+
+    def test_file_backend(self):
+        """
+        Tests that the pages can be cached in the file based backend.
+        """
+        with tempfile.TemporaryDirectory() as location:
+            caches = {
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                "budget": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location},
+            }
+            with override_settings(CACHES=caches):
+                url = reverse("actual_amount", kwargs={"period_id": self.period.pk})
+                first, first_count = self.get_query_count(url)
+                second, second_count = self.get_query_count(url)
+
+                self.assertLess(second_count, first_count)
+                self.assertEqual(first.content, second.content)
+
+                ActualAmountFactory.create(name="Bonus", amount=50, occurred_on=date(2023, 6, 3), estimate=self.estimate, period=self.period)
+                self.assertContains(self.client.get(url), "Bonus")
@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from ..helpers import Authenticate
+from ..factories import BudgetFactory, BudgetPeriodFactory
+
+from ...models import BudgetPeriod
+
+class BudgetPeriodViewTests(Authenticate):
+    """
+    Tests for the BudgetPeriod views.
+    """
+    def setUp(self):
+        """
+        Creates a budget period for the user and a second user to try and access it.
+        """
+        super().setUp()
+        self.budget = BudgetFactory.create(owner=self.user)
+        self.period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=self.budget)
+
+        self.second_user = User.objects.create(username="testUser2")
+        self.second_user.set_password("test123")
+        self.second_user.save()
+        BudgetFactory.create(owner=self.second_user)
+
+    def test_edit_delete_redirect_unauthorised(self):
+        """
+        Tests that the user is redirected to the login screen if they are not logged in.
+        """
+        for name in ("edit_budget_period", "delete_budget_period"):
+            response = self.client.get(reverse(name, kwargs={"pk": self.period.budget_period_id}))
+            self.assertEquals(response.status_code, 302)
+
+    def test_edit_delete_not_owner(self):
+        """
+        Tests that the user recieves a 404 response if they try to edit or delete a period that is not theirs.
+        """
+        self.client.login(username="testUser2", password="test123")
+
+        for name in ("edit_budget_period", "delete_budget_period"):
+            response = self.client.get(reverse(name, kwargs={"pk": self.period.budget_period_id}))
+            self.assertEquals(response.status_code, 404)
+
+        response = self.client.post(reverse("delete_budget_period", kwargs={"pk": self.period.budget_period_id}))
+        self.assertEquals(response.status_code, 404)
+        self.assertTrue(BudgetPeriod.objects.filter(pk=self.period.pk).exists())
+
+    def test_delete_owner(self):
+        """
+        Tests that the owner can delete their period.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        response = self.client.post(reverse("delete_budget_period", kwargs={"pk": self.period.budget_period_id}))
+        self.assertEquals(response.status_code, 302)
+        self.assertFalse(BudgetPeriod.objects.filter(pk=self.period.pk).exists())
+
+    def test_list_pagination(self):
+        """
+        Tests that the budget periods are listed newest first, a page at a time.
+        """
+        self.client.login(username="testUser", password="test123")
+
+        start_date = self.period.start_date
+        for _ in range(30):
+            start_date = (start_date - timedelta(days=1)).replace(day=1)
+            BudgetPeriodFactory.create(start_date=start_date, budget=self.budget)
+        expected = list(BudgetPeriod.objects.filter(budget=self.budget).order_by("-start_date"))
+
+        response = self.client.get(reverse("budget_period"))
+        first_page = response.context["budget_periods"]
+        self.assertEquals(list(first_page), expected[:25])
+        self.assertTrue(first_page.has_next())
+
+        # The session, the user, the Budget for the ETag and the page
+        with self.assertNumQueries(4):
+            response = self.client.get(f"{reverse('budget_period')}?{first_page.next_query()}")
+        second_page = response.context["budget_periods"]
+        self.assertEquals(list(second_page), expected[25:])
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
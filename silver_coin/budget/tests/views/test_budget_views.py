@@ -1,7 +1,14 @@
+import io
+import json
+import zipfile
+from datetime import date
+
+from django.contrib.auth.models import User
 from django.test import Client
 from django.urls import reverse
 
 from ..helpers import Authenticate
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
 
 class BudgetCreateView(Authenticate):
     """
@@ -27,3 +34,41 @@ class BudgetCreateView(Authenticate):
         pass
 
 
+
+class ExportAccountView(Authenticate):
+    """
+    Tests the account archive download.
+    """
+    def setUp(self):
+        super().setUp()
+
+        budget = BudgetFactory.create(owner=self.user)
+        income = AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=budget)
+        period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=budget)
+        ActualAmountFactory.create(estimate=period.estimates.get(name=income.name), period=period)
+
+        second_user = User.objects.create(username="testUser2")
+        BudgetFactory.create(owner=second_user, name="Not mine")
+
+    def test_export_redirect_unauthorised(self):
+        response = self.client.get(reverse("export_account"))
+
+        self.assertEquals(response.status_code, 302)
+
+    def test_export_account(self):
+        self.client.login(username="testUser", password="test123")
+
+        response = self.client.get(reverse("export_account"))
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response["Content-Type"], "application/zip")
+        self.assertIn("attachment; filename=\"silver_coin_testUser_", response["Content-Disposition"])
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEquals(json.loads(archive.read("manifest.json"))["username"], "testUser")
+            budgets = [json.loads(line) for line in archive.read("budgets.jsonl").splitlines()]
+            self.assertEquals([budget["name"] for budget in budgets], [self.user.budget_set.get().name])
+            self.assertNotIn("owner_id", budgets[0])
+            # The Budget's estimate and the copy on the period
+            self.assertEquals(len(archive.read("estimates.jsonl").splitlines()), 2)
+            self.assertEquals(len(archive.read("budget_periods.jsonl").splitlines()), 1)
+            self.assertEquals(len(archive.read("actual_amounts.jsonl").splitlines()), 1)
@@ -0,0 +1,144 @@
+import json
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ...cache import get_budget_cache
+from ..helpers import Authenticate
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
+
+class ConditionalGetTests(Authenticate):
+    """
+    Tests the read views answer with 304 Not Modified while the client's copy is current.
+    """
+    def setUp(self):
+        super().setUp()
+        self.client.login(username="testUser", password="test123")
+        self.budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=self.budget)
+        self.period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=self.budget)
+        self.estimate = self.period.estimates.get(name="Work")
+        ActualAmountFactory.create(name="Pay", amount=900, occurred_on=date(2023, 6, 2), estimate=self.estimate, period=self.period)
+
+    def get_urls(self):
+        """
+        Returns the urls of the read views.
+        """
+        period = {"period_id": self.period.pk}
+        return [
+            reverse("dashboard"),
+            reverse("budget_period"),
+            reverse("amount"),
+            reverse("actual_amount", kwargs=period),
+            reverse("export_actual_amounts", kwargs=period),
+            reverse("actual_expense_summary", kwargs=period),
+            reverse("api_budget"),
+            reverse("api_budget_periods"),
+            reverse("api_budget_period", kwargs=period),
+            reverse("api_actual_amounts", kwargs=period),
+            reverse("api_changes"),
+        ]
+
+    def test_not_modified(self):
+        """
+        Tests that sending the ETag back gets a 304 without rendering the page or running its queries.
+        """
+        for url in self.get_urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(200, response.status_code)
+                self.assertIn("no-cache", response["Cache-Control"])
+                etag = response["ETag"]
+
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+                self.assertEqual(304, response.status_code)
+                self.assertEqual(etag, response["ETag"])
+                self.assertEqual(b"", response.content)
+                self.assertEqual([], response.templates)
+                # The session, the user and the Budget or period
+                self.assertLessEqual(len(context.captured_queries), 3)
+                for query in context.captured_queries:
+                    self.assertNotIn("SUM(", query["sql"].upper())
+
+    def test_modified_after_write(self):
+        """
+        Tests that every page is sent again once the Budget has changed.
+        """
+        etags = {url: self.client.get(url)["ETag"] for url in self.get_urls()}
+
+        ActualAmountFactory.create(name="Bonus", amount=50, occurred_on=date(2023, 6, 3), estimate=self.estimate, period=self.period)
+
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(200, response.status_code)
+                self.assertNotEqual(etag, response["ETag"])
+
+    def test_etag_varies_with_query(self):
+        """
+        Tests that each page of a list has its own ETag.
+        """
+        url = reverse("actual_amount", kwargs={"period_id": self.period.pk})
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(f"{url}?income_after=abc", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertNotEqual(304, response.status_code)
+
+    def test_etag_kept_when_cache_cleared(self):
+        """
+        Tests that the ETag is still matched after the cache is cleared, it is not read from the cache.
+        """
+        url = reverse("amount")
+        etag = self.client.get(url)["ETag"]
+        get_budget_cache().clear()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(304, response.status_code)
+
+    def test_etag_not_shared_between_users(self):
+        """
+        Tests that another user's ETag does not match, the ETag is made from the Budget.
+        """
+        etag = self.client.get(reverse("amount"))["ETag"]
+        self.client.logout()
+        second_user = User.objects.create(username="testUser2")
+        second_user.set_password("test123")
+        second_user.save()
+        BudgetFactory.create(owner=second_user)
+        self.client.login(username="testUser2", password="test123")
+
+        response = self.client.get(reverse("amount"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(200, response.status_code)
+
+    def test_no_etag_without_budget(self):
+        """
+        Tests that a user without a Budget gets the page without an ETag.
+        """
+        self.budget.delete()
+
+        response = self.client.get(reverse("dashboard"))
+
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_post_not_conditional(self):
+        """
+        Tests that a batch write is applied even if the If-None-Match header matches.
+        """
+        url = reverse("api_actual_amounts", kwargs={"period_id": self.period.pk})
+        etag = self.client.get(url)["ETag"]
+        payload = {"create": [{"name": "Bonus", "amount": "50", "occurred_on": "2023-06-03", "estimate": self.estimate.pk}]}
+
+        response = self.client.post(url, json.dumps(payload), content_type="application/json", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(response.has_header("ETag"))
+        self.assertEqual("created", response.json()["results"]["create"][0]["status"])
@@ -0,0 +1,337 @@
+import json
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..helpers import Authenticate
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
+from ...models import ActualAmount, Amount, Budget, BudgetPeriod, PeriodRollup, Tombstone
+
+SESSION, USER = Session._meta.db_table, User._meta.db_table
+BUDGET, PERIOD, AMOUNT = Budget._meta.db_table, BudgetPeriod._meta.db_table, Amount._meta.db_table
+ACTUAL, ROLLUP, TOMBSTONE = ActualAmount._meta.db_table, PeriodRollup._meta.db_table, Tombstone._meta.db_table
+TABLES = (SESSION, USER, BUDGET, PERIOD, AMOUNT, ACTUAL, ROLLUP, TOMBSTONE)
+
+# The session and the user, loaded by every request
+LOGIN = (SESSION, USER)
+# Databases that cannot return the ids from a bulk insert fetch them with another query
+FETCH_INSERTED_IDS = () if connection.features.can_return_rows_from_bulk_insert else (ACTUAL,)
+
+# Deleting an estimate claims a version, records a tombstone and cascades to its rollups and actual amounts
+DELETE_ESTIMATE = (BUDGET, TOMBSTONE, ROLLUP, ACTUAL, AMOUNT)
+# Saving an actual amount checks its estimate and period exist and claims a version
+SAVE_ACTUAL = (AMOUNT, PERIOD, BUDGET)
+# An actual amount is added to its period's and estimate's rollups, which are created first if they are missing
+ADD_TO_ROLLUPS = (ROLLUP, ROLLUP, ROLLUP)
+
+def get_table(sql):
+    """
+    Returns the first of the budget tables the query names, the table it selects from or writes to.
+    """
+    return min((sql.find(f'"{table}"'), table) for table in TABLES if f'"{table}"' in sql)[1]
+
+class QueryCountTests(Authenticate):
+    """
+    Checks that each budget route makes the queries listed for it, and that the number of queries
+    does not grow with the amount of data the user has.
+
+    Each query is listed by the table it reads or writes, so a new query has to be listed here to pass.
+    """
+    # The queries of a GET to each route with an empty budget cache, after LOGIN
+    GET_QUERIES = {
+        "dashboard": (BUDGET,),
+        "create_budget": (),
+        "edit_budget": (BUDGET,),
+        "delete_budget": (BUDGET,),
+        # The Budget, its periods, estimates and actual amounts
+        "export_account": (BUDGET, PERIOD, AMOUNT, ACTUAL),
+        # The Budget is loaded for the ETag
+        "budget_period": (BUDGET, PERIOD),
+        "create_budget_period": (),
+        "edit_budget_period": (PERIOD,),
+        "delete_budget_period": (PERIOD,),
+        # The Budget's totals, incomes, expenses and variance history
+        "amount": (BUDGET, AMOUNT, AMOUNT, AMOUNT, AMOUNT),
+        "create_income": (BUDGET,),
+        "edit_income": (BUDGET, AMOUNT),
+        "delete_income": (BUDGET, AMOUNT),
+        "create_expense": (BUDGET,),
+        "edit_expense": (BUDGET, AMOUNT),
+        "delete_expense": (BUDGET, AMOUNT),
+        # The period's totals and a page each of incomes and expenses
+        "actual_amount": (PERIOD, ROLLUP, ACTUAL, ACTUAL),
+        "export_actual_amounts": (PERIOD, ACTUAL),
+        "actual_expense_summary": (PERIOD, AMOUNT),
+        "create_actual_income": (PERIOD, AMOUNT),
+        # The estimate choices are set by get_form and again by get_context_data
+        "edit_actual_income": (ACTUAL, AMOUNT, AMOUNT),
+        "delete_actual_income": (ACTUAL,),
+        "create_actual_expense": (PERIOD, AMOUNT),
+        "edit_actual_expense": (ACTUAL, AMOUNT, AMOUNT),
+        "delete_actual_expense": (ACTUAL,),
+        "import_actual_amounts": (PERIOD, AMOUNT, AMOUNT),
+        "trends": (BUDGET, PERIOD),
+        "variance": (BUDGET, AMOUNT),
+        "api_budget": (BUDGET, AMOUNT, AMOUNT),
+        "api_budget_periods": (BUDGET, PERIOD, ROLLUP),
+        "api_budget_period": (PERIOD, ROLLUP, AMOUNT),
+        "api_actual_amounts": (PERIOD, ACTUAL),
+        # The cursor is up to date so only the Budget's version is read
+        "api_changes": (BUDGET,),
+        "async_dashboard": (BUDGET,),
+        "async_amount": (BUDGET, AMOUNT, AMOUNT, AMOUNT, AMOUNT),
+        "async_actual_amount": (PERIOD, ROLLUP, ACTUAL, ACTUAL),
+        "async_actual_expense_summary": (PERIOD, AMOUNT),
+    }
+
+    # The queries of a valid POST to each route that accepts one, after LOGIN
+    POST_QUERIES = {
+        "create_budget": (USER, BUDGET),
+        # Budget.clean loads the owner
+        "edit_budget": (BUDGET, USER, BUDGET, BUDGET),
+        # The cascade collects the estimates and periods, deletes their rollups and actual amounts,
+        # then the Budget's tombstones, estimates, periods and the Budget
+        "delete_budget": (
+            BUDGET, AMOUNT, PERIOD, AMOUNT, ROLLUP, ACTUAL, ROLLUP, ACTUAL, ROLLUP, ACTUAL,
+            TOMBSTONE, AMOUNT, PERIOD, BUDGET,
+        ),
+        # The new period is checked for overlaps and given a copy of the Budget's estimates
+        "create_budget_period": (BUDGET, BUDGET, PERIOD, BUDGET, PERIOD, AMOUNT, BUDGET, AMOUNT),
+        # The period's end date is calculated from its Budget, which is loaded when the period is saved
+        "edit_budget_period": (PERIOD, BUDGET, BUDGET, PERIOD, BUDGET, PERIOD),
+        "delete_budget_period": (
+            PERIOD, BUDGET, TOMBSTONE, AMOUNT, ROLLUP, ACTUAL, ROLLUP, ACTUAL, PERIOD, AMOUNT,
+        ),
+        "create_income": (BUDGET, BUDGET, BUDGET, AMOUNT),
+        "edit_income": (BUDGET, AMOUNT, BUDGET, BUDGET, AMOUNT),
+        "delete_income": (BUDGET, AMOUNT, *DELETE_ESTIMATE),
+        "create_expense": (BUDGET, BUDGET, BUDGET, AMOUNT),
+        "edit_expense": (BUDGET, AMOUNT, BUDGET, BUDGET, AMOUNT),
+        "delete_expense": (BUDGET, AMOUNT, *DELETE_ESTIMATE),
+        # The estimate's type decides which rollups the amount is added to
+        "create_actual_income": (PERIOD, AMOUNT, *SAVE_ACTUAL, ACTUAL, AMOUNT, *ADD_TO_ROLLUPS),
+        # The amount is removed from its old rollups before it is added to the new ones
+        "edit_actual_income": (ACTUAL, AMOUNT, *SAVE_ACTUAL, ACTUAL, AMOUNT, ROLLUP, *ADD_TO_ROLLUPS),
+        "delete_actual_income": (ACTUAL, BUDGET, TOMBSTONE, ACTUAL, ROLLUP),
+        "create_actual_expense": (PERIOD, AMOUNT, *SAVE_ACTUAL, ACTUAL, AMOUNT, *ADD_TO_ROLLUPS),
+        "edit_actual_expense": (ACTUAL, AMOUNT, *SAVE_ACTUAL, ACTUAL, AMOUNT, ROLLUP, *ADD_TO_ROLLUPS),
+        "delete_actual_expense": (ACTUAL, BUDGET, TOMBSTONE, ACTUAL, ROLLUP),
+        # The form is shown again with the results
+        "import_actual_amounts": (PERIOD, AMOUNT, AMOUNT, AMOUNT, BUDGET, ACTUAL, ROLLUP, ROLLUP, AMOUNT, AMOUNT),
+        # The batch locks, creates, updates and deletes its amounts, records tombstones and updates the rollups
+        "api_actual_amounts": (
+            PERIOD, AMOUNT, ACTUAL, BUDGET, ACTUAL, *FETCH_INSERTED_IDS, ACTUAL, ACTUAL, BUDGET, TOMBSTONE,
+            ROLLUP, ROLLUP, ROLLUP,
+        ),
+    }
+
+    # Django's cascade deletes the rows it collects a hundred at a time, so deleting a Budget grows with its data
+    GROWS_WITH_DATA = {("POST", "delete_budget")}
+
+    def setUp(self):
+        super().setUp()
+        self.client.login(username="testUser", password="test123")
+
+        self.budget = BudgetFactory.create(owner=self.user)
+        self.budget_income = AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=self.budget)
+        self.budget_expense = AmountFactory.create(name="Food", amount_type="EX", amount=200, budget=self.budget)
+        self.period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=self.budget)
+        self.income = self.period.estimates.get(name="Work")
+        self.expense = self.period.estimates.get(name="Food")
+        self.actual_income = ActualAmountFactory.create(occurred_on=date(2023, 6, 2), estimate=self.income, period=self.period)
+        self.actual_expense = ActualAmountFactory.create(occurred_on=date(2023, 6, 3), estimate=self.expense, period=self.period)
+
+    def grow(self, size):
+        """
+        Adds size more estimates, periods and actual amounts to the user's budget.
+        """
+        AmountFactory.create_batch(size, name="Bonus", amount_type="IN", amount=10, budget=self.budget)
+        AmountFactory.create_batch(size, name="Power", amount_type="EX", amount=10, budget=self.budget)
+        AmountFactory.create_batch(size, name="Bonus", amount_type="IN", amount=10, budget_period=self.period)
+        AmountFactory.create_batch(size, name="Power", amount_type="EX", amount=10, budget_period=self.period)
+        for day in range(size):
+            occurred_on = self.period.start_date + timedelta(days=day % 28)
+            ActualAmountFactory.create(occurred_on=occurred_on, estimate=self.income, period=self.period)
+            ActualAmountFactory.create(occurred_on=occurred_on, estimate=self.expense, period=self.period)
+        start_date = self.period.start_date
+        for _ in range(size):
+            start_date = start_date - timedelta(days=31)
+            BudgetPeriodFactory.create(start_date=start_date.replace(day=1), budget=self.budget)
+
+    def get_cursor(self):
+        """
+        Returns a sync cursor that is up to date with the user's budget.
+        """
+        data = self.client.get(reverse("api_changes")).json()
+        while data["more"]:
+            data = self.client.get(reverse("api_changes"), {"cursor": data["cursor"]}).json()
+        return data["cursor"]
+
+    def get_urls(self):
+        period_id = self.period.budget_period_id
+        return {
+            "dashboard": reverse("dashboard"),
+            "create_budget": reverse("create_budget"),
+            "edit_budget": reverse("edit_budget"),
+            "delete_budget": reverse("delete_budget"),
+            "export_account": reverse("export_account"),
+            "budget_period": reverse("budget_period"),
+            "create_budget_period": reverse("create_budget_period"),
+            "edit_budget_period": reverse("edit_budget_period", kwargs={"pk": period_id}),
+            "delete_budget_period": reverse("delete_budget_period", kwargs={"pk": period_id}),
+            "amount": reverse("amount"),
+            "create_income": reverse("create_income"),
+            "edit_income": reverse("edit_income", kwargs={"pk": self.budget_income.amount_id}),
+            "delete_income": reverse("delete_income", kwargs={"pk": self.budget_income.amount_id}),
+            "create_expense": reverse("create_expense"),
+            "edit_expense": reverse("edit_expense", kwargs={"pk": self.budget_expense.amount_id}),
+            "delete_expense": reverse("delete_expense", kwargs={"pk": self.budget_expense.amount_id}),
+            "actual_amount": reverse("actual_amount", kwargs={"period_id": period_id}),
+            "export_actual_amounts": reverse("export_actual_amounts", kwargs={"period_id": period_id}),
+            "actual_expense_summary": reverse("actual_expense_summary", kwargs={"period_id": period_id}),
+            "create_actual_income": reverse("create_actual_income", kwargs={"period_id": period_id}),
+            "edit_actual_income": reverse("edit_actual_income", kwargs={"period_id": period_id, "pk": self.actual_income.actual_id}),
+            "delete_actual_income": reverse("delete_actual_income", kwargs={"period_id": period_id, "pk": self.actual_income.actual_id}),
+            "create_actual_expense": reverse("create_actual_expense", kwargs={"period_id": period_id}),
+            "edit_actual_expense": reverse("edit_actual_expense", kwargs={"period_id": period_id, "pk": self.actual_expense.actual_id}),
+            "delete_actual_expense": reverse("delete_actual_expense", kwargs={"period_id": period_id, "pk": self.actual_expense.actual_id}),
+            "import_actual_amounts": reverse("import_actual_amounts", kwargs={"period_id": period_id}),
+            "trends": reverse("trends"),
+            "variance": reverse("variance"),
+            "api_budget": reverse("api_budget"),
+            "api_budget_periods": reverse("api_budget_periods"),
+            "api_budget_period": reverse("api_budget_period", kwargs={"period_id": period_id}),
+            "api_actual_amounts": reverse("api_actual_amounts", kwargs={"period_id": period_id}),
+            "api_changes": f"{reverse('api_changes')}?cursor={self.get_cursor()}",
+            "async_dashboard": reverse("async_dashboard"),
+            "async_amount": reverse("async_amount"),
+            "async_actual_amount": reverse("async_actual_amount", kwargs={"period_id": period_id}),
+            "async_actual_expense_summary": reverse("async_actual_expense_summary", kwargs={"period_id": period_id}),
+        }
+
+    def get_post_data(self):
+        """
+        Returns the data of a valid POST to each route that accepts one.
+        """
+        actual_income = {"name": "Bonus", "occurred_on": "2023-06-05", "amount": 50, "estimate_id": self.income.amount_id}
+        actual_expense = {"name": "Shop", "occurred_on": "2023-06-05", "amount": 5, "estimate_id": self.expense.amount_id}
+        budget = {"name": "Renamed", "description": "", "period_type": "months", "period_length": 1}
+        statement = b"date,name,amount\n2023-06-05,Countdown,-45.50\n2023-06-15,Pay,1000\n"
+        batch = {
+            "create": [{"name": "Shop", "occurred_on": "2023-06-05", "amount": "5", "estimate": self.expense.amount_id}],
+            "update": [{"id": self.actual_income.actual_id, "amount": "7"}],
+            "delete": [self.actual_expense.actual_id],
+        }
+        return {
+            "create_budget": budget,
+            "edit_budget": budget,
+            "delete_budget": {},
+            "create_budget_period": {"start_date": "2023-07-01"},
+            "edit_budget_period": {"start_date": "2023-06-02"},
+            "delete_budget_period": {},
+            "create_income": {"name": "Bonus", "amount": 10},
+            "edit_income": {"name": "Work", "amount": 500},
+            "delete_income": {},
+            "create_expense": {"name": "Power", "amount": 10},
+            "edit_expense": {"name": "Food", "amount": 250},
+            "delete_expense": {},
+            "create_actual_income": actual_income,
+            "edit_actual_income": actual_income,
+            "delete_actual_income": {},
+            "create_actual_expense": actual_expense,
+            "edit_actual_expense": actual_expense,
+            "delete_actual_expense": {},
+            "import_actual_amounts": {
+                "statement": SimpleUploadedFile("statement.csv", statement),
+                "default_income": self.income.amount_id,
+                "default_expense": self.expense.amount_id,
+            },
+            "api_actual_amounts": json.dumps(batch),
+        }
+
+    def capture(self, request):
+        """
+        Makes the request with an empty budget cache and returns the response and the tables of its queries.
+
+        Savepoints are left out, the test's transaction turns every atomic block into one.
+        """
+        caches["budget"].clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+            # Streamed responses query as they are read
+            if response.streaming:
+                b"".join(response.streaming_content)
+        return response, [get_table(query["sql"]) for query in queries if "SAVEPOINT" not in query["sql"]]
+
+    def capture_routes(self):
+        """
+        Requests every route and returns the tables of the queries each GET and POST made.
+
+        Each POST is rolled back so every request sees the same data.
+        """
+        urls = self.get_urls()
+        captured = {}
+        for name, url in urls.items():
+            response, captured[("GET", name)] = self.capture(lambda: self.client.get(url))
+            self.assertEquals(response.status_code, 200, name)
+        for name, data in self.get_post_data().items():
+            url = urls[name]
+            if name.startswith("api_"):
+                post = lambda: self.client.post(url, data, content_type="application/json")
+            else:
+                post = lambda: self.client.post(url, data)
+            with transaction.atomic():
+                response, captured[("POST", name)] = self.capture(post)
+                transaction.set_rollback(True)
+            # Only a route that shows its results answers a valid POST without redirecting
+            self.assertIn(response.status_code, (200, 302), name)
+            if response.status_code == 200 and response.context is not None and "form" in response.context:
+                self.assertFalse(response.context["form"].errors, name)
+        return captured
+
+    def get_expected(self):
+        """
+        Returns the listed queries keyed by the method and the route.
+        """
+        expected = {("GET", name): queries for name, queries in self.GET_QUERIES.items()}
+        expected.update({("POST", name): queries for name, queries in self.POST_QUERIES.items()})
+        return expected
+
+    def test_routes_covered(self):
+        """
+        Tests that every named route in budget/urls.py has its GET queries listed, and its POST queries if it accepts one.
+        """
+        from ...urls import urlpatterns
+
+        self.assertEquals(
+            sorted(pattern.name for pattern in urlpatterns),
+            sorted(self.GET_QUERIES.keys()),
+        )
+        self.assertEquals(
+            sorted(
+                pattern.name for pattern in urlpatterns
+                if hasattr(getattr(pattern.callback, "view_class", None), "post")
+            ),
+            sorted(self.POST_QUERIES.keys()),
+        )
+
+    def test_query_counts(self):
+        """
+        Tests that each route makes the queries listed for it and makes the same queries when the data grows.
+        """
+        small = self.capture_routes()
+        self.grow(25)
+        large = self.capture_routes()
+
+        for key, queries in self.get_expected().items():
+            method, name = key
+            with self.subTest(method=method, route=name):
+                self.assertEquals(small[key], [*LOGIN, *queries])
+                if key not in self.GROWS_WITH_DATA:
+                    self.assertEquals(large[key], small[key])
@@ -0,0 +1,116 @@
+from datetime import date
+from unittest import skipUnless
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ...models import ActualAmount
+from ...pagination import KeysetPaginator
+from ...views.amount import ACTUAL_AMOUNT_ORDERING
+from ..helpers import Authenticate
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
+
+@skipUnless(connection.vendor == "postgresql", "The query plans are only checked on PostgreSQL")
+class QueryPlanTests(Authenticate):
+    """
+    Runs EXPLAIN on every query made by the budget views and fails if any of them needs a sequential scan.
+
+    Sequential scans are disabled while explaining, so the planner only chooses one when no index can be used.
+    """
+    def setUp(self):
+        super().setUp()
+        self.client.login(username="testUser", password="test123")
+
+        self.budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=self.budget)
+        AmountFactory.create(name="Food", amount_type="EX", amount=200, budget=self.budget)
+        self.period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=self.budget)
+        self.income = self.period.estimates.get(name="Work")
+        self.expense = self.period.estimates.get(name="Food")
+        self.actual_income = ActualAmountFactory.create(occurred_on=date(2023, 6, 2), estimate=self.income, period=self.period)
+        self.actual_expense = ActualAmountFactory.create(occurred_on=date(2023, 6, 3), estimate=self.expense, period=self.period)
+        self.budget_income = self.budget.amounts.get(name="Work")
+        self.budget_expense = self.budget.amounts.get(name="Food")
+
+    def get_urls(self):
+        period_id = self.period.budget_period_id
+        return [
+            reverse("dashboard"),
+            reverse("edit_budget"),
+            reverse("delete_budget"),
+            reverse("export_account"),
+            reverse("budget_period"),
+            reverse("create_budget_period"),
+            reverse("edit_budget_period", kwargs={"pk": period_id}),
+            reverse("delete_budget_period", kwargs={"pk": period_id}),
+            reverse("amount"),
+            reverse("create_income"),
+            reverse("edit_income", kwargs={"pk": self.budget_income.amount_id}),
+            reverse("delete_income", kwargs={"pk": self.budget_income.amount_id}),
+            reverse("create_expense"),
+            reverse("edit_expense", kwargs={"pk": self.budget_expense.amount_id}),
+            reverse("delete_expense", kwargs={"pk": self.budget_expense.amount_id}),
+            reverse("actual_amount", kwargs={"period_id": period_id}),
+            reverse("export_actual_amounts", kwargs={"period_id": period_id}),
+            reverse("actual_expense_summary", kwargs={"period_id": period_id}),
+            reverse("create_actual_income", kwargs={"period_id": period_id}),
+            reverse("edit_actual_income", kwargs={"period_id": period_id, "pk": self.actual_income.actual_id}),
+            reverse("delete_actual_income", kwargs={"period_id": period_id, "pk": self.actual_income.actual_id}),
+            reverse("create_actual_expense", kwargs={"period_id": period_id}),
+            reverse("edit_actual_expense", kwargs={"period_id": period_id, "pk": self.actual_expense.actual_id}),
+            reverse("delete_actual_expense", kwargs={"period_id": period_id, "pk": self.actual_expense.actual_id}),
+            reverse("import_actual_amounts", kwargs={"period_id": period_id}),
+            reverse("trends"),
+            reverse("variance"),
+            reverse("api_budget"),
+            reverse("api_budget_periods"),
+            reverse("api_budget_period", kwargs={"period_id": period_id}),
+            reverse("api_actual_amounts", kwargs={"period_id": period_id}),
+            reverse("api_changes"),
+            reverse("async_dashboard"),
+            reverse("async_amount"),
+            reverse("async_actual_amount", kwargs={"period_id": period_id}),
+            reverse("async_actual_expense_summary", kwargs={"period_id": period_id}),
+        ]
+
+    def test_no_sequential_scans(self):
+        sequential_scans = []
+        for url in self.get_urls():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            self.assertEquals(response.status_code, 200, url)
+
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                for query in queries.captured_queries:
+                    if not query["sql"].startswith("SELECT"):
+                        continue
+                    cursor.execute("EXPLAIN " + query["sql"])
+                    plan = "\n".join(row[0] for row in cursor.fetchall())
+                    if "Seq Scan" in plan:
+                        sequential_scans.append(f"{url}: {query['sql']}\n{plan}")
+                cursor.execute("SET LOCAL enable_seqscan = on")
+
+        self.assertEquals(sequential_scans, [], "\n\n".join(sequential_scans))
+
+    def test_keyset_seek_index_bound(self):
+        """
+        Tests that the page after a cursor starts its index scan at the cursor, rather than filtering from the start.
+        """
+        actual_amounts = ActualAmount.objects.filter(period=self.period)
+        paginator = KeysetPaginator(actual_amounts, ACTUAL_AMOUNT_ORDERING, 25)
+        queryset = actual_amounts.filter(paginator.seek([self.actual_expense.occurred_on, self.actual_expense.actual_id]))
+
+        # Sorts are disabled too, so the tiny table is read in order from the index the list is paged through
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_sort = off")
+            plan = queryset.order_by(*ACTUAL_AMOUNT_ORDERING).explain()
+            cursor.execute("SET LOCAL enable_sort = on")
+            cursor.execute("SET LOCAL enable_seqscan = on")
+
+        index_condition = next(line for line in plan.splitlines() if "Index Cond" in line)
+        self.assertIn("occurred_on <=", index_condition, plan)
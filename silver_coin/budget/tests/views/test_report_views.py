@@ -0,0 +1,124 @@
+from datetime import date
+from decimal import Decimal
+
+from django.urls import reverse
+
+from ..helpers import Authenticate
+from ..factories import ActualAmountFactory, AmountFactory, BudgetFactory, BudgetPeriodFactory
+
+class TrendsReportTests(Authenticate):
+    """
+    Tests for the trends report.
+    """
+    def setUp(self):
+        super().setUp()
+        self.client.login(username="testUser", password="test123")
+        self.budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=self.budget)
+        AmountFactory.create(name="Food", amount_type="EX", amount=300, budget=self.budget)
+        self.periods = [
+            BudgetPeriodFactory.create(start_date=date(2023, month, 1), budget=self.budget) for month in (6, 7, 8)
+        ]
+        for period, amount in zip(self.periods, (100, 150, 50)):
+            ActualAmountFactory.create(
+                name="Shop", amount=amount, occurred_on=period.start_date, estimate=period.estimates.get(name="Food"), period=period
+            )
+
+    def test_report(self):
+        response = self.client.get(reverse("trends"))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([period.pk for period in self.periods], [period["period_id"] for period in response.context["periods"]])
+        food = response.context["expenses"][0]
+        self.assertEqual("Food", food["name"])
+        self.assertEqual([None, Decimal("50"), Decimal("-100")], [cell["delta"] for cell in food["cells"]])
+        self.assertEqual([Decimal("100"), Decimal("125"), Decimal("100")], [cell["average"] for cell in food["cells"]])
+        self.assertContains(response, "+50.00")
+
+    def test_options(self):
+        response = self.client.get(reverse("trends"), {"periods": 2, "average_over": 2})
+
+        self.assertEqual([period.pk for period in self.periods[1:]], [period["period_id"] for period in response.context["periods"]])
+        self.assertEqual([Decimal("150"), Decimal("100")], [cell["average"] for cell in response.context["expenses"][0]["cells"]])
+
+    def test_invalid_options(self):
+        """
+        Tests that invalid options fall back to the defaults.
+        """
+        response = self.client.get(reverse("trends"), {"periods": 100, "average_over": "x"})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, len(response.context["periods"]))
+        self.assertEqual(3, response.context["average_over"])
+
+    def test_cached_until_changed(self):
+        url = reverse("trends")
+        self.client.get(url)
+
+        # The session, the user and the budget
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+        ActualAmountFactory.create(
+            name="Shop", amount=25, occurred_on=date(2023, 8, 2), estimate=self.periods[2].estimates.get(name="Food"), period=self.periods[2]
+        )
+        response = self.client.get(url)
+
+        self.assertEqual(Decimal("75"), response.context["expenses"][0]["cells"][2]["total"])
+
+    def test_without_budget(self):
+        self.budget.delete()
+
+        response = self.client.get(reverse("trends"))
+
+        self.assertRedirects(response, reverse("dashboard"))
+
+class VarianceReportTests(Authenticate):
+    """
+    Tests for the variance report and the amounts it suggests.
+    """
+    def setUp(self):
+        super().setUp()
+        self.client.login(username="testUser", password="test123")
+        self.budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Food", amount_type="EX", amount=100, budget=self.budget)
+        for month, amount in ((6, 90), (7, 150)):
+            period = BudgetPeriodFactory.create(start_date=date(2023, month, 1), budget=self.budget)
+            ActualAmountFactory.create(
+                name="Shop", amount=amount, occurred_on=period.start_date, estimate=period.estimates.get(name="Food"), period=period
+            )
+
+    def test_report(self):
+        response = self.client.get(reverse("variance"))
+
+        self.assertEqual(200, response.status_code)
+        food = response.context["expenses"][0]
+        self.assertEqual(("Food", 2, 1), (food["name"], food["periods"], food["times_over"]))
+        self.assertEqual(Decimal("-20"), food["mean_variance"])
+        self.assertContains(response, "1 (50%)")
+
+    def test_amount_list_suggestion(self):
+        """
+        Tests that the amount list suggests the mean actual of the estimates with the same name.
+        """
+        AmountFactory.create(name="Power", amount_type="EX", amount=50, budget=self.budget)
+
+        response = self.client.get(reverse("amount"))
+
+        suggestions = {amount.name: amount.history for amount in response.context["expenses"]}
+        self.assertEqual(Decimal("120"), suggestions["Food"]["mean_actual"])
+        self.assertIsNone(suggestions["Power"])
+        self.assertContains(response, "(over 1 of 2)")
+
+    def test_cached_until_changed(self):
+        url = reverse("variance")
+        self.client.get(url)
+
+        # The session, the user and the budget
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+        BudgetPeriodFactory.create(start_date=date(2023, 8, 1), budget=self.budget)
+        response = self.client.get(url)
+
+        self.assertEqual(3, response.context["expenses"][0]["periods"])
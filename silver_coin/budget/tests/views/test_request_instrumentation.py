@@ -0,0 +1,66 @@
+import json
+
+from django.http import HttpResponse
+from django.test import override_settings
+from django.urls import path, reverse
+
+from ..helpers import Authenticate
+from ..factories import AmountFactory, BudgetFactory
+from ...models import Budget
+from ...urls import urlpatterns as budget_urlpatterns
+
+def repeated_query_view(request):
+    """
+    A view that looks up the Budget twice, so the second lookup is a duplicate.
+    """
+    for _ in range(2):
+        Budget.objects.filter(owner=request.user).first()
+    return HttpResponse()
+
+urlpatterns = budget_urlpatterns + [
+    path("repeated_query/", repeated_query_view, name="repeated_query"),
+]
+
+@override_settings(ROOT_URLCONF=__name__)
+class RequestInstrumentationTests(Authenticate):
+    """
+    Tests for the RequestInstrumentationMiddleware.
+    """
+    def setUp(self):
+        super().setUp()
+        self.client.login(username="testUser", password="test123")
+
+        budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=budget)
+
+    def test_server_timing(self):
+        with self.assertLogs("silver_coin.requests", level="INFO") as logs:
+            response = self.client.get(reverse("amount"))
+
+        self.assertEquals(response.status_code, 200)
+        self.assertIn('db;dur=', response["Server-Timing"])
+        self.assertIn('desc="7 queries"', response["Server-Timing"])
+        self.assertIn('tpl;dur=', response["Server-Timing"])
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEquals(line["view"], "amount")
+        self.assertEquals(line["queries"], 7)
+        self.assertGreater(line["template_ms"], 0)
+        # The incomes and expenses are the same SQL with different parameters, which is not a duplicate
+        self.assertEquals(line["duplicates"], {})
+        self.assertIn('dup;desc="0 duplicated queries"', response["Server-Timing"])
+
+    def test_duplicates(self):
+        with self.assertLogs("silver_coin.requests", level="INFO") as logs:
+            response = self.client.get(reverse("repeated_query"))
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEquals(list(line["duplicates"].values()), [2])
+        self.assertIn('dup;desc="2 duplicated queries"', response["Server-Timing"])
+
+    @override_settings(REQUEST_INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = self.client.get(reverse("amount"))
+
+        self.assertEquals(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response)
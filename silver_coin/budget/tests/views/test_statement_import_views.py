@@ -0,0 +1,73 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from ..helpers import Authenticate
+from ..factories import AmountFactory, BudgetFactory, BudgetPeriodFactory
+
+from ...models import ActualAmount, PeriodRollup
+
+class ImportActualAmountsViewTests(Authenticate):
+    """
+    Tests for the statement import view.
+    """
+    def setUp(self):
+        super().setUp()
+        budget = BudgetFactory.create(owner=self.user)
+        AmountFactory.create(name="Work", amount_type="IN", amount=1000, budget=budget)
+        AmountFactory.create(name="Food", amount_type="EX", amount=200, budget=budget)
+        self.period = BudgetPeriodFactory.create(start_date=date(2023, 6, 1), budget=budget)
+        self.url = reverse("import_actual_amounts", kwargs={"period_id": self.period.budget_period_id})
+
+        self.second_user = User.objects.create(username="testUser2")
+        self.second_user.set_password("test123")
+        self.second_user.save()
+
+    def test_import_get(self):
+        self.client.login(username="testUser", password="test123")
+
+        response = self.client.get(self.url)
+
+        self.assertEquals(response.status_code, 200)
+        self.assertContains(response, "Import Statement")
+        self.assertContains(response, "Food - $200.00")
+
+    def test_import_post(self):
+        """
+        Tests that the valid rows are imported and the rejected rows are listed.
+        """
+        self.client.login(username="testUser", password="test123")
+        statement = SimpleUploadedFile(
+            "statement.csv",
+            b"\xef\xbb\xbfdate,name,amount\n2023-06-05,Countdown,-45.50\n2023-06-15,Pay,1000\n2023-07-05,Late,-10\n",
+        )
+
+        response = self.client.post(self.url, data={
+            "statement": statement,
+            "default_income": self.period.estimates.get(name="Work").amount_id,
+            "default_expense": self.period.estimates.get(name="Food").amount_id,
+        })
+
+        self.assertEquals(response.status_code, 200)
+        self.assertContains(response, "Imported 2 of 3 rows")
+        self.assertContains(response, "Occurred On must be less than or equal to the end date")
+        self.assertEquals(ActualAmount.objects.filter(period=self.period).count(), 2)
+        self.assertEquals(PeriodRollup.objects.period_totals(self.period.pk)["net"], 954.50)
+
+    def test_import_unknown_format(self):
+        self.client.login(username="testUser", password="test123")
+
+        response = self.client.post(self.url, data={"statement": SimpleUploadedFile("statement.txt", b"date,name,amount\n")})
+
+        self.assertEquals(response.status_code, 200)
+        self.assertContains(response, "Please choose the format of the file")
+
+    def test_import_not_owner(self):
+        self.client.login(username="testUser2", password="test123")
+
+        response = self.client.post(self.url, data={"statement": SimpleUploadedFile("statement.csv", b"date,name,amount\n2023-06-05,Countdown,-45.50\n")})
+
+        self.assertEquals(response.status_code, 404)
+        self.assertFalse(ActualAmount.objects.exists())
@@ -4,6 +4,7 @@ from .views import DashboardView
 from .views import CreateBudget
 from .views import EditBudget
 from .views import DeleteBudget
+from .views import ExportAccount
 from .views import BudgetPeriodList
 from .views import CreateBudgetPeriod
 from .views import EditBudgetPeriod
@@ -23,6 +24,19 @@ from .views import CreateActualExpense
 from .views import EditActualExpense
 from .views import DeleteActualExpense
 from .views import ActualExpenseSummary
+from .views import ExportActualAmounts
+from .views import ImportActualAmounts
+from .views import BudgetApi
+from .views import BudgetPeriodListApi
+from .views import BudgetPeriodApi
+from .views import ActualAmountsApi
+from .views import ChangesApi
+from .views import TrendsReport
+from .views import VarianceReport
+from .views import async_dashboard
+from .views import async_amount_list
+from .views import async_actual_amount_list
+from .views import async_actual_expense_summary
 
 
 urlpatterns = [
@@ -31,6 +45,7 @@ urlpatterns = [
     path("budget/create", CreateBudget.as_view(), name="create_budget"),
     path("budget/edit", EditBudget.as_view(), name="edit_budget"),
     path("budget/delete", DeleteBudget.as_view(), name="delete_budget"),
+    path("budget/export", ExportAccount.as_view(), name="export_account"),
     # BudgetPeriod URLs
     path("budget_period/", BudgetPeriodList.as_view(), name="budget_period"),
     path("budget_period/create", CreateBudgetPeriod.as_view(), name="create_budget_period"),
@@ -46,11 +61,27 @@ urlpatterns = [
     path("expense/delete/<int:pk>", DeleteExpense.as_view(), name="delete_expense"),
     # Actual Amount URLs
     path("budget_period/<int:period_id>/actual/", ActualAmountList.as_view(), name="actual_amount"),
+    path("budget_period/<int:period_id>/actual/export/", ExportActualAmounts.as_view(), name="export_actual_amounts"),
     path("budget_period/<int:period_id>/summary/", ActualExpenseSummary.as_view(), name="actual_expense_summary"),
     path("budget_period/<int:period_id>/actual_income/create/", CreateActualIncome.as_view(), name="create_actual_income"),
     path("budget_period/<int:period_id>/actual_income/edit/<int:pk>", EditActualIncome.as_view(), name="edit_actual_income"),
     path("budget_period/<int:period_id>/actual_income/delete/<int:pk>", DeleteActualIncome.as_view(), name="delete_actual_income"),
     path("budget_period/<int:period_id>/actual_expense/create/", CreateActualExpense.as_view(), name="create_actual_expense"),
     path("budget_period/<int:period_id>/actual_expense/edit/<int:pk>", EditActualExpense.as_view(), name="edit_actual_expense"),
-    path("budget_period/<int:period_id>/actual_expense/delete/<int:pk>", DeleteActualExpense.as_view(), name="delete_actual_expense")
+    path("budget_period/<int:period_id>/actual_expense/delete/<int:pk>", DeleteActualExpense.as_view(), name="delete_actual_expense"),
+    path("budget_period/<int:period_id>/actual/import/", ImportActualAmounts.as_view(), name="import_actual_amounts"),
+    # Report URLs
+    path("report/trends/", TrendsReport.as_view(), name="trends"),
+    path("report/variance/", VarianceReport.as_view(), name="variance"),
+    # JSON API URLs, the version is in the path so it can change without breaking older clients
+    path("api/v1/budget/", BudgetApi.as_view(), name="api_budget"),
+    path("api/v1/budget_periods/", BudgetPeriodListApi.as_view(), name="api_budget_periods"),
+    path("api/v1/budget_periods/<int:period_id>/", BudgetPeriodApi.as_view(), name="api_budget_period"),
+    path("api/v1/budget_periods/<int:period_id>/actual_amounts/", ActualAmountsApi.as_view(), name="api_actual_amounts"),
+    path("api/v1/changes/", ChangesApi.as_view(), name="api_changes"),
+    # The async versions of the read pages, for serving with ASGI
+    path("async/dashboard/", async_dashboard, name="async_dashboard"),
+    path("async/amount/", async_amount_list, name="async_amount"),
+    path("async/budget_period/<int:period_id>/actual/", async_actual_amount_list, name="async_actual_amount"),
+    path("async/budget_period/<int:period_id>/summary/", async_actual_expense_summary, name="async_actual_expense_summary"),
 ]
\ No newline at end of file
@@ -9,6 +9,7 @@ from .amount import DeleteExpense
 from .budget import CreateBudget
 from .budget import EditBudget
 from .budget import DeleteBudget
+from .budget import ExportAccount
 from .budget_period import BudgetPeriodList
 from .budget_period import CreateBudgetPeriod
 from .budget_period import EditBudgetPeriod
@@ -21,3 +22,16 @@ from .amount import CreateActualExpense
 from .amount import EditActualExpense
 from .amount import DeleteActualExpense
 from .amount import ActualExpenseSummary
+from .amount import ExportActualAmounts
+from .statement_import import ImportActualAmounts
+from .api import BudgetApi
+from .api import BudgetPeriodListApi
+from .api import BudgetPeriodApi
+from .api import ActualAmountsApi
+from .api import ChangesApi
+from .report import TrendsReport
+from .report import VarianceReport
+from .asynchronous import dashboard as async_dashboard
+from .asynchronous import amount_list as async_amount_list
+from .asynchronous import actual_amount_list as async_actual_amount_list
+from .asynchronous import actual_expense_summary as async_actual_expense_summary
@@ -1,31 +1,115 @@
+import csv
+from decimal import Decimal
 from typing import Any
 from django.core.exceptions import ValidationError
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponseNotFound
 from django.views.generic import ListView
 from django.views.generic import FormView
 from django.views.generic import UpdateView
 from django.views.generic import DeleteView
 from django.views.generic import TemplateView
+from django.views.generic import View
+from django.http import StreamingHttpResponse
 from django.urls import reverse, reverse_lazy
-from django.shortcuts import redirect
+from django.shortcuts import get_object_or_404, redirect
+from django.utils import timezone
 
+from ..cache import CachedContext
+from ..cache import get_or_compute
+from ..forecast import forecast_parts
+from ..forecast import get_cached_forecast
 from ..forms import AmountForm
 from ..forms import IncomeForm
 from ..forms import ActualAmountForm
 from ..forms import ActualAmountModelForm
-from ..models import Budget
 from ..models import BudgetPeriod
 from ..models import Amount
 from ..models import ActualAmount
+from ..models import PeriodRollup
+from ..pagination import KeysetPaginator
+from .conditional import ConditionalGetMixin
 
-class AmountList(LoginRequiredMixin, ListView):
+def history_parts(today=None):
+    """
+    Returns the parts to add to the cache key and ETag of a page that shows the variance history.
+
+    Only the periods that have ended are in the history, so it changes when one ends without the Budget changing
+    and the date is a part.
+    """
+    today = today or timezone.now().date()
+    return (today.isoformat(),)
+
+def get_variance_history(budget, today=None):
+    """
+    Gets how the estimates of the Budget's ended periods compared with their actual amounts,
+    cached until the Budget next changes or the day ends.
+
+    :returns: the history, see AmountQuerySet.variance_history
+    """
+    today = today or timezone.now().date()
+    return get_or_compute(
+        budget.pk, budget.change_version, "variance_history",
+        lambda: Amount.objects.filter(budget_period__budget_id=budget.pk).variance_history(today), *history_parts(today),
+    )
+
+def set_income_percentages(rows, income):
+    """
+    Sets the percentage of the income each row is.
+
+    The income total is fetched once by the caller, so the rows can be fetched at the same time as it.
+    """
+    for row in rows:
+        row.percentage_of_income = row.amount * Decimal(100) / income if income != 0 else None
+
+def set_history(amounts, history):
+    """
+    Sets the history of the estimates with the same type and name on each of the Budget's amounts,
+    its mean actual is the suggested amount. None if the amount has not been estimated in a period.
+    """
+    rows = {(group, row["name"]): row for group, group_rows in history.items() for row in group_rows}
+    for amount in amounts:
+        amount.history = rows.get(("incomes" if amount.amount_type == "IN" else "expenses", amount.name))
+
+def amount_list_context(budget, today=None):
+    """
+    The context of the amount list, the Budget's incomes and expenses with its totals and the history of their estimates.
+
+    Shared by AmountList and the async amount_list, see CachedContext.
+
+    :param: budget, the Budget
+    :param: today, the date the history is made on, see history_parts
+
+    :returns: the CachedContext
+    """
+    today = today or timezone.now().date()
+    amounts = budget.amounts.all()
+
+    def build(totals, incomes, expenses, history):
+        set_income_percentages(incomes + expenses, totals["income"])
+        set_history(incomes + expenses, history)
+        return {
+            "incomes": incomes,
+            "expenses": expenses,
+            "total_income": totals["income"],
+            "total_expense": totals["expense"],
+            "net_amount": totals["net"],
+        }
+
+    return CachedContext(budget, "amount_list", [
+        budget.totals,
+        lambda: list(amounts.filter(amount_type="IN")),
+        lambda: list(amounts.filter(amount_type="EX")),
+        lambda: get_variance_history(budget, today),
+    ], build, *history_parts(today))
+
+class AmountList(LoginRequiredMixin, ConditionalGetMixin, ListView):
     """
     Displays the Incomes and Expenses.
     """
     model = Amount
     template_name = "amount/amount_list.html"
     context_object_name = "amounts"
+    etag_name = "amount_list"
     
     def get_login_url(self):
         return reverse("login")
@@ -34,27 +118,21 @@ class AmountList(LoginRequiredMixin, ListView):
         """
         Override to get the amounts for the budget.
         """
-        amounts = Budget.objects.get(owner=self.request.user).amounts
+        amounts = self.request.budget.amounts
         return amounts
     
     def get_context_data(self, **kwargs):
         """
-        Override to get the incomes and expenses as separate querysets.
+        Override to get the incomes and expenses as separate lists, cached until the Budget next changes.
         """
-        amounts = self.get_queryset()
-        incomes = amounts.filter(amount_type="IN")
-        total_income = sum([income.amount for income in incomes])
-        expenses = amounts.filter(amount_type="EX")
-        total_expense = sum([expense.amount for expense in expenses])
-        return super().get_context_data(
-            **kwargs, 
-            incomes=incomes, 
-            expenses=expenses, 
-            total_income=total_income, 
-            total_expense=total_expense,
-            net_amount=Budget.objects.get(owner=self.request.user).net_amount()
-        )
-    
+        return super().get_context_data(**kwargs, **amount_list_context(self.request.budget).get())
+
+    def get_etag_parts(self):
+        """
+        Override to add the date, see history_parts.
+        """
+        return history_parts()
+
 class CheckBudgetExists():
     """
     A Mixin that checks if the user has a Budget.
@@ -66,9 +144,7 @@ class CheckBudgetExists():
         """
         Override to check the user has a Budget.
         """
-        try:
-            Budget.objects.get(owner=request.user)
-        except Budget.DoesNotExist:
+        if not request.budget:
             return redirect(reverse("dashboard"))
 
         return super().dispatch(request, *args, **kwargs)
@@ -89,14 +165,13 @@ class CreateIncome(LoginRequiredMixin, CheckBudgetExists, FormView):
         """
         Override to add extra fields to the model.
         """
-        budget = Budget.objects.get(owner=request.user)
         form = self.form_class(request.POST)
 
         if form.is_valid():
             amount = Amount(
                 **form.cleaned_data,
                 amount_type="IN",
-                budget=budget
+                budget=request.budget
             )
             try:
                 amount.full_clean()
@@ -115,38 +190,30 @@ class CheckOwner():
 
     """
     Adds a check at the start of the get request to check the owner.
-    Also checks that the user actually has a budget of their own.0
+    Also checks that the user actually has a budget of their own.
     """
-    def check_owner(self, amount_id, user):
+    def check_owner(self, budget):
         """
         Checks that the user is the owner of the amount they are trying to access.
 
-        :param: amount_id, the id of the amount object
-        :param: user, the user making the request
+        :param: budget, the budget of the user making the request
 
-        :returns: True if owner, 302 if they do not have a budget, 404 if they are trying to aceess an amount that is not theirs
+        :returns: True if they have a budget, 302 if they do not
         """
         # If the user does not have a budget redirect to dashboard
-        try:
-            Budget.objects.get(owner=user)
-        except Budget.DoesNotExist:
+        if not budget:
             return redirect(reverse("dashboard"))
-        try:
-            amount = Amount.objects.get(pk=amount_id)
-            if amount.budget.owner != user:
-                return HttpResponseNotFound()
-        except Amount.DoesNotExist:
-            return HttpResponseNotFound()
-        # They have a budget and they are the owner
+        # The amount is fetched by get_queryset which is filtered by the budget,
+        # so an amount that is not theirs will not be found and is a 404
         return True
 
     def get(self, request, *args, **kwargs):
         """
         Override to check the owner and redirect if required.
         """
-        owner_response = self.check_owner(kwargs["pk"], request.user)
+        owner_response = self.check_owner(request.budget)
         if owner_response is not True:
-            # Is a redirect or 404
+            # Is a redirect
             return owner_response
         # Owner OK, continue
         return super().get(request, *args, **kwargs)
@@ -155,9 +222,9 @@ class CheckOwner():
         """
         Override to check the owner and redirect if required.
         """
-        owner_response = self.check_owner(kwargs["pk"], request.user)
+        owner_response = self.check_owner(request.budget)
         if owner_response is not True:
-            # Is a redirect or 404
+            # Is a redirect
             return owner_response
         # Owner OK, continue
         return super().post(request, *args, **kwargs)
@@ -177,8 +244,7 @@ class EditIncome(CheckOwner, LoginRequiredMixin, UpdateView):
         """
         Get the queryset for the Budget's incomes.
         """
-        budget = Budget.objects.get(owner=self.request.user)
-        incomes = Amount.objects.filter(amount_type="IN", budget=budget)
+        incomes = Amount.objects.filter(amount_type="IN", budget=self.request.budget)
         return incomes
 
     def get_login_url(self):
@@ -197,8 +263,7 @@ class DeleteIncome(CheckOwner, LoginRequiredMixin, DeleteView):
         """
         Get the queryset for the Budget's incomes.
         """
-        budget = Budget.objects.get(owner=self.request.user)
-        incomes = Amount.objects.filter(amount_type="IN", budget=budget)
+        incomes = Amount.objects.filter(amount_type="IN", budget=self.request.budget)
         return incomes
     
 class CreateExpense(LoginRequiredMixin, CheckBudgetExists, FormView):
@@ -217,14 +282,13 @@ class CreateExpense(LoginRequiredMixin, CheckBudgetExists, FormView):
         """
         Override to add extra fields to the model.
         """
-        budget = Budget.objects.get(owner=request.user)
         form = self.form_class(request.POST)
 
         if form.is_valid():
             amount = Amount(
                 **form.cleaned_data,
                 amount_type="EX",
-                budget=budget
+                budget=request.budget
             )
             try:
                 amount.full_clean()
@@ -250,14 +314,13 @@ class EditExpense(CheckOwner, LoginRequiredMixin, UpdateView):
         """
         Get the queryset for the Budget's expense.
         """
-        budget = Budget.objects.get(owner=self.request.user)
-        expenses = Amount.objects.filter(amount_type="EX", budget=budget)
+        expenses = Amount.objects.filter(amount_type="EX", budget=self.request.budget)
         return expenses
 
     def get_login_url(self):
         return reverse("login")
 
-class DeleteExpense(LoginRequiredMixin, DeleteView):
+class DeleteExpense(CheckOwner, LoginRequiredMixin, DeleteView):
     """"
     A view for deleting an expense.
     """
@@ -270,133 +333,212 @@ class DeleteExpense(LoginRequiredMixin, DeleteView):
         """
         Get the queryset for the Budget's expense
         """
-        budget = Budget.objects.get(owner=self.request.user)
-        incomes = Amount.objects.filter(amount_type="EX", budget=budget)
-        return incomes
+        expenses = Amount.objects.filter(amount_type="EX", budget=self.request.budget)
+        return expenses
 
 
     def get_login_url(self):
         return reverse("login")
     
-class ActualAmountList(LoginRequiredMixin, ListView):
+# Newest first, matching the actual_period_occurred_idx index
+ACTUAL_AMOUNT_ORDERING = ("-occurred_on", "-actual_id")
+# The fields rendered by the actual amount list
+ACTUAL_AMOUNT_LIST_FIELDS = ("name", "amount", "occurred_on", "period", "estimate", "estimate__name")
+
+def get_actual_amounts(period_id):
+    """
+    Gets the actual amounts of the period the actual amount list renders.
+    """
+    # Only the columns the template renders are loaded, with the estimate's name in the same query
+    return ActualAmount.objects.filter(period_id=period_id).select_related("estimate").only(*ACTUAL_AMOUNT_LIST_FIELDS)
+
+def actual_amount_list_context(period, query, page_size):
+    """
+    The context of the actual amount list, the requested pages of the period's incomes and expenses with its totals.
+
+    Shared by ActualAmountList and the async actual_amount_list, see CachedContext.
+
+    :param: period, the BudgetPeriod with its Budget
+    :param: query, the query string that picks the pages
+    :param: page_size, the number of incomes and expenses on each page
+
+    :returns: the CachedContext
+    """
+    actual_amounts = get_actual_amounts(period.pk)
+
+    def get_page(amount_type, prefix):
+        return KeysetPaginator(
+            actual_amounts.filter(estimate__amount_type=amount_type), ACTUAL_AMOUNT_ORDERING, page_size, prefix=prefix
+        ).get_page(query)
+
+    def build(totals, incomes, expenses):
+        set_income_percentages([*incomes, *expenses], totals["income"])
+        return {
+            "incomes": incomes,
+            "expenses": expenses,
+            "total_income": totals["income"],
+            "total_expense": totals["expense"],
+            "net_amount": totals["net"],
+            "income_count": totals["income_count"],
+            "expense_count": totals["expense_count"],
+        }
+
+    return CachedContext(period.budget, "actual_amount_list", [
+        lambda: PeriodRollup.objects.period_totals(period.pk),
+        lambda: get_page("IN", "income_"),
+        lambda: get_page("EX", "expense_"),
+    ], build, period.pk, query.urlencode())
+
+def actual_expense_summary_context(period):
+    """
+    The context of the summary of the period's estimates, see AmountQuerySet.summary.
+
+    Shared by ActualExpenseSummary and the async actual_expense_summary, see CachedContext. The summary is a single
+    query, splitting it into incomes and expenses to run at the same time would read the period's actual amounts twice.
+
+    :param: period, the BudgetPeriod with its Budget
+
+    :returns: the CachedContext
+    """
+    return CachedContext(
+        period.budget, "actual_expense_summary", [Amount.objects.filter(budget_period_id=period.pk).summary],
+        lambda summary: {"incomes": summary["incomes"], "expenses": summary["expenses"]}, period.pk,
+    )
+
+class CheckPeriodOwner():
+    """
+    A mixin that gets the BudgetPeriod from the url, checking the user owns it in the same query.
+
+    Will return a 404 if the period does not exist or is not theirs.
+    Must come after the LoginRequiredMixin.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Override to get the user's period.
+        """
+        # The Budget is fetched in the same query for its change_version, the views use it to key their cached context
+        self.period = get_object_or_404(
+            BudgetPeriod.objects.for_user(request.user).select_related("budget"), budget_period_id=kwargs["period_id"]
+        )
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_etag_budget(self):
+        """
+        Override for the ConditionalGetMixin, the period's Budget is already loaded.
+        """
+        return self.period.budget
+
+    def get_etag_parts(self):
+        return (self.period.pk,)
+
+class ActualAmountList(LoginRequiredMixin, CheckPeriodOwner, ConditionalGetMixin, ListView):
     """
     A view for displaying Actual Amounts.
     """
     model = ActualAmount
     template_name = "amount/actual_amount_list.html"
     context_object_name = "actual_amounts"
+    etag_name = "actual_amount_list"
+    # The number of incomes and expenses shown on each page
+    page_size = 25
 
     def get_login_url(self):
         return reverse("login")
     
     def get_context_data(self, **kwargs):
         """
-        Override to get the incomes and expenses as separate querysets.
+        Override to get a page of the incomes and expenses, each is paginated separately.
+
+        The pages are cached until the Budget next changes, keyed by the period and the query string that picks the pages.
+        A period in progress also shows the forecast of its expenses.
         """
-        actual_amounts = self.get_queryset()
-        actual_incomes = actual_amounts.filter(estimate__amount_type="IN").order_by("-occurred_on")
-        total_income = sum([income.amount for income in actual_incomes])
-        actual_expenses = actual_amounts.filter(estimate__amount_type="EX").order_by("-occurred_on")
-        total_expense = sum([expense.amount for expense in actual_expenses])
         return super().get_context_data(
             **kwargs,
-            period_id=self.kwargs["period_id"], 
-            incomes=actual_incomes, 
-            expenses=actual_expenses, 
-            total_income=total_income, 
-            total_expense=total_expense,
-            net_amount=total_income - total_expense,
+            period_id=self.kwargs["period_id"],
+            forecast=get_cached_forecast(self.period),
+            **actual_amount_list_context(self.period, self.request.GET, self.page_size).get(),
         )
-    
-    def get(self, request, *args, **kwargs):
+
+    def get_etag_parts(self):
         """
-        Override to make sure the user owns the budget.
+        Override to add the date while the period is in progress, its forecast changes each day.
         """
-        try:
-            owner = BudgetPeriod.objects.get(budget_period_id=kwargs["period_id"]).budget.owner
-            if owner == request.user:
-                return super().get(request, *args, **kwargs)
-            else:
-                return HttpResponseNotFound()
-        except BudgetPeriod.DoesNotExist:
-            return HttpResponseNotFound()
+        return (*super().get_etag_parts(), *forecast_parts(self.period))
     
     def get_queryset(self):
         """
         Override to get the actual amounts for this budget period
         """
-        period_id = self.kwargs["period_id"]
-
-        return ActualAmount.objects.filter(period_id=period_id)
+        return get_actual_amounts(self.kwargs["period_id"])
     
-class ActualExpenseSummary(LoginRequiredMixin, TemplateView):
+class Echo():
     """
-    A list view that displays a summary of the Expenses in the Period.
+    A file-like object that returns what is written to it, so csv.writer can produce the rows of a streaming response.
     """
-    template_name = "amount/summary.html"
+    def write(self, value):
+        return value
+
+class ExportActualAmounts(LoginRequiredMixin, CheckPeriodOwner, ConditionalGetMixin, View):
+    """
+    Streams the actual amounts of a period as a CSV file.
+
+    The rows are read with a server-side cursor and written as they are fetched, so memory does not grow with
+    the size of the period. The columns match the statement import, expenses are negative.
+    """
+    # The number of rows fetched from the cursor at a time
+    chunk_size = 2000
+    etag_name = "export_actual_amounts"
 
     def get_login_url(self):
         return reverse("login")
-        
-    
-    def get(self, request, *args, **kwargs):
-        """
-        Override to make sure the user owns the budget.
-        """
-        try:
-            owner = BudgetPeriod.objects.get(budget_period_id=kwargs["period_id"]).budget.owner
-            if owner == request.user:
-                return super().get(request, *args, **kwargs)
-            else:
-                return HttpResponseNotFound()
-        except BudgetPeriod.DoesNotExist:
-            return HttpResponseNotFound()
-        
-    def get_context_data(self, **kwargs):
-        summary_list = self.get_summary()
 
-        return super().get_context_data(
-            **kwargs,
-            summary=summary_list
+    def get(self, request, *args, **kwargs):
+        writer = csv.writer(Echo())
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in self.get_rows()),
+            content_type="text/csv",
         )
-    
-    def get_summary(self):
+        filename = f"actual_amounts_{self.period.start_date}_{self.period.end_date}.csv"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def get_rows(self):
         """
-        A method that gets the summary dictionary for all amounts in the Budget Period
-        :returns: A list of dictionaries containing the name, sestimate and actual values for each amount
+        Generates the header and a row for each actual amount, oldest first.
         """
-        period_id = self.kwargs["period_id"]
-        period = BudgetPeriod.objects.get(pk=period_id)
-        amounts_dicts = {}
-
-        # Get the amount estimates a budget period
-        amounts = period.estimates.filter(amount_type="EX")
-        for amount in amounts:
-            amounts_dicts[amount.name] = {
-                "estimate": amount.amount,
-                "actual": 0
-            }
-
-        actual_amounts = period.amounts.all()
-        for actual_amount in actual_amounts:
-            name = actual_amount.estimate.name
-            if name in amounts_dicts:
-                new_actual = amounts_dicts[name]["actual"] + actual_amount.amount
-                amounts_dicts[name]["actual"] = new_actual
+        yield ["date", "name", "amount", "estimate", "type"]
+        actual_amounts = ActualAmount.objects.filter(period_id=self.period.pk).order_by("occurred_on", "actual_id").values_list(
+            "occurred_on", "name", "amount", "estimate__name", "estimate__amount_type"
+        )
+        for occurred_on, name, amount, estimate, amount_type in actual_amounts.iterator(chunk_size=self.chunk_size):
+            yield [
+                occurred_on.isoformat(),
+                name,
+                -amount if amount_type == "EX" else amount,
+                estimate,
+                "Expense" if amount_type == "EX" else "Income",
+            ]
 
-        amounts_list = []
-        for name, value in amounts_dicts.items():
-            amounts_list.append({
-                "name": name,
-                "estimate": value["estimate"],
-                "actual": value["actual"],
-            })
+class ActualExpenseSummary(LoginRequiredMixin, CheckPeriodOwner, ConditionalGetMixin, TemplateView):
+    """
+    A list view that displays a summary of the Incomes and Expenses in the Period.
+    """
+    template_name = "amount/summary.html"
+    etag_name = "actual_expense_summary"
 
-        return amounts_list
-            
+    def get_login_url(self):
+        return reverse("login")
+        
     
+        
+    def get_context_data(self, **kwargs):
+        """
+        Override to get the summary of all estimates in the Budget Period, cached until the Budget next changes.
+        """
+        return super().get_context_data(**kwargs, **actual_expense_summary_context(self.period).get())
     
-class CreateActualIncome(LoginRequiredMixin, FormView):
+class CreateActualIncome(LoginRequiredMixin, CheckPeriodOwner, FormView):
     """
     A view for creating an actual income.
     """
@@ -430,7 +572,6 @@ class CreateActualIncome(LoginRequiredMixin, FormView):
         """
         Override to add extra fields to the model.
         """
-        budget_period = BudgetPeriod.objects.get(budget_period_id=kwargs["period_id"])
         form = self.form_class(request.POST)
 
         # Populate the choices
@@ -439,7 +580,7 @@ class CreateActualIncome(LoginRequiredMixin, FormView):
         if form.is_valid():
             actual_amount = ActualAmount(
                 **form.cleaned_data,
-                period=budget_period
+                period=self.period
             )
             try:
                 actual_amount.full_clean()
@@ -490,11 +631,14 @@ class EditActualIncome(LoginRequiredMixin, UpdateView):
 
     def get_queryset(self):
         """
-        Get the queryset for the Budget's incomes.
+        Get the queryset for the user's actual incomes in the period.
         """
         
-        period = BudgetPeriod.objects.get(budget_period_id=self.kwargs["period_id"])
-        incomes = period.amounts.filter(estimate__amount_type="IN")
+        # The period is used to validate the occurred on date and by the template, the estimate is joined for its type
+        # anyway so it is selected too rather than loaded lazily
+        incomes = ActualAmount.objects.for_user(self.request.user).filter(
+            period_id=self.kwargs["period_id"], estimate__amount_type="IN"
+        ).select_related("period", "estimate")
         return incomes
 
     def get_form(self, form_class=None):
@@ -538,11 +682,13 @@ class DeleteActualIncome(LoginRequiredMixin, DeleteView):
     
     def get_queryset(self):
         """
-        Get the queryset for the Budget's incomes.
+        Get the queryset for the user's actual incomes in the period.
         """
         
-        period = BudgetPeriod.objects.get(budget_period_id=self.kwargs["period_id"])
-        incomes = period.amounts.filter(estimate__amount_type="IN")
+        # The period is used by the template and the estimate's type by ActualAmount.delete
+        incomes = ActualAmount.objects.for_user(self.request.user).filter(
+            period_id=self.kwargs["period_id"], estimate__amount_type="IN"
+        ).select_related("period", "estimate")
         return incomes
     
     def get_login_url(self):
@@ -552,7 +698,7 @@ class DeleteActualIncome(LoginRequiredMixin, DeleteView):
         return reverse("actual_amount", kwargs={"period_id": self.kwargs["period_id"]})
     
 
-class CreateActualExpense(LoginRequiredMixin, FormView):
+class CreateActualExpense(LoginRequiredMixin, CheckPeriodOwner, FormView):
     """
     A view for creating an actual income.
     """
@@ -586,7 +732,6 @@ class CreateActualExpense(LoginRequiredMixin, FormView):
         """
         Override to add extra fields to the model.
         """
-        budget_period = BudgetPeriod.objects.get(budget_period_id=kwargs["period_id"])
         form = self.form_class(request.POST)
 
         # Populate the choices
@@ -595,7 +740,7 @@ class CreateActualExpense(LoginRequiredMixin, FormView):
         if form.is_valid():
             actual_amount = ActualAmount(
                 **form.cleaned_data,
-                period=budget_period
+                period=self.period
             )
             try:
                 actual_amount.full_clean()
@@ -646,12 +791,15 @@ class EditActualExpense(LoginRequiredMixin, UpdateView):
 
     def get_queryset(self):
         """
-        Get the queryset for the Budget's incomes.
+        Get the queryset for the user's actual expenses in the period.
         """
         
-        period = BudgetPeriod.objects.get(budget_period_id=self.kwargs["period_id"])
-        incomes = period.amounts.filter(estimate__amount_type="EX")
-        return incomes
+        # The period is used to validate the occurred on date and by the template, the estimate is joined for its type
+        # anyway so it is selected too rather than loaded lazily
+        expenses = ActualAmount.objects.for_user(self.request.user).filter(
+            period_id=self.kwargs["period_id"], estimate__amount_type="EX"
+        ).select_related("period", "estimate")
+        return expenses
 
     def get_form(self, form_class=None):
         """
@@ -694,12 +842,14 @@ class DeleteActualExpense(LoginRequiredMixin, DeleteView):
     
     def get_queryset(self):
         """
-        Get the queryset for the Budget's incomes.
+        Get the queryset for the user's actual expenses in the period.
         """
         
-        period = BudgetPeriod.objects.get(budget_period_id=self.kwargs["period_id"])
-        incomes = period.amounts.filter(estimate__amount_type="EX")
-        return incomes
+        # The period is used by the template and the estimate's type by ActualAmount.delete
+        expenses = ActualAmount.objects.for_user(self.request.user).filter(
+            period_id=self.kwargs["period_id"], estimate__amount_type="EX"
+        ).select_related("period", "estimate")
+        return expenses
     
     def get_login_url(self):
         return reverse("login")
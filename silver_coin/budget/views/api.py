@@ -0,0 +1,178 @@
+import json
+
+from django.http import JsonResponse
+from django.views.generic import View
+
+from ..api import API_VERSION
+from ..api import EMPTY_TOTALS
+from ..api import BatchError
+from ..api import apply_actual_batch
+from ..api import get_changes
+from ..api import get_estimate_totals
+from ..api import get_period_totals
+from ..api import serialize_actual
+from ..api import serialize_budget
+from ..api import serialize_estimate
+from ..api import serialize_period
+from ..models import ActualAmount
+from ..models import BudgetPeriod
+from ..pagination import KeysetPaginator
+from .amount import ACTUAL_AMOUNT_ORDERING
+from .budget_period import BUDGET_PERIOD_ORDERING
+from .conditional import ConditionalGetMixin
+
+def api_response(data, status=200):
+    """
+    Returns a JSON response with the version of the API added.
+    """
+    return JsonResponse({"version": API_VERSION, **data}, status=status)
+
+def api_error(message, status):
+    return api_response({"error": message}, status=status)
+
+def page_cursors(page):
+    """
+    The cursors a client passes back as the after or before query parameters to get the next or previous page.
+    """
+    return {"next": page.next_cursor, "previous": page.previous_cursor}
+
+class ApiView(ConditionalGetMixin, View):
+    """
+    The base of the JSON API views, the user must be logged in.
+
+    The API uses the same session authentication as the rest of the site, so unsafe requests need the CSRF token
+    in the X-CSRFToken header. Errors are returned as JSON rather than redirecting to the login page.
+    GET responses have an ETag made from the Budget's change_version, send it back in If-None-Match to get
+    304 Not Modified while nothing has changed.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return api_error("Authentication credentials were not provided", 401)
+        return super().dispatch(request, *args, **kwargs)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = api_error(f"Method {request.method} is not allowed", 405)
+        response["Allow"] = ", ".join(self._allowed_methods())
+        return response
+
+class ApiPeriodView(ApiView):
+    """
+    An ApiView for the routes of a BudgetPeriod, the period is fetched checking the user owns it in the same query.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+        self.period = BudgetPeriod.objects.for_user(request.user).filter(
+            budget_period_id=kwargs["period_id"]
+        ).select_related("budget").first()
+        if self.period is None:
+            return api_error("Budget period not found", 404)
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_etag_budget(self):
+        return self.period.budget
+
+    def get_etag_parts(self):
+        return (self.period.pk,)
+
+class BudgetApi(ApiView):
+    """
+    Returns the user's Budget, its estimates and their totals.
+    """
+    etag_name = "api_budget"
+
+    def get(self, request, *args, **kwargs):
+        if not request.budget:
+            return api_error("You do not have a budget", 404)
+        budget = request.budget
+        return api_response({
+            "budget": serialize_budget(budget),
+            "estimates": [serialize_estimate(estimate) for estimate in budget.amounts.order_by("amount_type", "name", "amount_id")],
+            "totals": budget.totals(),
+        })
+
+class BudgetPeriodListApi(ApiView):
+    """
+    Lists the user's BudgetPeriods newest first with their totals, a page at a time.
+    """
+    page_size = 25
+    etag_name = "api_budget_periods"
+
+    def get(self, request, *args, **kwargs):
+        budget_periods = BudgetPeriod.objects.for_user(request.user)
+        page = KeysetPaginator(budget_periods, BUDGET_PERIOD_ORDERING, self.page_size).get_page(request.GET)
+        totals = get_period_totals([period.pk for period in page])
+        return api_response({
+            "budget_periods": [{**serialize_period(period), "totals": totals[period.pk]} for period in page],
+            **page_cursors(page),
+        })
+
+class BudgetPeriodApi(ApiPeriodView):
+    """
+    Returns a BudgetPeriod with its estimates and the totals of its actual amounts.
+    """
+    etag_name = "api_budget_period"
+
+    def get(self, request, *args, **kwargs):
+        period_totals, estimate_totals = get_estimate_totals(self.period.pk)
+        estimates = self.period.estimates.order_by("amount_type", "name", "amount_id")
+        return api_response({
+            "budget_period": serialize_period(self.period),
+            "estimates": [
+                {**serialize_estimate(estimate), "totals": estimate_totals.get(estimate.pk, dict(EMPTY_TOTALS))}
+                for estimate in estimates
+            ],
+            "totals": period_totals,
+        })
+
+class ActualAmountsApi(ApiPeriodView):
+    """
+    Lists the ActualAmounts of a BudgetPeriod and creates, updates and deletes them in batches.
+
+    A POST body is an object with create, update and delete lists, see budget.api.apply_actual_batch.
+    The response has a result for each item in the same order as the request and the period's new totals.
+    """
+    page_size = 100
+    etag_name = "api_actual_amounts"
+
+    def get(self, request, *args, **kwargs):
+        actual_amounts = ActualAmount.objects.filter(period=self.period).only("name", "occurred_on", "amount", "estimate")
+        page = KeysetPaginator(actual_amounts, ACTUAL_AMOUNT_ORDERING, self.page_size).get_page(request.GET)
+        return api_response({
+            "actual_amounts": [serialize_actual(actual) for actual in page],
+            **page_cursors(page),
+        })
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return api_error("The body is not valid JSON", 400)
+
+        try:
+            results = apply_actual_batch(self.period, payload)
+        except BatchError as error:
+            return api_error(str(error), 400)
+
+        period_totals, estimate_totals = get_estimate_totals(self.period.pk)
+        return api_response({
+            "results": results,
+            "totals": period_totals,
+            "estimate_totals": estimate_totals,
+        })
+
+class ChangesApi(ApiView):
+    """
+    Returns the rows of the user's Budget that have changed since the cursor in the cursor query parameter.
+
+    A client keeps the cursor from each response and passes it back to only get what has changed since.
+    If nothing has changed the response is empty and only the Budget is read. If reset is true the cursor
+    was missing or not valid for this Budget, so everything is returned and the client should replace its copy.
+    If more is true the client should ask again straight away with the new cursor.
+    """
+    etag_name = "api_changes"
+
+    def get(self, request, *args, **kwargs):
+        if not request.budget:
+            return api_error("You do not have a budget", 404)
+        return api_response(get_changes(request.budget, request.GET.get("cursor")))
@@ -0,0 +1,178 @@
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections, connection
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+
+from silver_coin.middleware import install_recorder
+
+from ..cache import budget_etag
+from ..forecast import forecast_parts
+from ..forecast import get_cached_forecast
+from ..middleware import get_budget
+from ..models import BudgetPeriod
+from .amount import ActualAmountList
+from .amount import actual_amount_list_context
+from .amount import actual_expense_summary_context
+from .amount import amount_list_context
+from .amount import history_parts
+from .conditional import set_etag
+
+class QueryRunner():
+    """
+    Runs the sync ORM code of an async view, Django 3.2 does not have an async ORM.
+
+    Each function is run in a worker thread with its own database connection, so the queries of functions passed
+    to gather run at the same time. The worker threads are not sent the request_finished signal, so their
+    connections are closed afterwards as Django would at the end of a request, which keeps them when CONN_MAX_AGE is set.
+
+    If the request's connection is in a transaction the other connections would not see its uncommitted rows,
+    so the functions are run one after another on it instead. Django does not allow ATOMIC_REQUESTS with async views,
+    so this only happens in the tests.
+    """
+    def __init__(self, in_transaction):
+        self.in_transaction = in_transaction
+
+    @classmethod
+    async def create(cls):
+        return cls(await sync_to_async(lambda: connection.in_atomic_block)())
+
+    async def run(self, func):
+        """
+        Runs the function in a thread and returns its result.
+        """
+        if self.in_transaction:
+            return await sync_to_async(func)()
+        return await sync_to_async(self.closing_connection(func), thread_sensitive=False)()
+
+    async def gather(self, *funcs):
+        """
+        Runs the functions at the same time and returns their results in order.
+        """
+        if self.in_transaction:
+            return [await self.run(func) for func in funcs]
+        return await asyncio.gather(*[self.run(func) for func in funcs])
+
+    @staticmethod
+    def closing_connection(func):
+        def run():
+            # The worker thread's connections report to the request's instrumentation
+            install_recorder()
+            try:
+                return func()
+            finally:
+                close_old_connections()
+        return run
+
+def async_login_required(view):
+    """
+    The login_required decorator for async views, redirects to the login page if the user is not logged in.
+
+    The view is passed a QueryRunner for its queries.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        queries = await QueryRunner.create()
+        # Loads the session and the user
+        if not await queries.run(lambda: request.user.is_authenticated):
+            return redirect_to_login(request.get_full_path(), reverse("login"))
+        return await view(request, queries, *args, **kwargs)
+    return wrapper
+
+async def get_user_period(request, queries, period_id):
+    """
+    Gets the user's period with its Budget, raises Http404 if it does not exist or is not theirs. See CheckPeriodOwner.
+    """
+    return await queries.run(lambda: get_object_or_404(
+        BudgetPeriod.objects.for_user(request.user).select_related("budget"), budget_period_id=period_id
+    ))
+
+async def render_conditional(request, queries, budget, etag_name, parts, template_name, get_context):
+    """
+    Renders the page, or returns 304 Not Modified if the client has the current version.
+
+    The ETags are the same as the sync views', see ConditionalGetMixin, so a client can move between the two.
+
+    :param: budget, the Budget the page is made from, None if the user does not have one
+    :param: etag_name, the name of the page the ETag is made for
+    :param: parts, anything other than the Budget and the query string the page depends on
+    :param: get_context, an async function that returns the context of the template
+
+    :returns: the response
+    """
+    etag = None
+    if budget:
+        etag = budget_etag(budget.pk, budget.change_version, etag_name, *parts, request.GET.urlencode())
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return set_etag(response, etag)
+
+    context = await get_context()
+    response = await queries.run(lambda: render(request, template_name, context))
+    return set_etag(response, etag) if etag is not None else response
+
+@async_login_required
+async def dashboard(request, queries):
+    """
+    The async version of DashboardView.
+    """
+    budget = await queries.run(lambda: get_budget(request))
+
+    async def get_context():
+        return {"has_budget": bool(budget)}
+
+    return await render_conditional(request, queries, budget, "dashboard", (), "dashboard.html", get_context)
+
+@async_login_required
+async def amount_list(request, queries):
+    """
+    The async version of AmountList, the Budget's totals, incomes, expenses and variance history are fetched at the same time.
+    """
+    budget = await queries.run(lambda: get_budget(request))
+    if not budget:
+        return redirect(reverse("dashboard"))
+
+    async def get_context():
+        return await amount_list_context(budget).aget(queries)
+
+    return await render_conditional(
+        request, queries, budget, "amount_list", history_parts(), "amount/amount_list.html", get_context
+    )
+
+@async_login_required
+async def actual_amount_list(request, queries, period_id):
+    """
+    The async version of ActualAmountList, the period's totals, the pages of incomes and expenses and the forecast
+    are fetched at the same time.
+    """
+    period = await get_user_period(request, queries, period_id)
+
+    async def get_context():
+        pages, forecast = await asyncio.gather(
+            actual_amount_list_context(period, request.GET, ActualAmountList.page_size).aget(queries),
+            queries.run(lambda: get_cached_forecast(period)),
+        )
+        return {"period_id": period.pk, "forecast": forecast, **pages}
+
+    return await render_conditional(
+        request, queries, period.budget, "actual_amount_list", (period.pk, *forecast_parts(period)),
+        "amount/actual_amount_list.html", get_context,
+    )
+
+@async_login_required
+async def actual_expense_summary(request, queries, period_id):
+    """
+    The async version of ActualExpenseSummary.
+    """
+    period = await get_user_period(request, queries, period_id)
+
+    async def get_context():
+        return {"period_id": period.pk, **await actual_expense_summary_context(period).aget(queries)}
+
+    return await render_conditional(
+        request, queries, period.budget, "actual_expense_summary", (period.pk,), "amount/summary.html", get_context
+    )
@@ -1,12 +1,17 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ValidationError
+from django.http import StreamingHttpResponse
 from django.urls import reverse, reverse_lazy
+from django.utils import timezone
 from django.views.generic import FormView
+from django.views.generic import View
 from django.views.generic import UpdateView
 from django.views.generic import DeleteView
 
+from budget.archive import stream_archive
 from budget.forms import BudgetForm
 from budget.forms import BudgetModelForm
+from budget.middleware import get_budget
 from budget.models import Budget
 
 class CreateBudget(LoginRequiredMixin, FormView):
@@ -57,7 +62,7 @@ class UserMixin(LoginRequiredMixin):
         """
         Return the user's budget.
         """
-        return self.get_queryset().first()
+        return get_budget(self.request)
 
 class EditBudget(UserMixin, UpdateView):
     """
@@ -76,3 +81,18 @@ class DeleteBudget(UserMixin, DeleteView):
     """
     template_name = "budget/budget_delete.html"
     success_url = reverse_lazy("dashboard")
+
+class ExportAccount(LoginRequiredMixin, View):
+    """
+    Downloads everything in the user's account as a zip of JSON Lines files, see budget/archive.py.
+
+    The zip is streamed while it is being written so the download starts straight away whatever the size of the account.
+    """
+    def get_login_url(self):
+        return reverse("login")
+
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(stream_archive(request.user), content_type="application/zip")
+        filename = f"silver_coin_{request.user.username}_{timezone.now().date()}.zip"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
@@ -5,15 +5,23 @@ from django.views.generic import FormView, ListView, DeleteView, UpdateView
 from django.urls import reverse, reverse_lazy
 
 from ..forms import BudgetPeriodForm, BudgetPeriodModelForm
-from ..models import BudgetPeriod, Budget
+from ..models import BudgetPeriod
+from ..pagination import KeysetPaginator
+from .conditional import ConditionalGetMixin
 
-class BudgetPeriodList(ListView):
+# Newest first, matching the period_budget_start_idx index
+BUDGET_PERIOD_ORDERING = ("-start_date", "-budget_period_id")
+
+class BudgetPeriodList(ConditionalGetMixin, ListView):
     """
     Lists the BudgetPeriod for the user's Budget.
     """
     model = BudgetPeriod
     template_name = "budget_period/budget_period_list.html"
     context_object_name = "budget_periods"
+    # The number of periods shown on each page
+    page_size = 25
+    etag_name = "budget_period_list"
 
     def get_login_url(self):
         return reverse("login")
@@ -22,9 +30,16 @@ class BudgetPeriodList(ListView):
         """
         Override to get the budget periods
         """
-        budget_periods = BudgetPeriod.objects.filter(budget__owner=self.request.user).order_by("-start_date")
+        budget_periods = BudgetPeriod.objects.for_user(self.request.user).order_by(*BUDGET_PERIOD_ORDERING)
         return budget_periods
 
+    def get_context_data(self, **kwargs):
+        """
+        Override to only get a page of the budget periods.
+        """
+        page = KeysetPaginator(self.object_list, BUDGET_PERIOD_ORDERING, self.page_size).get_page(self.request.GET)
+        return super().get_context_data(**kwargs, budget_periods=page)
+
 class CreateBudgetPeriod(LoginRequiredMixin, FormView):
     """
     Creates a BudgetPeriod
@@ -35,23 +50,35 @@ class CreateBudgetPeriod(LoginRequiredMixin, FormView):
     extra_context = {"action": "Create"}
 
     def post(self, request, *args, **kwargs):
-        owner = request.user
         form = self.form_class(request.POST)
 
         if form.is_valid():
-            budget = Budget.objects.get(owner=owner)
-            budget_period = BudgetPeriod(**form.cleaned_data, budget=budget)
+            budget_period = BudgetPeriod(**form.cleaned_data, budget=request.budget)
             try:
                 budget_period.full_clean()
+                # Saving can still fail if an overlapping period was created at the same time
+                budget_period.save()
             except ValidationError as error:
                 form.add_error(field=None, error=error)
                 return self.form_invalid(form)
-            budget_period.save()
             return self.form_valid(form)
         else:
             return self.form_invalid(form)
         
-class EditBudgetPeriod(UpdateView):
+class UserPeriodMixin(LoginRequiredMixin):
+    """
+    A mixin that scopes the budget periods to the logged in user, so another user's period is a 404.
+    """
+    def get_login_url(self):
+        return reverse("login")
+
+    def get_queryset(self):
+        """
+        Override to filter by the owner.
+        """
+        return BudgetPeriod.objects.for_user(self.request.user)
+
+class EditBudgetPeriod(UserPeriodMixin, UpdateView):
     """
     A view for editing the user's budget period.
     """
@@ -61,8 +88,18 @@ class EditBudgetPeriod(UpdateView):
     model = BudgetPeriod
     context_object_name = "budget_period"
     extra_context = {"action": "Edit"}
+
+    def form_valid(self, form):
+        """
+        Override to show the overlap error if an overlapping period was saved at the same time.
+        """
+        try:
+            return super().form_valid(form)
+        except ValidationError as error:
+            form.add_error(field=None, error=error)
+            return self.form_invalid(form)
         
-class DeleteBudgetPeriod(DeleteView):
+class DeleteBudgetPeriod(UserPeriodMixin, DeleteView):
     """
     A view for deleting the user's budget period.
     """
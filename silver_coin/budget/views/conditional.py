@@ -0,0 +1,60 @@
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from ..cache import budget_etag
+
+def set_etag(response, etag):
+    """
+    Adds the ETag to a 200 or 304 response, the page is private to the user and must be checked with the server each time it is used.
+    """
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+class ConditionalGetMixin():
+    """
+    A mixin that answers a GET with 304 Not Modified when the client already has the current version of the page.
+
+    The ETag is made from the Budget's change_version, which is read with the Budget, so an unchanged page is answered
+    before any of the page's own queries are run or its template rendered. Must come after the mixins that check
+    the user can see the page, so their checks are made first.
+    """
+    # The name of the page the ETags are made for, views without one are not conditional
+    etag_name = None
+
+    def get_etag_budget(self):
+        """
+        Returns the Budget the page is made from, None if there is not one.
+        """
+        return self.request.budget
+
+    def get_etag_parts(self):
+        """
+        Returns anything other than the Budget and the query string the page depends on.
+        """
+        return ()
+
+    def get_etag(self):
+        """
+        Returns the ETag of the page, or None if the page does not have one.
+        """
+        budget = self.get_etag_budget()
+        if self.etag_name is None or not budget:
+            return None
+        return budget_etag(
+            budget.pk, budget.change_version, self.etag_name, *self.get_etag_parts(), self.request.GET.urlencode()
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Override to return 304 Not Modified if the client's ETag matches.
+        """
+        etag = self.get_etag() if request.method in ("GET", "HEAD") else None
+        if etag is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return set_etag(response, etag)
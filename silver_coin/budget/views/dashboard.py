@@ -2,16 +2,17 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView
 from django.urls import reverse
 
-from ..models import Budget
+from .conditional import ConditionalGetMixin
 
-class DashboardView(LoginRequiredMixin, TemplateView):
+class DashboardView(LoginRequiredMixin, ConditionalGetMixin, TemplateView):
     template_name = "dashboard.html"
+    etag_name = "dashboard"
 
     def get(self, request, *args, **kwargs):
         """
         Override to check if the user has a budget defined.
         """
-        has_budget = Budget.objects.filter(owner=request.user).count() > 0
+        has_budget = bool(request.budget)
 
         return super().get(request, has_budget=has_budget)
 
@@ -0,0 +1,58 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views.generic import TemplateView
+from django.urls import reverse
+
+from ..cache import get_or_compute
+from ..forms import TrendsForm
+from ..models import PeriodRollup
+from .amount import CheckBudgetExists
+from .amount import get_variance_history
+from .amount import history_parts
+from .conditional import ConditionalGetMixin
+
+class TrendsReport(LoginRequiredMixin, CheckBudgetExists, ConditionalGetMixin, TemplateView):
+    """
+    Displays the actual total of each Income and Expense across the latest Budget Periods,
+    with the change from the previous period and the rolling average.
+    """
+    template_name = "report/trends.html"
+    etag_name = "trends"
+
+    def get_login_url(self):
+        return reverse("login")
+
+    def get_context_data(self, **kwargs):
+        """
+        Override to add the trends, cached until the Budget next changes.
+        """
+        form = TrendsForm(self.request.GET or None)
+        options = form.get_options()
+        budget = self.request.budget
+        trends = get_or_compute(
+            budget.pk, budget.change_version, "trends",
+            lambda: PeriodRollup.objects.trends(budget.pk, **options),
+            options["periods"], options["average_over"],
+        )
+        return super().get_context_data(**kwargs, form=form, average_over=options["average_over"], **trends)
+
+class VarianceReport(LoginRequiredMixin, CheckBudgetExists, ConditionalGetMixin, TemplateView):
+    """
+    Displays how the estimates of every Budget Period compared with their actual amounts, for each Income and Expense.
+    """
+    template_name = "report/variance.html"
+    etag_name = "variance"
+
+    def get_login_url(self):
+        return reverse("login")
+
+    def get_context_data(self, **kwargs):
+        """
+        Override to add the variance history, cached until the Budget next changes.
+        """
+        return super().get_context_data(**kwargs, **get_variance_history(self.request.budget))
+
+    def get_etag_parts(self):
+        """
+        Override to add the date, see history_parts.
+        """
+        return history_parts()
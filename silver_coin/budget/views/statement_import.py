@@ -0,0 +1,55 @@
+import io
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.urls import reverse
+from django.views.generic import FormView
+
+from ..forms import ActualAmountImportForm
+from ..importers import import_actual_amounts
+from .amount import CheckPeriodOwner
+
+class ImportActualAmounts(LoginRequiredMixin, CheckPeriodOwner, FormView):
+    """
+    A view for importing the transactions of a bank statement as actual amounts.
+
+    The upload is read a line at a time so large statements are not loaded into memory,
+    and the page shows how many rows were imported and why any were rejected.
+    """
+    form_class = ActualAmountImportForm
+    template_name = "amount/actual_amount_import.html"
+    # The number of rejected rows listed on the page
+    max_errors_shown = 100
+
+    def get_login_url(self):
+        return reverse("login")
+
+    def get_form_kwargs(self):
+        return {**super().get_form_kwargs(), "period": self.period}
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(**kwargs, period_id=self.kwargs["period_id"])
+
+    def form_valid(self, form):
+        """
+        Override to import the statement and show the result instead of redirecting.
+        """
+        statement = form.cleaned_data["statement"]
+        # utf-8-sig drops the byte order mark some banks add to their exports
+        lines = io.TextIOWrapper(statement.file, encoding="utf-8-sig", errors="replace", newline="")
+        try:
+            result = import_actual_amounts(
+                self.period,
+                lines,
+                form.cleaned_data["file_format"],
+                default_income=form.cleaned_data["default_income"],
+                default_expense=form.cleaned_data["default_expense"],
+            )
+        finally:
+            # Stop the wrapper closing the upload when it is garbage collected
+            lines.detach()
+
+        return self.render_to_response(self.get_context_data(
+            form=form,
+            result=result,
+            errors=result.errors[:self.max_errors_shown],
+        ))
@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger("silver_coin.requests")
+
+# The QueryRecorder of the async request being handled, sync_to_async carries it into the threads the request's queries run in
+current_recorder = ContextVar("current_recorder", default=None)
+
+class QueryRecorder():
+    """
+    A database execute wrapper that records the number, duration and SQL of the queries run.
+
+    It is installed with connection.execute_wrapper so it works whatever the value of DEBUG is,
+    and only the counts are kept so memory does not grow with the number of requests.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        # The queries of an async request can run in several threads at once
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            # Only the same SQL with the same parameters is a duplicate, a query run again with other parameters is not
+            fingerprint = hashlib.sha1(f"{sql}{params!r}".encode()).hexdigest()[:12]
+            with self.lock:
+                self.duration += duration
+                self.count += 1
+                self.fingerprints[fingerprint] += 1
+
+    def duplicates(self):
+        """
+        Returns a dictionary of the fingerprints of the queries that were run more than once and how many times they were run.
+        """
+        return {fingerprint: count for fingerprint, count in self.fingerprints.items() if count > 1}
+
+def record_to_current(execute, sql, params, many, context):
+    """
+    A database execute wrapper that passes the query to the QueryRecorder of the current async request, if there is one.
+    """
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+def install_recorder(sender=None, connection=None, **kwargs):
+    """
+    Adds record_to_current to the connection, or to all the current thread's connections, if it is not there already.
+
+    Is also the receiver of the connection_created signal, so connections opened by any thread report to the request.
+    """
+    for conn in [connection] if connection is not None else connections.all():
+        if record_to_current not in conn.execute_wrappers:
+            conn.execute_wrappers.append(record_to_current)
+
+class RequestInstrumentationMiddleware(MiddlewareMixin):
+    """
+    Records the number of queries, database time, duplicated queries and template render time of a request.
+
+    The values are added to the response as a Server-Timing header and logged as a JSON line keyed by the view name.
+    Only a sample of requests are recorded, set by REQUEST_INSTRUMENTATION_SAMPLE_RATE (0 to 1).
+
+    Under ASGI the queries of a request run in more than one thread, so the recorder is kept in a context variable
+    and every connection passes its queries to it, see record_to_current.
+    """
+    def __init__(self, get_response):
+        # MiddlewareMixin marks the middleware as a coroutine function when get_response is one, so Django awaits it
+        super().__init__(get_response)
+        if asyncio.iscoroutinefunction(get_response):
+            connection_created.connect(install_recorder, dispatch_uid="request_instrumentation")
+
+    def is_sampled(self):
+        sample_rate = getattr(settings, "REQUEST_INSTRUMENTATION_SAMPLE_RATE", 1.0)
+        return sample_rate > 0 and random.random() < sample_rate
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self.is_sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        request._template_duration = 0.0
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        self.record(request, response, recorder, total)
+        return response
+
+    async def __acall__(self, request):
+        if not self.is_sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        request._template_duration = 0.0
+        start = time.perf_counter()
+        token = current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        total = time.perf_counter() - start
+
+        self.record(request, response, recorder, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """
+        Under ASGI a sync view runs in a thread of Django's, whose connections may predate the connection_created receiver.
+        """
+        if current_recorder.get() is not None:
+            install_recorder()
+
+    def process_template_response(self, request, response):
+        """
+        Times the template rendering, which happens after the view has returned.
+        """
+        if hasattr(request, "_template_duration"):
+            start = time.perf_counter()
+
+            def record_render(rendered_response):
+                request._template_duration += time.perf_counter() - start
+
+            response.add_post_render_callback(record_render)
+        return response
+
+    def record(self, request, response, recorder, total):
+        """
+        Adds the Server-Timing header to the response and logs the request.
+        """
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        duplicates = recorder.duplicates()
+
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+            f'dup;desc="{sum(duplicates.values())} duplicated queries"',
+            f"tpl;dur={request._template_duration * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ])
+
+        logger.info(json.dumps({
+            "view": view_name,
+            "method": request.method,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "db_ms": round(recorder.duration * 1000, 1),
+            "duplicates": duplicates,
+            "template_ms": round(request._template_duration * 1000, 1),
+            "total_ms": round(total * 1000, 1),
+        }))
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 import os
+import sys
 
 from pathlib import Path
 from dotenv import load_dotenv
@@ -49,15 +50,22 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First so the timings cover the rest of the middleware
+    'silver_coin.middleware.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Uses request.user so must come after the AuthenticationMiddleware
+    'budget.middleware.BudgetMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# The fraction of requests (0 to 1) that record their query count, database and template timings
+REQUEST_INSTRUMENTATION_SAMPLE_RATE = float(os.getenv("REQUEST_INSTRUMENTATION_SAMPLE_RATE", "1.0"))
+
 ROOT_URLCONF = 'silver_coin.urls'
 
 TEMPLATES = [
@@ -90,10 +98,41 @@ DATABASES = {
         "USER": os.getenv("POSTGRES_USER"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "PORT": 5432,
+        # Keeping connections open matters for the async views, each of their queries runs in a worker thread with its own connection
+        "CONN_MAX_AGE": int(os.getenv("POSTGRES_CONN_MAX_AGE", "0")),
     }
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+# The budget cache holds the context of the budget pages keyed by each Budget's change_version, see budget.cache.
+# BUDGET_CACHE_BACKEND is locmem (the default, one cache per process) or file to share it between processes.
+BUDGET_CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "budget",
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("BUDGET_CACHE_LOCATION", str(BASE_DIR / "cache" / "budget")),
+    },
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "budget": {
+        **BUDGET_CACHE_BACKENDS[os.getenv("BUDGET_CACHE_BACKEND", "locmem")],
+        # Stale entries are never read again, they only need to live long enough to be culled
+        "TIMEOUT": int(os.getenv("BUDGET_CACHE_TIMEOUT", "3600")),
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -135,6 +174,28 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# Logging
+# https://docs.djangoproject.com/en/4.1/topics/logging/
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+        },
+    },
+    "loggers": {
+        # The per request instrumentation lines
+        "silver_coin.requests": {
+            "handlers": ["console"],
+            # Keep the test output readable
+            "level": os.getenv("REQUEST_INSTRUMENTATION_LOG_LEVEL", "WARNING" if "test" in sys.argv else "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 